@@ -0,0 +1,79 @@
+from RoomEnvironment import RoomEnvironment
+from events.TilesCoveredByObstacle import TilesCoveredByObstacle
+from sprite.Tile import get_cover_parameters
+from utils.config_manager import config_manager
+
+# templates by room size and obstacle layout
+_TEMPLATES = {}
+_MAX_CACHED_TEMPLATES = 16
+
+
+class EnvironmentTemplate:
+    """
+    Prebuilt RoomEnvironment with walls and obstacles but without robot. The template itself is never run,
+    environments are cloned from it with RoomEnvironment.copy, which shares the obstacles and the read only
+    tile arrays, so creating one only costs the robot and the sprites of the tiles under the obstacles.
+    """
+
+    def __init__(self, width: int, height: int, tile_size: int, obstacles=None):
+        self.environment = RoomEnvironment(width, height, tile_size, obstacles, None)
+        self.environment.tile_grid.freeze()
+
+        # the initial events are made again for the tiles of every clone
+        self.obstacle_tiles = [event.indices for event in self.environment.initial_events]
+
+    def create(self, robot=None, initial_events=True):
+        """
+        New RoomEnvironment like RoomEnvironment(width, height, tile_size, obstacles, robot) builds it
+
+        :param initial_events: make the events of the tiles under the obstacles, which creates their sprites.
+            Only a visualizer needs them
+        """
+        env = self.environment.copy()
+        if initial_events:
+            env.initial_events = [TilesCoveredByObstacle([env.get_tile(ix, iy) for ix, iy in indices], indices)
+                                  for indices in self.obstacle_tiles]
+        if robot is not None:
+            env.initialize_default_robot(robot)
+        return env
+
+
+def get_environment_template(width: int, height: int, tile_size: int, obstacles=None):
+    """Cached EnvironmentTemplate of the room and obstacles"""
+    # the tile grid takes the cover parameters from the configuration
+    key = (width, height, tile_size, _freeze(obstacles or []), get_cover_parameters())
+    template = _TEMPLATES.get(key)
+    if template is None:
+        template = EnvironmentTemplate(width, height, tile_size, obstacles)
+        if len(_TEMPLATES) >= _MAX_CACHED_TEMPLATES:
+            del _TEMPLATES[next(iter(_TEMPLATES))]
+        _TEMPLATES[key] = template
+    return template
+
+
+def _freeze(value):
+    # hashable version of the obstacles of the configuration, circles and polygons are dicts
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def create_room_environment(width: int, height: int, tile_size: int, obstacles=None, robot=None, initial_events=True):
+    """RoomEnvironment(width, height, tile_size, obstacles, robot), cloned from a cached template"""
+    return get_environment_template(width, height, tile_size, obstacles).create(robot, initial_events)
+
+
+def prebuild_environment_templates():
+    """
+    Builds the templates of all environments of the config manager, so that switching to one is fast.
+    One environment with the robot is created from every template, that caches the configuration space too.
+    """
+    env_config = config_manager.get_environment_config()
+    for env in config_manager.get_all_environments():
+        env_data = config_manager.get_environment(env["id"])
+        robot = env_data.get("robot")
+        template = get_environment_template(env_config["width"], env_config["height"], env_config["tile_size"],
+                                            env_data.get("obstacles", []))
+        template.create(robot if robot and len(robot) >= 3 else None)
@@ -0,0 +1,280 @@
+"""
+Experiment runner for large batches of headless runs.
+Runs every combination of algorithm parameters, environments and seeds in worker processes. The workers
+write the coverage curves, the final tile grids and the outcome of every run straight into shared memory
+arrays that the parent allocated before, only the index of a finished run is sent back. The parent then
+sums the runs up per parameter set and environment.
+
+Usage: python ExperimentRunner.py --algorithm random [--param min_bounce_angle=50,70,90] [--environments 1,2,3]
+    [--seeds 100] [--workers 4] [--max-ticks 60000] [--plateau-window 20000] [--plateau-rate 0.02]
+    [--no-grids] [--no-cache] [--save runs.npz]
+
+Results of runs are kept in the result cache (see utils/ResultCache.py), repeated runs are not simulated again.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from HeadlessSimulation import run_simulation
+from algorithm import create_algorithm
+from sprite.Tile import TileState
+from sweep import parse_param, format_parameters
+from utils.ResultCache import get_result_cache
+from utils.config_manager import config_manager
+
+# outcome of a run, -1 until it ran
+CUT_OFF, FINISHED, PLATEAUED = 0, 1, 2
+OUTCOMES = ("cut off", "finished", "plateaued")
+OUTCOME_CODES = {None: CUT_OFF, "finished": FINISHED, "plateaued": PLATEAUED}
+
+# state of a worker process, set by _init_worker
+_worker = None
+
+
+class SharedArrays:
+    """
+    Numpy arrays in shared memory blocks. The parent creates them, workers attach to the blocks by name.
+    Only the parent unlinks the blocks.
+    """
+
+    def __init__(self, specs, names=None):
+        """
+        :param specs: {name: (shape, dtype)} of the arrays
+        :param names: {name: block name} to attach to existing blocks, new blocks are created without it
+        """
+        self.specs = specs
+        self.blocks = {}
+        self.arrays = {}
+        for name, (shape, dtype) in specs.items():
+            if names is None:
+                size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=names[name])
+            self.blocks[name] = block
+            self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def get_names(self):
+        return {name: block.name for name, block in self.blocks.items()}
+
+    def close(self):
+        # the arrays point into the blocks, they have to go first
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+
+    def unlink(self):
+        for block in self.blocks.values():
+            block.unlink()
+
+
+def _init_worker(runs, specs, names, settings):
+    global _worker
+    _worker = {"runs": runs, "shared": SharedArrays(specs, names), "settings": settings}
+
+
+def _run(index):
+    algorithm, parameters, environment_id, seed = _worker["runs"][index]
+    max_ticks, ticks_per_save, plateau_window, plateau_rate, keep_grids, use_cache = _worker["settings"]
+    arrays = _worker["shared"].arrays
+
+    plateau = (plateau_window, plateau_rate) if plateau_window > 0 else None
+    result = run_simulation(algorithm, environment_id, seed, max_ticks, parameters, plateau,
+                            get_result_cache() if use_cache else None)
+
+    # samples at the save ticks, the extra sample of the finishing tick is only kept as final coverage
+    curve = arrays["curves"][index]
+    for ticks, coverage, full_coverage in result["stats"]:
+        if ticks % ticks_per_save == 0:
+            curve[ticks // ticks_per_save] = coverage, full_coverage
+
+    arrays["ticks"][index] = result["ticks"]
+    arrays["outcomes"][index] = OUTCOME_CODES[result["outcome"]]
+    arrays["coverage"][index] = result["coverage"], result["full_coverage"]
+    arrays["tile_counts"][index] = result["tile_count"]
+    if keep_grids:
+        arrays["states"][index] = result["states"]
+    return index
+
+
+class ExperimentRunner:
+    """
+    Runs (algorithm, parameters, environment_id, seed) tuples headless with time warp in a pool of worker
+    processes. The results are numpy arrays indexed by run:
+
+    - curves: (runs, samples, 2) coverage and full coverage at every ticks_per_save ticks, NaN after the end
+    - states: (runs, columns, rows) TileState values of the final tile grid, only with keep_grids
+    - ticks, outcomes, tile_counts and coverage: (runs, 2) coverage and full coverage at the end
+    """
+
+    def __init__(self, runs, max_ticks=60000, workers=None, plateau_window=0, plateau_rate=0.02, keep_grids=True,
+                 use_cache=True):
+        self.runs = [(algorithm, tuple(parameters), str(environment_id), seed)
+                     for algorithm, parameters, environment_id, seed in runs]
+        self.max_ticks = max_ticks
+        self.workers = workers or os.cpu_count()
+        self.plateau_window = plateau_window
+        self.plateau_rate = plateau_rate
+        self.keep_grids = keep_grids
+        self.use_cache = use_cache
+
+        config = config_manager.get_snapshot()
+        self.ticks_per_save = config.ticks_per_save
+        self.samples = max_ticks // self.ticks_per_save + 1
+        self.columns = len(range(0, config.width, config.tile_size))
+        self.rows = len(range(0, config.height, config.tile_size))
+
+    def get_specs(self):
+        n = len(self.runs)
+        specs = {
+            "curves": ((n, self.samples, 2), np.float32),
+            "ticks": ((n,), np.int64),
+            "outcomes": ((n,), np.int8),
+            "coverage": ((n, 2), np.float64),
+            "tile_counts": ((n,), np.int64),
+        }
+        if self.keep_grids:
+            specs["states"] = ((n, self.columns, self.rows), np.int8)
+        return specs
+
+    def run(self, progress=None):
+        """
+        Runs everything and returns the results as {name: array}, copied out of shared memory
+
+        :param progress: called with the number of finished runs now and then
+        """
+        specs = self.get_specs()
+        shared = SharedArrays(specs)
+        try:
+            arrays = shared.arrays
+            arrays["curves"][...] = np.nan
+            arrays["outcomes"][...] = -1
+
+            settings = (self.max_ticks, self.ticks_per_save, self.plateau_window, self.plateau_rate, self.keep_grids,
+                        self.use_cache)
+            chunksize = max(1, len(self.runs) // (self.workers * 16))
+            with multiprocessing.Pool(self.workers, _init_worker,
+                                      (self.runs, specs, shared.get_names(), settings)) as pool:
+                for done, _ in enumerate(pool.imap_unordered(_run, range(len(self.runs)), chunksize), 1):
+                    if progress is not None and done % max(1, len(self.runs) // 20) == 0:
+                        progress(done)
+
+            return {name: array.copy() for name, array in arrays.items()}
+        finally:
+            shared.close()
+            shared.unlink()
+
+
+def summarize(runs, results):
+    """
+    Summary per (algorithm, parameters, environment) in the order of the runs. Ticks are of the finished
+    runs, the curve is the mean over the runs that still ran and tile_frequency the fraction of the runs
+    that covered a tile.
+    """
+    groups = {}
+    for index, (algorithm, parameters, environment_id, _) in enumerate(runs):
+        groups.setdefault((algorithm, tuple(parameters), str(environment_id)), []).append(index)
+
+    summaries = []
+    for (algorithm, parameters, environment_id), indices in groups.items():
+        indices = np.array(indices)
+        outcomes = results["outcomes"][indices]
+        finished_ticks = results["ticks"][indices][outcomes == FINISHED]
+        curves = results["curves"][indices, :, 1]
+        running = np.count_nonzero(~np.isnan(curves), axis=0)
+
+        summary = {
+            "algorithm": algorithm,
+            "parameters": parameters,
+            "environment": environment_id,
+            "runs": len(indices),
+            "finished": int(np.count_nonzero(outcomes == FINISHED)),
+            "plateaued": int(np.count_nonzero(outcomes == PLATEAUED)),
+            "mean_ticks": float(finished_ticks.mean()) if len(finished_ticks) else np.nan,
+            "median_ticks": float(np.median(finished_ticks)) if len(finished_ticks) else np.nan,
+            "p95_ticks": float(np.percentile(finished_ticks, 95)) if len(finished_ticks) else np.nan,
+            "final_full_coverage": float(results["coverage"][indices, 1].mean()),
+            "curve": np.where(running > 0, np.nansum(curves, axis=0) / np.maximum(running, 1), np.nan),
+        }
+        if "states" in results:
+            states = results["states"][indices]
+            covered = (states == TileState.COVERED.value) | (states == TileState.FULL_COVERED.value)
+            summary["tile_frequency"] = covered.mean(axis=0)
+        summaries.append(summary)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Large batches of headless runs on shared memory")
+    parser.add_argument("--algorithm", default="random")
+    parser.add_argument("--param", type=parse_param, action="append", default=[],
+                        help="name=value1,value2,... values of one parameter, can be repeated")
+    parser.add_argument("--environments", default=None, help="comma separated ids, all with a robot by default")
+    parser.add_argument("--seeds", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-ticks", type=int, default=60000)
+    parser.add_argument("--plateau-window", type=int, default=None,
+                        help="ticks over which the coverage growth is measured, 0 disables the plateau stop")
+    parser.add_argument("--plateau-rate", type=float, default=None,
+                        help="runs stop once the coverage grows less than this many percent per 1000 ticks")
+    parser.add_argument("--no-grids", action="store_true", help="do not keep the final tile grids")
+    parser.add_argument("--no-cache", action="store_true", help="simulate every run, even if its result is cached")
+    parser.add_argument("--save", default=None, help="write all results of the runs to this .npz file")
+    args = parser.parse_args()
+
+    config = config_manager.get_snapshot()
+    plateau_window = config.plateau_window if args.plateau_window is None else args.plateau_window
+    plateau_rate = config.plateau_min_rate if args.plateau_rate is None else args.plateau_rate
+
+    if args.environments:
+        environments = args.environments.split(",")
+    else:
+        environments = [env["id"] for env in config_manager.get_all_environments()
+                        if len(config_manager.get_environment(env["id"]).get("robot") or []) >= 3]
+
+    names = [name for name, _ in args.param]
+    candidates = [tuple(zip(names, values)) for values in itertools.product(*(values for _, values in args.param))]
+
+    try:
+        create_algorithm(args.algorithm, dict(candidates[0]))
+    except (KeyError, ValueError) as e:
+        parser.error(e.args[0])
+    runs = [(args.algorithm, candidate, env, seed)
+            for candidate in candidates for env in environments for seed in range(args.seeds)]
+
+    print("%d runs, %d parameter sets, %d environments, %d seeds, %d workers"
+          % (len(runs), len(candidates), len(environments), args.seeds, args.workers))
+
+    start = time.time()
+    runner = ExperimentRunner(runs, args.max_ticks, args.workers, plateau_window, plateau_rate, not args.no_grids,
+                              not args.no_cache)
+    results = runner.run(lambda done: print("%d/%d runs, %.1f s" % (done, len(runs), time.time() - start)))
+    elapsed = time.time() - start
+    print("%d runs in %.1f s, %.0f runs per minute" % (len(runs), elapsed, len(runs) / elapsed * 60))
+
+    print()
+    print("%-40s %4s %6s %8s %9s %10s %10s %10s %9s" % ("parameters", "env", "runs", "finished", "plateaued",
+                                                        "mean", "median", "p95", "coverage"))
+    for summary in summarize(runs, results):
+        print("%-40s %4s %6d %8d %9d %10.0f %10.0f %10.0f %8.1f%%"
+              % (format_parameters(summary["parameters"]), summary["environment"], summary["runs"],
+                 summary["finished"], summary["plateaued"], summary["mean_ticks"], summary["median_ticks"],
+                 summary["p95_ticks"], summary["final_full_coverage"]))
+
+    if args.save:
+        np.savez_compressed(args.save, ticks_per_save=runner.ticks_per_save,
+                            runs=np.array([repr(run) for run in runs]), **results)
+        print("saved to %s" % args.save)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+import math
+import random
+
+import numpy as np
+
+from EnvironmentTemplate import create_room_environment
+from algorithm import create_algorithm
+from events.EventType import EventType
+from sprite.Robot import RobotState
+from utils.PlateauDetector import PlateauDetector
+from utils.ResultCache import get_result_key
+from utils.config_manager import config_manager
+
+# extra clearance used by the time warp. The collision checks use the rounded integer rect of the robot
+# which can be up to sqrt(0.5) pixels away from the float position, everything closer is stepped tick by tick.
+WARP_CLEARANCE = 0.75
+
+
+def create_environment(environment_id, initial_events=True):
+    """
+    Build a RoomEnvironment for one of the environments of the config manager
+
+    :param initial_events: make the initial events for a visualizer, headless runs do not need them
+    """
+    env_config = config_manager.get_environment_config()
+    env_data = config_manager.get_environment(environment_id)
+    obstacles = env_data.get("obstacles", [])
+    robot = env_data.get("robot", [])
+    if not robot or len(robot) < 3:
+        robot = None
+
+    return create_room_environment(env_config["width"], env_config["height"], env_config["tile_size"], obstacles, robot,
+                                   initial_events)
+
+
+def run_simulation(algorithm, environment_id, seed, max_ticks=None, parameters=None, plateau=None, cache=None):
+    """
+    One headless run with time warp, seeded with random.seed(seed). With a ResultCache the result is
+    looked up by the content of the run first and stored after running it.
+
+    :param parameters: overrides of the algorithm parameters, dict or (name, value) pairs
+    :param plateau: (window, min_rate) of a PlateauDetector that stops the run
+    :returns: dict with ticks, outcome ("finished", "plateaued" or None), coverage, full_coverage, tile_count,
+        stats and states, the TileState values of the final tile grid as nested lists indexed [x][y]
+    """
+    key = None
+    if cache is not None:
+        key = get_result_key(algorithm, parameters, config_manager.get_environment(environment_id), seed, max_ticks,
+                             plateau)
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+    random.seed(seed)
+    environment = create_environment(environment_id, initial_events=False)
+    sim = HeadlessSimulation(create_algorithm(algorithm, dict(parameters or {})), environment, time_warp=True,
+                             plateau=PlateauDetector(*plateau) if plateau else None)
+    sim.run(max_ticks)
+
+    result = {
+        "ticks": sim.ticks,
+        "outcome": sim.outcome,
+        "coverage": sim.get_coverage_percentage(),
+        "full_coverage": sim.get_full_coverage_percentage(),
+        "tile_count": sim.tile_count,
+        "stats": [[int(ticks), float(coverage), float(full)] for ticks, coverage, full in sim.stats],
+        "states": environment.tile_grid.states.tolist(),
+    }
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+class HeadlessSimulation:
+    """
+    Runs a cleaning algorithm on an environment without any display. A tick behaves exactly like a tick of
+    the web simulation: the algorithm reacts, the environment checks the coverage, the statistic is updated
+    and the robot moves.
+
+    With time_warp the simulation jumps over ticks in which the robot walks a straight line: while the
+    robot is in RobotState.WALK and the algorithm promises to stay quiet until the next collision, the
+    number of collision free ticks is computed with a swept circle and only the coverage is updated for
+    those ticks. Tick counts and statistics are the same as with tick by tick stepping.
+
+    With a PlateauDetector the run also stops once the full coverage stopped growing, the outcome is then
+    "plateaued" instead of "finished". The detector sees the saved statistic, so a plateau is noticed on the
+    next save and, with time warp, at the end of the current segment.
+    """
+
+    def __init__(self, algorithm, environment, time_warp=False, max_warp_ticks=10000, plateau=None):
+        self.algorithm = algorithm
+        self.environment = environment
+        self.robot = environment.robot
+        self.time_warp = time_warp
+        self.max_warp_ticks = max_warp_ticks
+        self.plateau = plateau
+
+        if self.robot is None:
+            raise ValueError("a headless simulation needs an environment with a robot")
+        self.robot.render = False
+        self.algorithm.set_environment(environment)
+
+        config = config_manager.get_snapshot()
+        self.ticks_per_save = config.ticks_per_save
+        self.stop_at_coverage = config.stop_at_coverage
+
+        # --- used for statistic --
+        self.ticks = 0
+        self.tile_count = environment.get_tile_count()
+        self.covered_tiles = 0
+        self.full_covered_tiles = 0
+        self.stats = []
+        self.finished = False
+        self.plateaued = False
+        self.warped_ticks = 0
+
+    def get_full_coverage_percentage(self):
+        return self.full_covered_tiles / self.tile_count * 100 if self.tile_count > 0 else 0
+
+    def get_coverage_percentage(self):
+        return self.covered_tiles / self.tile_count * 100 if self.tile_count > 0 else 0
+
+    def save_stats(self):
+        self.stats.append([self.ticks, self.get_coverage_percentage(), self.get_full_coverage_percentage()])
+        if self.plateau is not None and not self.finished:
+            self.plateaued = self.plateau.add(self.ticks, self.get_full_coverage_percentage())
+
+    @property
+    def outcome(self):
+        """Outcome of the run: "finished" at the coverage goal, "plateaued" once the coverage stopped growing"""
+        if self.finished:
+            return "finished"
+        return "plateaued" if self.plateaued else None
+
+    def run(self, max_ticks=None):
+        """Step until the coverage goal is reached, the coverage plateaued or max_ticks ticks were simulated"""
+        while not self.finished and not self.plateaued and (max_ticks is None or self.ticks < max_ticks):
+            self.step(max_ticks)
+
+        return self.stats
+
+    def step(self, max_ticks=None):
+        """Advance the simulation by one tick or, with time warp, by a whole straight walk segment"""
+        if self.finished or self.plateaued:
+            return False
+
+        if self.time_warp:
+            ticks = self.get_warp_ticks()
+            if max_ticks is not None:
+                ticks = min(ticks, max_ticks - self.ticks)
+            if ticks > 1:
+                return self._warp(ticks)
+
+        configuration_events = self.algorithm.update(self.environment.obstacles, self.robot)
+        self._count_coverage(self.environment.update(configuration_events))
+        return self._advance()
+
+    def _count_coverage(self, events):
+        for event in events:
+            if event.type == EventType.TILES_COVERED:
+                self.covered_tiles = self.covered_tiles + len(event.first_covered_tiles())
+                self.full_covered_tiles = self.full_covered_tiles + len(event.full_covered_tiles())
+
+    def _advance(self):
+        # same order as Visualizer.update: save, check the stop condition, count the tick and move the robot
+        if self.ticks % self.ticks_per_save == 0:
+            self.save_stats()
+
+        if self.get_full_coverage_percentage() >= self.stop_at_coverage:
+            self.save_stats()
+            self.finished = True
+            return False
+
+        self.ticks = self.ticks + 1
+        self.robot.update()
+        return True
+
+    def get_warp_ticks(self):
+        """Number of coming ticks in which neither the algorithm nor a collision changes the robot"""
+        robot = self.robot
+        if robot.state != RobotState.WALK or robot.busy or not self.algorithm.started:
+            return 0
+
+        horizon = min(self.algorithm.get_quiet_ticks(robot), self.max_warp_ticks)
+        if horizon <= 1:
+            return 0
+
+        wss = robot.custom_wss
+        r = robot.radius + WARP_CLEARANCE
+        cx, cy = robot.x + robot.radius, robot.y + robot.radius
+
+        # the distance field of the environment only sweeps the circle exactly against the obstacles nearby
+        field = self.environment.get_distance_field()
+        if field.touches(cx, cy, r):
+            return 0
+        if wss <= 0:
+            return int(horizon)
+        free_distance = field.get_ray_distance(cx, cy, -robot.direction[0], -robot.direction[1], r, wss * horizon)
+        if free_distance > wss * horizon:
+            return int(horizon)
+
+        # positions 0 .. n-1 of the segment keep the clearance
+        return int(min(horizon, math.floor(free_distance / wss) + 1))
+
+    def _warp(self, ticks):
+        robot = self.robot
+        start = self.ticks
+
+        # positions of the coming ticks, summed up in the same order as Robot.move does
+        dx, dy = -robot.direction[0] * robot.custom_wss, -robot.direction[1] * robot.custom_wss
+        xs = np.cumsum(np.concatenate(([robot.x], np.full(ticks, dx))))
+        ys = np.cumsum(np.concatenate(([robot.y], np.full(ticks, dy))))
+
+        # coverage counts after the coverage check of every tick, the goal may be reached inside the segment
+        first_ticks, full_ticks = self.environment.cover_path(xs[:ticks], ys[:ticks], apply=False)
+        covered = self.covered_tiles + np.cumsum(np.bincount(first_ticks, minlength=ticks))
+        full = self.full_covered_tiles + np.cumsum(np.bincount(full_ticks, minlength=ticks))
+        done = np.nonzero(full / self.tile_count * 100 >= self.stop_at_coverage)[0] if self.tile_count > 0 \
+            else np.nonzero(np.zeros(ticks) >= self.stop_at_coverage)[0]
+        steps = int(done[0]) + 1 if len(done) > 0 else ticks
+
+        self.environment.cover_path(xs[:steps], ys[:steps])
+
+        for i in range((-start) % self.ticks_per_save, steps, self.ticks_per_save):
+            self.ticks, self.covered_tiles, self.full_covered_tiles = start + i, int(covered[i]), int(full[i])
+            self.save_stats()
+
+        last = steps - 1
+        self.covered_tiles, self.full_covered_tiles = int(covered[last]), int(full[last])
+        if len(done) > 0:
+            self.ticks = start + last
+            self.save_stats()
+            self.finished = True
+            moved = last
+        else:
+            self.ticks = start + ticks
+            moved = ticks
+
+        robot.x, robot.y = xs[moved], ys[moved]
+        robot.rect.x, robot.rect.y = robot.x, robot.y
+
+        self.algorithm.skip_ticks(moved)
+        self.warped_ticks = self.warped_ticks + moved
+        return not self.finished
@@ -0,0 +1,301 @@
+"""
+Monte Carlo estimate of the coverage of RandomBounceWalkAlgorithm.
+Simulates many random bounce robots at once on one environment and reports the distribution of the ticks
+until they reach 50%, 75% and 90% full coverage.
+
+Usage: python RandomBounceMonteCarlo.py [--environment 1] [--robots 1000] [--max-ticks 100000] [--seed 0]
+"""
+
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from HeadlessSimulation import create_environment
+from RoomEnvironment import get_obstacle_rect
+from algorithm.RandomBounceWalkAlgorithm import RandomBounceWalkAlgorithm
+from sprite.Tile import TileState, get_cover_parameters, get_full_cover_calls
+from utils.ConfigurationSpace import get_configuration_space
+from utils.mathUtils import get_direction
+
+# robot states, see RobotState
+WALK, ROTATE, WALK_BACKWARDS_THEN_ROTATE = 0, 1, 2
+
+# distance the robot walks backwards after a collision, see Robot.update
+BACKWARDS_DISTANCE = 15
+
+DEFAULT_THRESHOLDS = (50, 75, 90)
+
+
+class RandomBounceMonteCarlo:
+    """
+    Runs n robots with the rules of RandomBounceWalkAlgorithm and Robot tick by tick as numpy arrays. A tick
+    does what a tick of HeadlessSimulation does: a robot that is not busy and collides gets a random bounce
+    angle, the tiles under the robot are covered and the robot walks, walks backwards or rotates. Collisions
+    are looked up in the ConfigurationSpace of the obstacles, so they are decided exactly like
+    Robot.collides_rectangle does. Every robot has its own tile counts and stops when it reached the highest
+    threshold.
+    """
+
+    def __init__(self, environment, robots=1000, thresholds=DEFAULT_THRESHOLDS, parameters=None, seed=None):
+        """
+        :param environment: RoomEnvironment with a robot, its start position is the start of every robot
+        :param parameters: parameters of RandomBounceWalkAlgorithm, see create_algorithm
+        """
+        robot = environment.robot
+        if robot is None:
+            raise ValueError("the Monte Carlo estimate needs an environment with a robot")
+        if robot.continuous_collision:
+            raise ValueError("continuous collision is not supported by the Monte Carlo estimate")
+        if robot.radius != int(robot.radius) or robot.rss != int(robot.rss):
+            raise ValueError("the Monte Carlo estimate needs an integer radius and rotation speed")
+
+        algorithm = RandomBounceWalkAlgorithm(parameters)
+        self.min_bounce_angle, self.max_bounce_angle = algorithm.min_bounce_angle, algorithm.max_bounce_angle
+        self.rng = np.random.default_rng(seed)
+        self.thresholds = tuple(sorted(thresholds))
+
+        self.radius = int(robot.radius)
+        self.wss, self.rss = robot.wss, int(robot.rss)
+        self.space = get_configuration_space([get_obstacle_rect(o) for o in environment.obstacles], self.radius)
+        # same rounded unit vectors as Robot.direction for every integer angle
+        self.directions = np.array([get_direction(angle) for angle in range(360)], dtype=np.float64)
+
+        grid = environment.tile_grid
+        self.tile_size = environment.tile_size
+        self.columns, self.rows = grid.columns, grid.rows
+        self.coverable = ((grid.states == TileState.UNCOVERED.value) | (grid.states == TileState.COVERED.value)).ravel()
+        self.tile_count = environment.get_tile_count()
+        _, _, _, steps = get_cover_parameters()
+        # with fractional steps a tile never gets full covered, see TileGrid.cover
+        self.full_calls = get_full_cover_calls() if steps == int(steps) and steps >= 1 else math.inf
+        self._make_cover_patterns()
+
+        self.n = robots
+        self.ids = np.arange(robots)
+        self.x = np.full(robots, float(robot.x))
+        self.y = np.full(robots, float(robot.y))
+        self.rect_x = np.full(robots, robot.rect.x, dtype=np.int64)
+        self.rect_y = np.full(robots, robot.rect.y, dtype=np.int64)
+        self.angle = np.full(robots, int(robot.angle) % 360, dtype=np.int64)
+        self.angle_delta = np.zeros(robots, dtype=np.int64)
+        self.walk_delta = np.zeros(robots, dtype=np.int64)
+        self.state = np.full(robots, WALK, dtype=np.int8)
+        self.busy = np.zeros(robots, dtype=bool)
+        self.counts = np.zeros((robots, len(self.coverable)), dtype=np.int32)
+        self.full = np.zeros(robots, dtype=np.int64)
+
+        self.ticks = 0
+        # tick at which every robot reached a threshold, -1 if it did not
+        self.reached = np.full((robots, len(self.thresholds)), -1, dtype=np.int64)
+
+    def _make_cover_patterns(self):
+        # tiles covered by a robot whose rect starts ox, oy pixels right of and below the corner of a tile,
+        # the same check as Robot.covers_tile. The counts are kept on the tile grid with a margin of k tiles
+        # that can not be covered, so the covered tiles of a robot never wrap around into the next column.
+        ts, r = self.tile_size, self.radius
+        k = int(math.ceil(2 * r / ts)) + 1
+        offsets = np.arange(ts)
+        edges = np.arange(k)[None, :] * ts - offsets[:, None] - r
+        d = np.maximum(edges ** 2, (edges + ts) ** 2)  # [offset, tile]
+        patterns = np.sqrt(d[:, None, :, None] + d[None, :, None, :]) < r  # [ox, oy, i, j]
+
+        self.margin = k
+        self.padded_rows = self.rows + 2 * k
+        coverable = np.zeros((self.columns + 2 * k, self.padded_rows), dtype=bool)
+        coverable[k:k + self.columns, k:k + self.rows] = self.coverable.reshape(self.columns, self.rows)
+        self.coverable = coverable.ravel()
+
+        # offsets of the covered tiles in the padded grid, padded up to the same length with invalid entries
+        size = max(int(patterns[ox, oy].sum()) for ox in range(ts) for oy in range(ts))
+        self.cover_offsets = np.zeros((ts, ts, size), dtype=np.int64)
+        self.cover_valid = np.zeros((ts, ts, size), dtype=bool)
+        for ox in range(ts):
+            for oy in range(ts):
+                i, j = np.nonzero(patterns[ox, oy])
+                self.cover_offsets[ox, oy, :len(i)] = i * self.padded_rows + j
+                self.cover_valid[ox, oy, :len(i)] = True
+
+    def run(self, max_ticks=100000):
+        """Step until every robot reached the highest threshold or max_ticks ticks were simulated"""
+        while self.n > 0 and self.ticks < max_ticks:
+            self.step()
+        return self.reached
+
+    def step(self):
+        self._bounce()
+        self._cover()
+        self._check_thresholds()
+        if self.n > 0:
+            self.ticks = self.ticks + 1
+            self._move()
+
+    def _bounce(self):
+        # RandomBounceWalkAlgorithm.update
+        cx, cy = self.rect_x + self.radius, self.rect_y + self.radius
+        occupied = self.space.occupied
+        ix, iy = cx - self.space.x0, cy - self.space.y0
+        inside = (ix >= 0) & (ix < occupied.shape[0]) & (iy >= 0) & (iy < occupied.shape[1])
+        colliding = np.zeros(self.n, dtype=bool)
+        colliding[inside] = occupied[ix[inside], iy[inside]]
+        hit = np.nonzero(~self.busy & colliding)[0]
+        if len(hit) == 0:
+            return
+
+        angles = self.rng.integers(self.min_bounce_angle, self.max_bounce_angle + 1, len(hit))
+        negative = self.rng.integers(0, 2, len(hit)) == 1
+        self.angle_delta[hit] = np.where(negative, -angles, angles)
+        self.state[hit] = WALK_BACKWARDS_THEN_ROTATE
+
+    def _cover(self):
+        # RoomEnvironment.check_for_new_covered_tiles with tile counts instead of tile states
+        ts, k = self.tile_size, self.margin
+        left, top = self.rect_x, self.rect_y
+        bx = np.clip(left // ts, -k, self.columns) + k
+        by = np.clip(top // ts, -k, self.rows) + k
+        ox, oy = left % ts, top % ts
+        tiles = (bx * self.padded_rows + by)[:, None] + self.cover_offsets[ox, oy]
+        valid = self.cover_valid[ox, oy] & self.coverable[tiles]
+
+        # a robot covers a tile at most once per tick, so there are no repeated indices
+        width = self.counts.shape[1]
+        flat = ((np.arange(self.n) * width)[:, None] + tiles)[valid]
+        counts = self.counts.ravel()
+        counts[flat] += 1
+        newly_full = flat[counts[flat] == self.full_calls] // width
+        if len(newly_full):
+            self.full += np.bincount(newly_full, minlength=self.n)
+
+    def _check_thresholds(self):
+        percentage = self.full / self.tile_count * 100 if self.tile_count > 0 else np.zeros(self.n)
+        for t, threshold in enumerate(self.thresholds):
+            reached = (percentage >= threshold) & (self.reached[self.ids, t] < 0)
+            self.reached[self.ids[reached], t] = self.ticks
+
+        done = self.reached[self.ids, -1] >= 0
+        if done.any():
+            self._keep(~done)
+
+    def _keep(self, keep):
+        for name in ("ids", "x", "y", "rect_x", "rect_y", "angle", "angle_delta", "walk_delta", "state", "busy",
+                     "counts", "full"):
+            setattr(self, name, getattr(self, name)[keep])
+        self.n = len(self.ids)
+
+    def _move(self):
+        # Robot.update, the states are handled in the same order
+        rotating = np.nonzero(self.state == ROTATE)[0]
+        if len(rotating):
+            self.busy[rotating] = True
+            delta = self.angle_delta[rotating]
+            finished = np.abs(delta) < self.rss
+            done = rotating[finished]
+            self.angle[done] = (self.angle[done] - delta[finished]) % 360
+            self.angle_delta[done] = 0
+            self.state[done] = WALK
+            self.busy[done] = False
+
+            turning = rotating[~finished]
+            sign = np.sign(self.angle_delta[turning])
+            self.angle[turning] = (self.angle[turning] + sign * self.rss) % 360
+            self.angle_delta[turning] = self.angle_delta[turning] - sign * self.rss
+
+        walking = np.nonzero(self.state == WALK)[0]
+        direction = self.directions[self.angle[walking]]
+        self.x[walking] = self.x[walking] + -direction[:, 0] * self.wss
+        self.y[walking] = self.y[walking] + -direction[:, 1] * self.wss
+
+        backwards = np.nonzero(self.state == WALK_BACKWARDS_THEN_ROTATE)[0]
+        if len(backwards):
+            starting = backwards[~self.busy[backwards]]
+            self.busy[starting] = True
+            self.walk_delta[starting] = BACKWARDS_DISTANCE
+
+            moving = backwards[self.walk_delta[backwards] != 0]
+            direction = self.directions[self.angle[moving]]
+            self.x[moving] = self.x[moving] + direction[:, 0] * self.wss
+            self.y[moving] = self.y[moving] + direction[:, 1] * self.wss
+            self.walk_delta[moving] = self.walk_delta[moving] - 2
+
+            ending = backwards[self.walk_delta[backwards] <= 0]
+            self.y[ending] = self.y[ending] + self.walk_delta[ending]
+            self.walk_delta[ending] = 0
+            self.state[ending] = ROTATE
+
+        # pygame rounds the float position half away from zero into the rect
+        self.rect_x = (np.sign(self.x) * np.floor(np.abs(self.x) + 0.5)).astype(np.int64)
+        self.rect_y = (np.sign(self.y) * np.floor(np.abs(self.y) + 0.5)).astype(np.int64)
+
+    def get_summary(self, confidence=0.95):
+        """
+        Per threshold the number of robots that reached it, the mean ticks with a normal confidence interval
+        and the 5%, 50% and 95% quantiles of the ticks. Robots that did not reach a threshold count as
+        infinitely slow in the quantiles. The mean of the robots that did would be biased low, so mean and
+        interval are NaN unless every robot reached the threshold.
+        """
+        z = _normal_quantile(0.5 + confidence / 2)
+        summary = []
+        for t, threshold in enumerate(self.thresholds):
+            ticks = self.reached[:, t]
+            reached = ticks[ticks >= 0].astype(np.float64)
+            complete = len(reached) == len(ticks)
+            mean = reached.mean() if complete and len(reached) else math.nan
+            half_width = z * reached.std(ddof=1) / math.sqrt(len(reached)) if complete and len(reached) > 1 \
+                else math.nan
+            all_ticks = np.where(ticks >= 0, ticks, np.inf)
+            quantiles = np.quantile(all_ticks, (0.05, 0.5, 0.95), method="higher")
+            summary.append({
+                "threshold": threshold,
+                "reached": len(reached),
+                "robots": len(ticks),
+                "mean": mean,
+                "ci": (mean - half_width, mean + half_width),
+                "p5": quantiles[0],
+                "median": quantiles[1],
+                "p95": quantiles[2],
+            })
+        return summary
+
+
+def _normal_quantile(p):
+    # inverse of the standard normal distribution function by bisection of math.erf
+    lo, hi = -10.0, 10.0
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if 0.5 * (1 + math.erf(mid / math.sqrt(2))) < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo estimate of the random bounce coverage")
+    parser.add_argument("--environment", default="1")
+    parser.add_argument("--robots", type=int, default=1000)
+    parser.add_argument("--max-ticks", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    args = parser.parse_args()
+
+    start = time.time()
+    estimator = RandomBounceMonteCarlo(create_environment(args.environment), robots=args.robots, seed=args.seed)
+    estimator.run(args.max_ticks)
+    print("%d robots on environment %s, %d ticks in %.1f s"
+          % (args.robots, args.environment, estimator.ticks, time.time() - start))
+
+    print("%9s %9s %10s %22s %8s %8s %8s" % ("coverage", "reached", "mean", "%d%% interval" % (args.confidence * 100),
+                                             "p5", "median", "p95"))
+    for row in estimator.get_summary(args.confidence):
+        print("%8d%% %4d/%-4d %10.0f %10.0f - %-9.0f %8.0f %8.0f %8.0f"
+              % (row["threshold"], row["reached"], row["robots"], row["mean"], row["ci"][0], row["ci"][1],
+                 row["p5"], row["median"], row["p95"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,21 @@
+import math
+
+import numpy as np
+
 from events.EventType import EventType
 from events.ObstacleAdded import ObstacleAdded
 from events.RobotPlaced import RobotPlaced
-from events.TileCovered import TileCovered
-from events.TileCoveredByObstacle import TileCoveredByObstacle
+from events.TilesCoveredByObstacle import TilesCoveredByObstacle
+from events.TilesCovered import TilesCovered
 from sprite import Box
-from sprite.Obstacle import Obstacle
+from sprite.Obstacle import Obstacle, create_obstacles
 from sprite.Robot import Robot
-from sprite.Tile import Tile, TileState
+from sprite.Tile import Tile, TileGrid, TileState, TILE_STATES
+from utils.ConfigurationSpace import get_configuration_space, extend_configuration_space
+from utils.CoverageQuadTree import CoverageQuadTree
+from utils.ReachableTiles import get_reachable_tiles
+from utils.SignedDistanceField import get_signed_distance_field
 from utils.colorUtils import DARK_GREY
-from utils.listUtils import filter_none
 
 
 class RoomEnvironment:
@@ -18,12 +25,18 @@ class RoomEnvironment:
         self.obstacles = []
         self.walls = []
         self.tiles = []
+        self.tile_grid = None
+        self.coverage_tree = None
+        self.configuration_space = None
+        self.distance_field = None
         self.robot = None
 
         self.width = width
         self.height = height
         self.tile_size = tile_size
 
+        self.event_handlers = self._get_event_handlers()
+
         self.initialize_tiles()
         self.initial_events.extend(self.initialize_walls())
 
@@ -33,21 +46,58 @@ class RoomEnvironment:
         if robot is not None:
             self.initialize_default_robot(robot)
 
+    def _get_event_handlers(self):
+        return {
+            EventType.OBSTACLE_DRAWN: self._on_obstacle_drawn,
+            EventType.ROBOT_DRAWN: self._on_robot_drawn,
+            EventType.CONFIGURATION_CHANGED: self._on_configuration_changed,
+        }
+
+    def copy(self):
+        """
+        Environment with the same walls, obstacles and tile states. The obstacle sprites and everything built
+        from them are shared, the tile arrays are shared until one of the environments writes to them.
+        The robot is not copied and the copy has no initial events.
+        """
+        env = RoomEnvironment.__new__(RoomEnvironment)
+        env.initial_events = []
+        env.width, env.height, env.tile_size = self.width, self.height, self.tile_size
+        env.event_handlers = env._get_event_handlers()
+
+        env.obstacles = list(self.obstacles)
+        env.walls = list(self.walls)
+        env.tile_grid = self.tile_grid.copy()
+        env.tiles = [[None] * env.tile_grid.rows for _ in range(env.tile_grid.columns)]
+        env.coverage_tree = self.coverage_tree.copy()
+        env.configuration_space = None
+        env.distance_field = self.distance_field
+        env.robot = None
+        return env
+
     def update(self, events):
         new_events = []
+        handlers = self.event_handlers
 
         for event in events:
             if event is not None:
-                if event.type == EventType.OBSTACLE_DRAWN:
-                    new_events.extend(self.handle_drawn_obstacle(event.drawn_obstacle))
-                if event.type == EventType.ROBOT_DRAWN:
-                    new_events.append(self.handle_drawn_robot(event.drawn_robot))
-                if event.type == EventType.CONFIGURATION_CHANGED:
-                    new_events.append(self.handle_configuration_changed(event))
+                handler = handlers.get(event.type)
+                if handler is not None:
+                    handler(event, new_events)
 
         new_events.extend(self.check_for_new_covered_tiles())
 
-        return filter_none(new_events)
+        return new_events
+
+    def _on_obstacle_drawn(self, event, new_events):
+        events = self.handle_drawn_obstacle(event.drawn_obstacle)
+        if events is not None:
+            new_events.extend(events)
+
+    def _on_robot_drawn(self, event, new_events):
+        new_events.append(self.handle_drawn_robot(event.drawn_robot))
+
+    def _on_configuration_changed(self, event, new_events):
+        self.handle_configuration_changed(event)
 
     def initialize_walls(self):
         wall_color = DARK_GREY
@@ -64,12 +114,19 @@ class RoomEnvironment:
         return events
 
     def initialize_tiles(self):
-        for x in range(0, self.width, self.tile_size):
-            col = []
-            for y in range(0, self.height, self.tile_size):
-                col.append(Tile(x, y))
-
-            self.tiles.append(col)
+        self.tile_grid = TileGrid(len(range(0, self.width, self.tile_size)), len(range(0, self.height, self.tile_size)))
+        # the Tile sprites are only created when a tile is used, see get_tile
+        self.tiles = [[None] * self.tile_grid.rows for _ in range(self.tile_grid.columns)]
+        self.coverage_tree = CoverageQuadTree.from_states(self.tile_grid.states)
+
+    def get_tile(self, ix: int, iy: int):
+        """Tile sprite of the tile indices, negative indices count from the end like for lists"""
+        tile = self.tiles[ix][iy]
+        if tile is None:
+            ix, iy = int(ix) % self.tile_grid.columns, int(iy) % self.tile_grid.rows
+            tile = Tile(ix * self.tile_size, iy * self.tile_size, self.tile_grid, ix, iy)
+            self.tiles[ix][iy] = tile
+        return tile
 
     def get_params(self):
         return self.width, self.height, self.tile_size
@@ -80,6 +137,13 @@ class RoomEnvironment:
 
     def set_robot(self, robot):
         self.robot = robot
+        self.robot.obstacles = self.obstacles
+
+        # the bitmap is made for integer centers, which needs an integer radius
+        if robot.radius == int(robot.radius):
+            self.configuration_space = get_configuration_space(
+                [get_obstacle_rect(o) for o in self.obstacles], int(robot.radius))
+            robot.configuration_space = self.configuration_space
 
     def handle_drawn_obstacle(self, obstacle):
         x, y = obstacle[0], obstacle[1]
@@ -119,13 +183,43 @@ class RoomEnvironment:
         return events
 
     def _add_obstacle(self, obstacle: Obstacle):
-        self.obstacles.append(obstacle)
-        affected_tiles = self.get_affected_tiles(obstacle.rect.x, obstacle.rect.y, obstacle.width, obstacle.height)
-        events = []
-        for tile in affected_tiles:
-            events.append(TileCoveredByObstacle(tile))
-
-        return events
+        return self._add_obstacles([obstacle])
+
+    def _add_obstacles(self, obstacles):
+        # adds the rectangles of one obstacle, a circle or polygon is made of many of them
+        self.obstacles.extend(obstacles)
+        self.distance_field = None
+        if self.configuration_space is not None:
+            self.configuration_space = extend_configuration_space(
+                self.configuration_space, [get_obstacle_rect(o) for o in obstacles])
+            self.robot.configuration_space = self.configuration_space
+
+        # same tiles as get_affected_tiles, which fails past the grid and wraps negative indices around
+        grid = self.tile_grid
+        mask = np.zeros((grid.columns, grid.rows), dtype=bool)
+        for obstacle in obstacles:
+            start_x, end_x, start_y, end_y = self._get_affected_range(
+                obstacle.rect.x, obstacle.rect.y, obstacle.width, obstacle.height)
+            if end_x >= grid.columns or end_y >= grid.rows:
+                raise IndexError("obstacle is outside of the tile grid")
+            if start_x >= 0 and start_y >= 0:
+                mask[start_x:end_x + 1, start_y:end_y + 1] = True
+            else:
+                mask[np.ix_(np.arange(start_x, end_x + 1) % grid.columns,
+                            np.arange(start_y, end_y + 1) % grid.rows)] = True
+
+        ixs, iys = np.nonzero(mask)
+        if len(ixs) == 0:
+            return []
+
+        old_states = grid.states[ixs, iys]
+        grid.make_writable()
+        grid.states[ixs, iys] = TileState.COVERED_BY_OBSTACLE.value
+        self._update_coverage_tree_bulk(ixs, iys, old_states)
+
+        indices = list(zip(ixs.tolist(), iys.tolist()))
+        tiles = [self.get_tile(ix, iy) for ix, iy in indices]
+        return [TilesCoveredByObstacle(tiles, indices)]
 
     def handle_drawn_robot(self, robot):
         x, y, radius = robot[0], robot[1], robot[2]
@@ -137,52 +231,232 @@ class RoomEnvironment:
             return RobotPlaced(self.robot)
 
         new_robot = Robot(x, y, radius)
-        self.robot = new_robot
+        self.set_robot(new_robot)
         return RobotPlaced(new_robot)
 
     def handle_configuration_changed(self, event):
         self.robot.set_configuration(event)
 
     def check_for_new_covered_tiles(self):
-        covered_tiles_events = []
-        if self.robot is not None:
-            x, y, r = self.robot.x, self.robot.y, self.robot.radius
-            affected_tiles = self.get_affected_tiles(x, y, r * 2, r * 2)
-            affected_covered_tiles = list(filter(lambda t: ((t.state == TileState.UNCOVERED or t.state == TileState.COVERED) and not t.state == TileState.FULL_COVERED) and self.robot.covers_tile(t),
-                                                 affected_tiles))
+        if self.robot is None:
+            return []
+
+        robot = self.robot
+        r = robot.radius
+        grid = self.tile_grid
+        start_x, end_x, start_y, end_y = self._get_affected_range(robot.x, robot.y, r * 2, r * 2)
+
+        # same tiles as get_affected_tiles, which fails past the grid and wraps negative indices around
+        if end_x >= grid.columns or end_y >= grid.rows:
+            raise IndexError("robot is outside of the tile grid")
+        ixs, iys = np.meshgrid(np.arange(start_x, end_x + 1), np.arange(start_y, end_y + 1), indexing="ij")
+        ixs, iys = ixs.ravel() % grid.columns, iys.ravel() % grid.rows
+
+        covered = self._covers_tiles(robot.rect.x + r, robot.rect.y + r, r, ixs, iys)
+        ixs, iys = ixs[covered], iys[covered]
+        if len(ixs) == 0:
+            return []
+
+        mask, old_states, first_call, full_call = grid.cover(ixs, iys, np.ones(len(ixs), dtype=np.int64))
+        if not mask.any():
+            return []
+
+        tiles, indices, first_covered, full_covered = [], [], [], []
+        for k in np.nonzero(mask)[0]:
+            tile = self.get_tile(ixs[k], iys[k])
+            tiles.append(tile)
+            indices.append((int(ixs[k]), int(iys[k])))
+            if first_call[k] >= 0:
+                first_covered.append(tile)
+            if full_call[k] >= 0:
+                full_covered.append(tile)
+
+        self._update_coverage_tree_bulk(ixs[mask], iys[mask], old_states[mask])
+        return [TilesCovered(tiles, indices, first_covered, full_covered)]
+
+    def cover_path(self, xs, ys, apply=True):
+        """
+        Coverage of a whole robot path in one vectorized pass. xs and ys are the float positions of the
+        robot (Robot.x and Robot.y) in consecutive ticks, a straight walk sweeps a capsule shaped area.
+        Every position counts like one call of check_for_new_covered_tiles, so the cover counts follow
+        the ticks_for_cover semantics of Tile.increase_cover_count. Recorded trajectories can be replayed
+        on a fresh environment the same way.
+
+        :param apply: write the new tile states, otherwise only report what would change
+        :returns: (first_cover_ticks, full_cover_ticks), the indices into xs of every tick in which a tile
+            was covered for the first time or became full covered
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        empty = np.zeros(0, dtype=np.int64)
+        if self.robot is None or len(xs) == 0:
+            return empty, empty
+
+        grid = self.tile_grid
+        r = self.robot.radius
+        ts = self.tile_size
+
+        # the robot rect rounds half away from zero, the covered tiles lie in a window of k tiles
+        cx = np.sign(xs) * np.floor(np.abs(xs) + 0.5) + r
+        cy = np.sign(ys) * np.floor(np.abs(ys) + 0.5) + r
+        k = int(2 * r // ts) + 2
+        wx = np.trunc(xs / ts).astype(np.int64)[:, None] + np.arange(k)
+        wy = np.trunc(ys / ts).astype(np.int64)[:, None] + np.arange(k)
+
+        covered = self._covers_window(cx, cy, r, wx, wy)
+        covered &= ((wx >= 0) & (wx < grid.columns))[:, :, None] & ((wy >= 0) & (wy < grid.rows))[:, None, :]
+        ticks, i, j = np.nonzero(covered)
+        if len(ticks) == 0:
+            return empty, empty
+
+        # group the covering ticks by tile, in tick order
+        tile_ids = wx[ticks, i] * grid.rows + wy[ticks, j]
+        order = np.lexsort((ticks, tile_ids))
+        tile_ids, ticks = tile_ids[order], ticks[order]
+        unique_ids, starts, calls = np.unique(tile_ids, return_index=True, return_counts=True)
+        ixs, iys = unique_ids // grid.rows, unique_ids % grid.rows
+
+        mask, old_states, first_call, full_call = grid.cover(ixs, iys, calls, apply)
+        first_ticks = ticks[starts[first_call >= 0] + first_call[first_call >= 0]]
+        full_ticks = ticks[starts[full_call >= 0] + full_call[full_call >= 0]]
+
+        if apply:
+            self._update_coverage_tree_bulk(ixs[mask], iys[mask], old_states[mask])
+
+        return np.sort(first_ticks), np.sort(full_ticks)
+
+    def _covers_tiles(self, cx, cy, r, ixs, iys):
+        # Robot.covers_tile for many tiles: all four corners closer to the center than the radius
+        ts = self.tile_size
+        dx = np.maximum((ixs * ts - cx) ** 2, (ixs * ts + ts - cx) ** 2)
+        dy = np.maximum((iys * ts - cy) ** 2, (iys * ts + ts - cy) ** 2)
+        return np.sqrt(dx + dy) < r
+
+    def _covers_window(self, cx, cy, r, wx, wy):
+        # _covers_tiles for a window of tiles per position, shape (positions, columns, rows)
+        ts = self.tile_size
+        dx = np.maximum((wx * ts - cx[:, None]) ** 2, (wx * ts + ts - cx[:, None]) ** 2)
+        dy = np.maximum((wy * ts - cy[:, None]) ** 2, (wy * ts + ts - cy[:, None]) ** 2)
+        return np.sqrt(dx[:, :, None] + dy[:, None, :]) < r
+
+    def _update_coverage_tree_bulk(self, ixs, iys, old_states):
+        new_states = self.tile_grid.states[ixs, iys]
+        for ix, iy, old_state, new_state in zip(ixs.tolist(), iys.tolist(), old_states.tolist(), new_states.tolist()):
+            if old_state != new_state:
+                self.coverage_tree.update(ix, iy, TILE_STATES[old_state], TILE_STATES[new_state])
+
+    def _update_coverage_tree(self, tile, old_state):
+        if tile.state != old_state:
+            self.coverage_tree.update(tile.rect.x // self.tile_size, tile.rect.y // self.tile_size, old_state, tile.state)
+
+    def _get_tile_range(self, x, y, width, height):
+        # tile indices [x0, x1) x [y0, y1) of all tiles touched by the given rectangle in pixels
+        x0, y0 = int(x // self.tile_size), int(y // self.tile_size)
+        x1 = int(-(-(x + width) // self.tile_size))
+        y1 = int(-(-(y + height) // self.tile_size))
+        return x0, y0, x1, y1
+
+    def get_region_coverage_percentage(self, x, y, width, height):
+        return self.coverage_tree.coverage_percentage(*self._get_tile_range(x, y, width, height))
+
+    def get_region_full_coverage_percentage(self, x, y, width, height):
+        return self.coverage_tree.full_coverage_percentage(*self._get_tile_range(x, y, width, height))
+
+    def is_region_done(self, x, y, width, height):
+        return self.coverage_tree.is_done(*self._get_tile_range(x, y, width, height))
+
+    def get_nearest_uncovered_tile(self, x=None, y=None):
+        """Return the uncovered tile closest to the given point, defaults to the center of the robot"""
+        if x is None or y is None:
+            if self.robot is None:
+                return None
+            x, y = self.robot.rect.x + self.robot.radius, self.robot.rect.y + self.robot.radius
+
+        nearest = self.coverage_tree.nearest_uncovered(x / self.tile_size, y / self.tile_size)
+        if nearest is None:
+            return None
 
-            covered_tiles_events.extend(map(lambda t: TileCovered(t), affected_covered_tiles))
-        return covered_tiles_events
+        return self.get_tile(nearest[0], nearest[1])
 
-    def get_affected_tiles(self, x, y, width, height):
-        affected_tiles = []
+    def get_distance_field(self):
+        """SignedDistanceField of the obstacles, computed on the first query after they changed"""
+        if self.distance_field is None:
+            self.distance_field = get_signed_distance_field([get_obstacle_rect(o) for o in self.obstacles])
+        return self.distance_field
+
+    def get_clearance(self, x, y):
+        """Distance of the pixel (x, y) to the closest obstacle, negative inside of obstacles"""
+        return self.get_distance_field().get_clearance(x, y)
+
+    def get_ray_distance(self, x, y, dx, dy, radius=0):
+        """Distance a circle with the radius can move from (x, y) in direction (dx, dy) before it touches an obstacle"""
+        return self.get_distance_field().get_ray_distance(x, y, dx, dy, radius)
+
+    def get_walk_distance(self, robot=None):
+        """Distance the robot can walk straight on in its current direction before it touches an obstacle"""
+        robot = self.robot if robot is None else robot
+        r = robot.radius
+        # the robot walks against its direction vector, see Robot.update
+        return self.get_ray_distance(robot.rect.x + r, robot.rect.y + r, -robot.direction[0], -robot.direction[1], r)
+
+    def _get_affected_range(self, x, y, width, height):
         start_x = int(x / self.tile_size)
         start_y = int(y / self.tile_size)
         end_x = int((x + width) / self.tile_size)
         end_x = end_x - 1 if x % self.tile_size == 0 else end_x
         end_y = int((y + height) / self.tile_size)
         end_y = end_y - 1 if y % self.tile_size == 0 else end_y
+        return start_x, end_x, start_y, end_y
+
+    def get_affected_tiles(self, x, y, width, height):
+        affected_tiles = []
+        start_x, end_x, start_y, end_y = self._get_affected_range(x, y, width, height)
 
         for idx_x in range(start_x, end_x + 1):
             for idx_y in range(start_y, end_y + 1):
-                affected_tiles.append(self.tiles[idx_x][idx_y])
+                affected_tiles.append(self.get_tile(idx_x, idx_y))
 
         return affected_tiles
 
+    def get_reachable_tiles(self):
+        """
+        Tiles the robot can cover from its position, bool array indexed [x][y] with the tiles under obstacles
+        left out. None without a robot or configuration space, or if the robot collides where it stands.
+        """
+        if self.robot is None or self.configuration_space is None:
+            return None
+        r = self.robot.radius
+        # the robot notices a collision one step too late, see Robot.update
+        depth = int(math.ceil(self.robot.wss))
+        reachable = get_reachable_tiles(self.configuration_space, self.width, self.height, self.tile_size,
+                                        int(self.robot.rect.x + r), int(self.robot.rect.y + r), depth)
+        if reachable is None:
+            return None
+        return reachable & (self.tile_grid.states != TileState.COVERED_BY_OBSTACLE.value)
+
     def get_tile_count(self):
-        count = 0
-        for col in self.tiles:
-            uncovered_tiles = list(filter(lambda t: t.state == TileState.UNCOVERED, col))
-            count = count + len(uncovered_tiles)
-        return count
+        """
+        Number of tiles to clean, the denominator of the coverage. Tiles the robot can not reach, pockets
+        narrower than the robot or regions sealed off by obstacles, do not count.
+        """
+        reachable = self.get_reachable_tiles()
+        if reachable is not None:
+            return int(np.count_nonzero(reachable))
+        uncovered, _, _ = self.coverage_tree.total_counts()
+        return uncovered
 
     def initialize_default_obstacles(self, obstacles):
         events = []
         for obstacle in obstacles:
-            events.extend(self._add_obstacle(Obstacle(obstacle[0],obstacle[1],obstacle[2],obstacle[3], DARK_GREY)))
+            events.extend(self._add_obstacles(create_obstacles(obstacle, DARK_GREY)))
 
         return events
 
     def initialize_default_robot(self, robot):
         if robot and len(robot) >= 3:
-            self.robot = Robot(robot[0], robot[1], robot[2])
+            self.set_robot(Robot(robot[0], robot[1], robot[2]))
+
+
+def get_obstacle_rect(obstacle):
+    """(x0, y0, x1, y1) of an obstacle, with its width and height like Box.get_vertex"""
+    return obstacle.rect.x, obstacle.rect.y, obstacle.rect.x + obstacle.width, obstacle.rect.y + obstacle.height
@@ -10,6 +10,7 @@ from events.EventType import EventType
 from events.ObstacleDrawn import ObstacleDrawn
 from events.RobotDrawn import RobotDrawn
 from sprite.Tile import TileState
+from utils.CoverageLayer import CoverageLayer
 from utils.Runmode import Runmode
 from utils.colorUtils import *
 from utils.confUtils import LOG as log
@@ -17,22 +18,44 @@ from utils.config_manager import config_manager
 
 
 class Visualizer:
-    def __init__(self, env, clock, initial_events):
-        pygame.init()
+    def __init__(self, env, clock, initial_events, render=True):
+        """
+        :param render: draw every tick to the pygame display. Without it the display is never initialized and
+            only the sprites are updated, the web server renders its frames itself
+        """
         w, h, _ = env.get_params()
 
         self.ticks = 0
         self.clock = clock
-        self.run_mode = Runmode.BUILD
-
-        flags = DOUBLEBUF
-        # flags = FULLSCREEN | DOUBLEBUF
-        self.screen = pygame.display.set_mode((w, h), flags)
-        self.screen.set_alpha(None)
+        self.render = render
 
-        self.font = pygame.font.Font(None, 20)
+        # snapshot of the configuration, replaced by the config manager when it changes
+        self.config = config_manager.get_snapshot()
+        config_manager.subscribe(self._on_config_changed)
+        self.run_mode = Runmode.BUILD
 
-        self.tile_group = pygame.sprite.Group()
+        self.screen = None
+        self.font = None
+        if render:
+            pygame.init()
+            flags = DOUBLEBUF
+            # flags = FULLSCREEN | DOUBLEBUF
+            # reuse the display of a previous visualizer, set_mode allocates a new window surface on every call
+            self.screen = pygame.display.get_surface()
+            if self.screen is None or self.screen.get_size() != (w, h):
+                self.screen = pygame.display.set_mode((w, h), flags)
+            self.screen.set_alpha(None)
+
+            self.font = pygame.font.Font(None, 20)
+
+            # Tick the clock a few times to get FPS readings
+            if self.clock.get_fps() == 0:
+                for _ in range(10):
+                    self.clock.tick(self.config.fps)
+
+        # the tiles are drawn as one surface from the tile grid, the sim events mark the tiles it repaints
+        self.coverage_layer = CoverageLayer(env)
+        self.dirty_tiles = self.coverage_layer.dirty_tiles
 
         self.wall_group = pygame.sprite.Group()
         self.wall_group.add(env.walls)
@@ -65,6 +88,15 @@ class Visualizer:
 
         self.time = strftime("%Y%m%d%H%M%S", gmtime())
 
+        self.sim_event_handlers = {
+            EventType.OBSTACLE_ADDED: self._on_obstacle_added,
+            EventType.ROBOT_PLACED: self._on_robot_placed,
+            EventType.TILE_COVERED: self._on_tile_covered,
+            EventType.TILES_COVERED: self._on_tiles_covered,
+            EventType.TILE_COVERED_BY_OBSTACLE: self._on_tile_covered_by_obstacle,
+            EventType.TILES_COVERED_BY_OBSTACLE: self._on_tiles_covered_by_obstacle,
+        }
+
         self.handle_sim_events(initial_events)
 
     def update(self, sim_events=None, pygame_events=None):
@@ -74,28 +106,28 @@ class Visualizer:
             self.handle_pygame_events(pygame_events)
 
         if self.run_mode == Runmode.SIM:
-            # Get simulation config from config manager
-            sim_config = config_manager.get_simulation_config()
-            
-            ticks_per_save = sim_config.get("ticks_per_save", 500)
-            if self.ticks % ticks_per_save == 0:
+            if self.ticks % self.config.ticks_per_save == 0:
                 self.save_stats()
 
-            if self.get_full_coverage_percentage() >= sim_config.get("stop_at_coverage", 90):
+            if self.get_full_coverage_percentage() >= self.config.stop_at_coverage:
                 self.exit()
 
             self.ticks = self.ticks + 1
 
-        self.draw()
+        if self.render:
+            self.draw()
+        else:
+            self.update_sprites()
+
+    def _on_config_changed(self, snapshot):
+        self.config = snapshot
 
     def handle_pygame_events(self, events):
         for event in events:
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r and self.robot is None:
                     x, y = pygame.mouse.get_pos()
-                    # Get robot config from config manager
-                    robot_config = config_manager.get_robot_config()
-                    radius = robot_config["radius"]
+                    radius = self.config.robot_radius
                     self.temp_robot = (x, y, radius)
                 if event.key == pygame.K_p:
                     self.show_coverage_path = not self.show_coverage_path
@@ -109,22 +141,37 @@ class Visualizer:
                 self.temp_rectangle = None
 
     def handle_sim_events(self, events):
+        handlers = self.sim_event_handlers
         for event in events:
-            if event.type == EventType.OBSTACLE_ADDED:
-                log.info("Add Obstacle " + str(event.new_obstacle))
-                self.obstacle_group.add(event.new_obstacle)
-            if event.type == EventType.ROBOT_PLACED:
-                log.info("Robot placed " + str(event.placed_robot))
-                self.robot_group.add(event.placed_robot)
-            if event.type == EventType.TILE_COVERED:
-                if event.is_first_cover():
-                    self.covered_tiles = self.covered_tiles + 1
-                    self.tile_group.add(event.tile)
-                if event.tile.state == TileState.FULL_COVERED:
-                    self.full_covered_tiles = self.full_covered_tiles + 1
-                    self.tile_group.add(event.tile)
-            if event.type == EventType.TILE_COVERED_BY_OBSTACLE:
-                self.tile_group.add(event.tile)
+            handler = handlers.get(event.type)
+            if handler is not None:
+                handler(event)
+
+    def _on_obstacle_added(self, event):
+        log.info("Add Obstacle " + str(event.new_obstacle))
+        self.obstacle_group.add(event.new_obstacle)
+
+    def _on_robot_placed(self, event):
+        log.info("Robot placed " + str(event.placed_robot))
+        self.robot_group.add(event.placed_robot)
+
+    def _on_tile_covered(self, event):
+        self.dirty_tiles.add(event.tile)
+        if event.is_first_cover():
+            self.covered_tiles = self.covered_tiles + 1
+        if event.tile.state == TileState.FULL_COVERED:
+            self.full_covered_tiles = self.full_covered_tiles + 1
+
+    def _on_tiles_covered(self, event):
+        self.dirty_tiles.update(event.tiles)
+        self.covered_tiles = self.covered_tiles + len(event.first_covered_tiles())
+        self.full_covered_tiles = self.full_covered_tiles + len(event.full_covered_tiles())
+
+    def _on_tile_covered_by_obstacle(self, event):
+        self.dirty_tiles.add(event.tile)
+
+    def _on_tiles_covered_by_obstacle(self, event):
+        self.dirty_tiles.update(event.tiles)
 
     def get_draw_events(self):
         events = []
@@ -158,18 +205,12 @@ class Visualizer:
         self.tile_count = count
 
     def draw_fps(self):
-        # Get debug config from config manager
-        debug_config = config_manager.get_debug_config()
-        
-        if debug_config["draw_fps"]:
+        if self.config.draw_fps:
             fps = self.font.render("FPS: " + str(int(self.clock.get_fps())), True, RED)
             self.screen.blit(fps, (20, 20))
 
     def draw_coverage(self):
-        # Get debug config from config manager
-        debug_config = config_manager.get_debug_config()
-        
-        if debug_config["draw_coverage"]:
+        if self.config.draw_coverage:
             coverage_percentage = self.get_coverage_percentage()
             coverage_text = self.font.render("Tile-Coverage: " + str(int(coverage_percentage)) + "%", True, RED)
             self.screen.blit(coverage_text, (20, 40))
@@ -179,10 +220,7 @@ class Visualizer:
             self.screen.blit(full_coverage_text, (20, 60))
 
     def draw_time(self):
-        # Get debug config from config manager
-        debug_config = config_manager.get_debug_config()
-        
-        if debug_config["draw_time"] and self.run_mode == Runmode.SIM:
+        if self.config.draw_time and self.run_mode == Runmode.SIM:
             time_text = self.font.render("Time: " + str(self.ticks), True, RED)
             self.screen.blit(time_text, (20, 80))
     def get_full_coverage_percentage(self):
@@ -192,21 +230,13 @@ class Visualizer:
         return self.covered_tiles / self.tile_count * 100 if self.tile_count > 0 else 0
 
     def draw(self):
-        # Get simulation config from config manager
-        sim_config = config_manager.get_simulation_config()
-        
         # Set background color based on dirt level
-        dirt = sim_config.get("dirt", 35)
-        base_color = [255 - dirt, 255 - dirt, 255 - dirt]
-        self.screen.fill(base_color)
+        self.screen.fill(self.config.base_color)
 
-        self.tile_group.update()
-        self.wall_group.update()
-        self.obstacle_group.update()
-        self.robot_group.update()
+        self.update_sprites()
 
         if self.show_coverage_path:
-            self.tile_group.draw(self.screen)
+            self.coverage_layer.draw(self.screen, self.config.base_color)
         self.wall_group.draw(self.screen)
         self.obstacle_group.draw(self.screen)
         self.robot_group.draw(self.screen)
@@ -218,10 +248,25 @@ class Visualizer:
 
         pygame.display.flip()
 
+    def update_sprites(self):
+        # walls and obstacles never change and the tiles are drawn by the coverage layer, only the robot moves
+        self.robot_group.update()
+
     def save_stats(self):
         self.stats.append([self.ticks, self.get_coverage_percentage(), self.get_full_coverage_percentage()])
 
 
+    def close(self):
+        # sprites keep references to their groups, empty the groups so that nothing of an
+        # old visualizer stays reachable through the sprites of the environment
+        self.dirty_tiles.clear()
+        self.wall_group.empty()
+        self.obstacle_group.empty()
+        self.robot_group.empty()
+        self.robot = None
+        self.stats = []
+        config_manager.unsubscribe(self._on_config_changed)
+
     def exit(self):
         if self.run_mode == Runmode.SIM:
             self.save_stats()
@@ -1,6 +1,12 @@
+import math
 from abc import ABC
 
+from events.ConfigurationChanged import ConfigurationChanged
 from sprite.Robot import RobotState
+from utils.config_manager import config_manager
+
+# distance in pixels at which the robot center counts as arrived at a target point
+TARGET_EPSILON = 1e-3
 
 
 class AbstractCleaningAlgorithm(ABC):
@@ -13,6 +19,12 @@ class AbstractCleaningAlgorithm(ABC):
             robot.state = RobotState.WALK
 
     def robot_colided(self, obstacles, robot):
+        # one lookup in the bitmap of the environment if it was made for these obstacles
+        space = robot.configuration_space
+        if space is not None and obstacles is robot.obstacles and len(space.rects) == len(obstacles) \
+                and space.radius == robot.radius:
+            return space.collides(robot.rect.x + space.radius, robot.rect.y + space.radius)
+
         for obstacle in obstacles:
             if robot.collides_rectangle(obstacle):
                 return True
@@ -21,3 +33,105 @@ class AbstractCleaningAlgorithm(ABC):
 
     def start(self):
         self.started = True
+
+    def get_parameters(self, name, parameters=None):
+        """
+        Parameters of the algorithm from the algorithms section of the configuration, updated by parameters
+
+        :raises ValueError: for a parameter that the configuration does not have, e.g. a misspelled name
+        """
+        merged = dict(config_manager.get_algorithm_config(name))
+        unknown = [key for key in (parameters or {}) if key not in merged]
+        if unknown:
+            raise ValueError("unknown parameters of algorithm '%s': %s, known are %s"
+                             % (name, ", ".join(map(str, unknown)), ", ".join(merged) or "none"))
+        merged.update(parameters or {})
+        return merged
+
+    def set_environment(self, environment):
+        # called with the RoomEnvironment the algorithm runs on, whenever it is created or replaced.
+        # algorithms that plan on the tile grid keep it, the others only see obstacles and robot
+        pass
+
+    def get_quiet_ticks(self, robot):
+        # number of coming ticks in which update returns no events as long as the robot does not collide.
+        # used by the time warp of HeadlessSimulation, 0 means the algorithm can not predict its next decision
+        return 0
+
+    def skip_ticks(self, ticks):
+        # called after the time warp skipped ticks for which get_quiet_ticks promised no decision
+        pass
+
+    def is_heading(self, robot, heading):
+        return abs((robot.angle - heading + 180) % 360 - 180) < 1e-6
+
+    def steer_towards(self, robot, heading, wss=None):
+        """
+        ConfigurationChanged that turns the robot exactly to the given heading and lets it walk on.
+        The robot turns by rss per tick and subtracts a rest smaller than rss at the end, so a rest
+        is reached by turning one step further than needed.
+        """
+        change = (heading - robot.angle + 180) % 360 - 180
+        rss = robot.rss
+        steps = math.trunc(change / rss)
+        rest = change - steps * rss
+        if abs(rest) < 1e-9:
+            delta = steps * rss
+        elif steps == 0:
+            delta = -rest
+        else:
+            sign = 1 if change > 0 else -1
+            delta = sign * ((abs(steps) + 2) * rss - abs(rest))
+
+        return ConfigurationChanged(new_state=RobotState.ROTATE, delta_angle=delta, rss=rss, wss=wss)
+
+    def get_target_offset(self, robot, tx, ty):
+        """Offset of the robot center to the point (tx, ty)"""
+        # an axis counts as reached once the integer rect of the robot is there. The collision checks use that
+        # rect, so with continuous collision the last half pixel towards an obstacle could be blocked.
+        r = robot.radius
+        dx, dy = tx - (robot.x + r), ty - (robot.y + r)
+        if abs(dx) <= 0.5 and robot.rect.x + r == tx:
+            dx = 0
+        if abs(dy) <= 0.5 and robot.rect.y + r == ty:
+            dy = 0
+        return dx, dy
+
+    def _get_walk(self, robot, tx, ty):
+        # heading and distance of the next axis parallel walk to (tx, ty), x first, or None if arrived
+        dx, dy = self.get_target_offset(robot, tx, ty)
+        if abs(dx) > TARGET_EPSILON:
+            return (90 if dx > 0 else 270), abs(dx)
+        if abs(dy) > TARGET_EPSILON:
+            return (180 if dy > 0 else 0), abs(dy)
+        return None
+
+    def walk_towards(self, robot, tx, ty, speed):
+        """
+        Events that walk the robot center axis parallel to the point (tx, ty), first along x and then along y.
+        The last step is shortened so that the robot stops exactly on the point.
+
+        :returns: list of events or None if the robot is already there
+        """
+        walk = self._get_walk(robot, tx, ty)
+        if walk is None:
+            return None
+
+        heading, remaining = walk
+        step = min(speed, remaining)
+        if robot.state != RobotState.WALK or not self.is_heading(robot, heading):
+            return [self.steer_towards(robot, heading, wss=step)]
+        if robot.custom_wss != step:
+            return [ConfigurationChanged(wss=step)]
+        return []
+
+    def get_walk_quiet_ticks(self, robot, tx, ty, speed):
+        """Ticks in which walk_towards(robot, tx, ty, speed) certainly returns no events"""
+        walk = self._get_walk(robot, tx, ty)
+        if walk is None or robot.state != RobotState.WALK or speed <= 0:
+            return 0
+
+        heading, remaining = walk
+        if not self.is_heading(robot, heading) or robot.custom_wss != speed:
+            return 0
+        return max(int((remaining - TARGET_EPSILON) // speed) - 1, 0)
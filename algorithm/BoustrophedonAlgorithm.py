@@ -0,0 +1,227 @@
+import functools
+import math
+
+from algorithm.AbstractCleaningAlgorithm import AbstractCleaningAlgorithm
+from events.ConfigurationChanged import ConfigurationChanged
+from sprite.Robot import RobotState
+from sprite.Tile import get_full_cover_calls
+from utils.BoustrophedonDecomposition import BoustrophedonDecomposition
+from utils.config_manager import config_manager
+
+# decompositions by obstacle layout and margin, shared by all instances
+_DECOMPOSITIONS = {}
+_MAX_CACHED_DECOMPOSITIONS = 32
+
+# ticks without progress after which a waypoint is given up, continuous collision can block the robot
+STALL_TICKS = 3
+
+
+def get_decomposition(obstacles, margin):
+    """Cached BoustrophedonDecomposition of a list of sprite.Box obstacles"""
+    rects = tuple((o.rect.x, o.rect.y, o.rect.x + o.width, o.rect.y + o.height) for o in obstacles)
+    key = (rects, margin)
+    decomposition = _DECOMPOSITIONS.get(key)
+    if decomposition is None:
+        decomposition = BoustrophedonDecomposition(rects, margin)
+        if len(_DECOMPOSITIONS) >= _MAX_CACHED_DECOMPOSITIONS:
+            del _DECOMPOSITIONS[next(iter(_DECOMPOSITIONS))]
+        _DECOMPOSITIONS[key] = decomposition
+    return decomposition
+
+
+@functools.lru_cache(maxsize=None)
+def get_lane_parameters(radius, tile_size, wss, calls):
+    """
+    Lane spacing and walk speed for the sweep. A tile is full covered after it was inside the robot for
+    calls ticks, a lane at horizontal distance a of the farther tile corner keeps it inside for the ticks
+    in which the center is closer than sqrt(r^2 - a^2) to both tile rows. The spacing and speed with the
+    largest swept area per tick that reaches calls for every tile column are used.
+    """
+    def covered_ticks(a, speed):
+        if a >= radius:
+            return 0
+        # one pixel less for the rounding of the robot rect
+        length = 2 * math.sqrt(radius * radius - a * a) - tile_size - 1
+        return max(0, math.ceil(length / speed) - 1)
+
+    best = (tile_size, wss / 4)
+    speeds = [wss * k / 20 for k in range(20, 4, -1)]
+    for spacing in range(int(2 * radius), tile_size - 1, -1):
+        lanes = int(math.ceil(2 * radius / spacing)) + 1
+        for speed in speeds:
+            if speed * spacing <= best[0] * best[1]:
+                break
+            if all(sum(covered_ticks(max(abs(c), abs(tile_size - c)), speed)
+                       for c in (phase + k * spacing for k in range(-lanes, lanes + 1))) >= calls
+                   for phase in range(spacing)):
+                best = (spacing, speed)
+                break
+
+    return best
+
+
+class BoustrophedonAlgorithm(AbstractCleaningAlgorithm):
+    """
+    Plans the whole cleaning run on a boustrophedon decomposition of the free space. The cells are swept
+    with vertical lanes in the order of the closest next cell. Afterwards the robot drives along every
+    border of the free space, touching the obstacles with its contact depth, and stops at every tile next
+    to the border until it is full covered, because those tiles can not be full covered while driving.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.environment = None
+        self.path = None
+        self.waypoint = 0
+        self.dwell = 0
+        self._obstacles = None
+        self._obstacle_count = 0
+        self._last_position = None
+        self._stalled = 0
+
+    def set_environment(self, environment):
+        self.environment = environment
+        self.path = None
+
+    def update(self, obstacles, robot):
+        super().update(obstacles, robot)
+
+        if self.path is None or obstacles is not self._obstacles or len(obstacles) != self._obstacle_count:
+            self.plan(obstacles, robot)
+
+        return self._follow(robot)
+
+    def plan(self, obstacles, robot):
+        self._obstacles = obstacles
+        self._obstacle_count = len(obstacles)
+        self.waypoint = 0
+        self.dwell = 0
+
+        r = robot.radius
+        # the tiles of the room the algorithm runs in, the configuration if it was not given one
+        tile_size = self.environment.tile_size if self.environment is not None \
+            else config_manager.get_snapshot().tile_size
+        calls = get_full_cover_calls()
+        decomposition = get_decomposition(obstacles, r - robot.contact_depth)
+        spacing, lane_speed = get_lane_parameters(r, tile_size, robot.wss, calls)
+
+        position = (robot.x + r, robot.y + r)
+        self.path = []
+        position = self._plan_cells(decomposition, position, spacing, lane_speed, robot.wss)
+        self._plan_borders(decomposition, position, tile_size, calls, robot.wss)
+
+    def _add(self, x, y, speed, dwell=0):
+        self.path.append((x, y, speed, dwell))
+
+    def _travel(self, decomposition, position, goal, speed):
+        for x, y in decomposition.get_path(position, goal):
+            self._add(x, y, speed)
+        return goal
+
+    def _get_lanes(self, decomposition, cell, spacing):
+        x0, x1 = decomposition.get_cell_bounds(cell)
+        count = max(int(math.ceil((x1 - x0) / spacing)), 1) + 1
+        lanes = []
+        for k in range(count):
+            x = round(x0 + (x1 - x0) * k / (count - 1))
+            y0, y1 = decomposition.get_interval(cell, x)
+            if y0 is not None and y0 <= y1 and (not lanes or lanes[-1][0] != x):
+                lanes.append((x, y0, y1))
+        return lanes
+
+    def _plan_cells(self, decomposition, position, spacing, speed, wss):
+        remaining = set(range(len(decomposition.cells)))
+        while remaining:
+            # closest cell entrance, a cell can be swept from the left or from the right
+            best = None
+            for cell in remaining:
+                lanes = self._get_lanes(decomposition, cell, spacing)
+                for ordered in (lanes, lanes[::-1]):
+                    if not ordered:
+                        continue
+                    x, y0, y1 = ordered[0]
+                    y = y0 if abs(position[1] - y0) <= abs(position[1] - y1) else y1
+                    distance = abs(position[0] - x) + abs(position[1] - y)
+                    if best is None or distance < best[0]:
+                        best = (distance, cell, ordered, y == y0)
+            if best is None:
+                break
+
+            _, cell, lanes, upwards = best
+            remaining.discard(cell)
+            for k, (x, y0, y1) in enumerate(lanes):
+                start, end = (y0, y1) if upwards else (y1, y0)
+                position = self._travel(decomposition, position, (x, start), wss if k == 0 else speed)
+                self._add(x, end, speed)
+                position = (x, end)
+                upwards = not upwards
+
+        return position
+
+    def _plan_borders(self, decomposition, position, tile_size, calls, wss):
+        segments = decomposition.get_boundary_segments()
+        while segments:
+            best = None
+            for idx, (a, b) in enumerate(segments):
+                for start, end in ((a, b), (b, a)):
+                    distance = abs(position[0] - start[0]) + abs(position[1] - start[1])
+                    if best is None or distance < best[0]:
+                        best = (distance, idx, start, end)
+
+            _, idx, start, end = best
+            segments.pop(idx)
+            position = self._travel(decomposition, position, start, wss)
+
+            # stop in the middle of every tile along the border
+            horizontal = start[1] == end[1]
+            lo, hi = (start[0], end[0]) if horizontal else (start[1], end[1])
+            step = 1 if hi >= lo else -1
+            first = math.ceil((min(lo, hi) - tile_size / 2) / tile_size)
+            last = math.floor((max(lo, hi) - tile_size / 2) / tile_size)
+            middles = [k * tile_size + tile_size / 2 for k in range(first, last + 1)][::step]
+            for m in middles:
+                point = (m, start[1]) if horizontal else (start[0], m)
+                self._add(point[0], point[1], wss, calls - 1)
+            self._add(end[0], end[1], wss)
+            position = end
+
+    def _follow(self, robot):
+        if robot.state == RobotState.ROTATE:
+            # the robot walks again by itself after the rotation
+            return []
+
+        if self.dwell > 0:
+            self.dwell = self.dwell - 1
+            return []
+
+        position = (robot.x, robot.y)
+        self._stalled = self._stalled + 1 if robot.state == RobotState.WALK and position == self._last_position else 0
+        self._last_position = position
+        if self._stalled >= STALL_TICKS:
+            self._stalled = 0
+            self.waypoint = self.waypoint + 1
+
+        while True:
+            if self.waypoint >= len(self.path):
+                # everything is swept, start over
+                self.path = None
+                return [ConfigurationChanged(new_state=RobotState.STOP)]
+
+            tx, ty, speed, dwell = self.path[self.waypoint]
+            events = self.walk_towards(robot, tx, ty, speed)
+            if events is not None:
+                return events
+
+            self.waypoint = self.waypoint + 1
+            if dwell > 0:
+                self.dwell = dwell - 1
+                return [ConfigurationChanged(new_state=RobotState.STOP)]
+
+    def get_quiet_ticks(self, robot):
+        # walking towards the next waypoint needs no decision until the last step
+        if not self.started or self.path is None or self.dwell > 0 or robot.state != RobotState.WALK \
+                or self.waypoint >= len(self.path):
+            return 0
+
+        tx, ty, speed, _ = self.path[self.waypoint]
+        return self.get_walk_quiet_ticks(robot, tx, ty, speed)
@@ -0,0 +1,225 @@
+import math
+
+import numpy as np
+
+from algorithm.AbstractCleaningAlgorithm import AbstractCleaningAlgorithm
+from events.ConfigurationChanged import ConfigurationChanged
+from sprite.Robot import RobotState
+from sprite.Tile import TileState
+from utils.IncrementalDistanceField import IncrementalDistanceField
+
+# tile graphs by obstacle layout, shared by all instances
+_GRAPHS = {}
+_MAX_CACHED_GRAPHS = 32
+
+# ticks without progress after which a move is given up, continuous collision can block the robot
+STALL_TICKS = 3
+
+
+class TileGraph:
+    """
+    Graph of the tiles the robot can drive to. The node of a tile is the position of the robot center that
+    covers it, its middle pushed out of the obstacles grown by the margin. Neighbouring tiles are connected
+    if the robot can walk from one node to the other, first along x and then along y, in both directions.
+    Nodes are numbered like the tiles, ix * rows + iy.
+    """
+
+    def __init__(self, rects, margin, columns, rows, tile_size, radius):
+        self.columns, self.rows = columns, rows
+        self.grown = [(x0 - margin, y0 - margin, x1 + margin, y1 + margin) for x0, y0, x1, y1 in rects]
+        self.positions = [None] * (columns * rows)
+        self.neighbors = [[] for _ in range(columns * rows)]
+
+        for ix in range(columns):
+            for iy in range(rows):
+                position = self._push_out((ix + 0.5) * tile_size, (iy + 0.5) * tile_size)
+                if position is not None and _covers(position, ix, iy, tile_size, radius):
+                    self.positions[ix * rows + iy] = position
+
+        for node, position in enumerate(self.positions):
+            if position is None:
+                continue
+            ix, iy = divmod(node, rows)
+            for other in ((ix + 1) * rows + iy if ix + 1 < columns else None, node + 1 if iy + 1 < rows else None):
+                if other is not None and self.positions[other] is not None \
+                        and self.is_walkable(position, self.positions[other]) \
+                        and self.is_walkable(self.positions[other], position):
+                    self.neighbors[node].append(other)
+                    self.neighbors[other].append(node)
+
+    def _push_out(self, x, y):
+        # moves the point to the closest border of every grown obstacle it is in, the robot rect is an integer rect
+        for _ in range(len(self.grown) + 1):
+            x, y = math.floor(x + 0.5), math.floor(y + 0.5)
+            inside = next(((x0, y0, x1, y1) for x0, y0, x1, y1 in self.grown if x0 < x < x1 and y0 < y < y1), None)
+            if inside is None:
+                return x, y
+            x0, y0, x1, y1 = inside
+            _, x, y = min((x - x0, x0, y), (x1 - x, x1, y), (y - y0, x, y0), (y1 - y, x, y1))
+        return None
+
+    def is_walkable(self, a, b):
+        """The walk from a to b, first along x and then along y, stays out of the grown obstacles"""
+        (ax, ay), (bx, by) = a, b
+        for x0, y0, x1, y1 in self.grown:
+            if y0 < ay < y1 and min(ax, bx) < x1 and max(ax, bx) > x0:
+                return False
+            if x0 < bx < x1 and min(ay, by) < y1 and max(ay, by) > y0:
+                return False
+        return True
+
+    def get_closest_node(self, x, y):
+        """Node closest to the point that can be walked to, or the closest node at all"""
+        best, best_walkable = None, None
+        for node, position in enumerate(self.positions):
+            if position is None:
+                continue
+            distance = abs(position[0] - x) + abs(position[1] - y)
+            if best is None or distance < best[0]:
+                best = (distance, node)
+            if (best_walkable is None or distance < best_walkable[0]) and self.is_walkable((x, y), position):
+                best_walkable = (distance, node)
+        best = best_walkable if best_walkable is not None else best
+        return best[1] if best is not None else None
+
+
+def _covers(position, ix, iy, tile_size, radius):
+    # Robot.covers_tile: all four corners of the tile closer to the center than the radius
+    dx = max(abs(ix * tile_size - position[0]), abs((ix + 1) * tile_size - position[0]))
+    dy = max(abs(iy * tile_size - position[1]), abs((iy + 1) * tile_size - position[1]))
+    return math.sqrt(dx * dx + dy * dy) < radius
+
+
+def get_tile_graph(obstacles, margin, columns, rows, tile_size, radius):
+    """Cached TileGraph of a list of sprite.Box obstacles"""
+    rects = tuple((o.rect.x, o.rect.y, o.rect.x + o.width, o.rect.y + o.height) for o in obstacles)
+    key = (rects, margin, columns, rows, tile_size, radius)
+    graph = _GRAPHS.get(key)
+    if graph is None:
+        graph = TileGraph(rects, margin, columns, rows, tile_size, radius)
+        if len(_GRAPHS) >= _MAX_CACHED_GRAPHS:
+            del _GRAPHS[next(iter(_GRAPHS))]
+        _GRAPHS[key] = graph
+    return graph
+
+
+class FrontierAlgorithm(AbstractCleaningAlgorithm):
+    """
+    Always heads for the closest reachable tile that is not full covered yet and waits there until it is.
+    The distances of all tiles to the closest such tile are a breadth first distance field over the tile
+    graph, which is updated incrementally whenever tiles under the robot become full covered. The robot
+    walks one tile at a time to a neighbour that is one step closer, straight on if possible. It stops
+    when no tile is left that it can reach.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.environment = None
+        self.graph = None
+        self.field = None
+        self.node = None
+        self.target = None
+        self._tile_grid = None
+        self._obstacles = None
+        self._obstacle_count = 0
+        self._last_position = None
+        self._stalled = 0
+
+    def set_environment(self, environment):
+        self.environment = environment
+        self.field = None
+
+    def update(self, obstacles, robot):
+        super().update(obstacles, robot)
+
+        if self.environment is None:
+            raise ValueError("the frontier algorithm needs the environment, call set_environment first")
+
+        if self.field is None or self.environment.tile_grid is not self._tile_grid \
+                or obstacles is not self._obstacles or len(obstacles) != self._obstacle_count:
+            self.plan(obstacles, robot)
+
+        self._remove_covered_sources(robot)
+        self.field.flush()
+        return self._follow(robot)
+
+    def plan(self, obstacles, robot):
+        environment = self.environment
+        grid = environment.tile_grid
+        self._tile_grid = grid
+        self._obstacles = obstacles
+        self._obstacle_count = len(obstacles)
+
+        r = robot.radius
+        self.graph = get_tile_graph(obstacles, r - robot.contact_depth, grid.columns, grid.rows,
+                                    environment.tile_size, r)
+
+        # every node of a tile that still needs cleaning is a source of the distance field
+        done = np.isin(grid.states.ravel(), (TileState.FULL_COVERED.value, TileState.COVERED_BY_OBSTACLE.value))
+        sources = [node for node, position in enumerate(self.graph.positions) if position is not None and not done[node]]
+        self.field = IncrementalDistanceField([list(n) for n in self.graph.neighbors], sources)
+
+        self.node = None
+        self.target = self.graph.get_closest_node(robot.x + r, robot.y + r)
+
+    def _remove_covered_sources(self, robot):
+        # only the tiles under the robot can have become full covered since the last tick
+        environment = self.environment
+        grid = environment.tile_grid
+        ts = environment.tile_size
+        x0, y0 = max(int(robot.rect.x // ts), 0), max(int(robot.rect.y // ts), 0)
+        x1 = min(int((robot.rect.x + 2 * robot.radius) // ts) + 1, grid.columns)
+        y1 = min(int((robot.rect.y + 2 * robot.radius) // ts) + 1, grid.rows)
+        ixs, iys = np.nonzero(grid.states[x0:x1, y0:y1] == TileState.FULL_COVERED.value)
+        for ix, iy in zip((ixs + x0).tolist(), (iys + y0).tolist()):
+            self.field.remove_source(ix * grid.rows + iy)
+
+    def _follow(self, robot):
+        if robot.state == RobotState.ROTATE:
+            # the robot walks again by itself after the rotation
+            return []
+
+        position = (robot.x, robot.y)
+        self._stalled = self._stalled + 1 if robot.state == RobotState.WALK and position == self._last_position else 0
+        self._last_position = position
+        if self._stalled >= STALL_TICKS and self.target is not None:
+            # the move is blocked, continue from where the robot is without that edge
+            self._stalled = 0
+            if self.node is not None:
+                self.field.remove_edge(self.node, self.target)
+                self.field.flush()
+            self.node, self.target = self.target, None
+
+        while True:
+            if self.target is None:
+                if self.node is None:
+                    return self._stop(robot)
+
+                if self.field.get_distance(self.node) == 0:
+                    # wait until the tile is full covered
+                    return self._stop(robot)
+
+                self.target = self.field.get_next_node(self.node, self._get_straight_node(robot))
+                if self.target is None:
+                    # no tile left that can be reached
+                    return self._stop(robot)
+
+            tx, ty = self.graph.positions[self.target]
+            events = self.walk_towards(robot, tx, ty, robot.wss)
+            if events is not None:
+                return events
+
+            self.node, self.target = self.target, None
+
+    def _get_straight_node(self, robot):
+        # neighbour in walking direction, keeps the robot from turning when there is a choice
+        if robot.state != RobotState.WALK:
+            return None
+        rows = self.graph.rows
+        for heading, offset in ((0, -1), (90, rows), (180, 1), (270, -rows)):
+            if self.is_heading(robot, heading):
+                return self.node + offset
+        return None
+
+    def _stop(self, robot):
+        return [] if robot.state == RobotState.STOP else [ConfigurationChanged(new_state=RobotState.STOP)]
@@ -2,11 +2,15 @@ from algorithm.AbstractCleaningAlgorithm import AbstractCleaningAlgorithm
 from events.ConfigurationChanged import ConfigurationChanged
 from sprite.Robot import RobotState
 from random import randint
+import math
 
 
 class RandomBounceWalkAlgorithm(AbstractCleaningAlgorithm):
-    def __init__(self):
+    def __init__(self, parameters=None):
         super().__init__()
+        parameters = self.get_parameters("random", parameters)
+        self.min_bounce_angle = parameters.get("min_bounce_angle", 70)
+        self.max_bounce_angle = parameters.get("max_bounce_angle", 150)
 
     def update(self, obstacles, robot):
         super().update(obstacles, robot)
@@ -15,9 +19,13 @@ class RandomBounceWalkAlgorithm(AbstractCleaningAlgorithm):
 
         if not robot.busy and self.robot_colided(obstacles, robot):
             new_state = RobotState.WALK_BACKWARDS_THEN_ROTATE
-            delta_angle = randint(70, 150)
+            delta_angle = randint(self.min_bounce_angle, self.max_bounce_angle)
             if randint(0, 1):
                 delta_angle = delta_angle * -1
             configuration_events.append(ConfigurationChanged(new_state=new_state, delta_angle=delta_angle))
 
         return configuration_events
+
+    def get_quiet_ticks(self, robot):
+        # the robot only gets a new configuration after a collision
+        return math.inf if self.started else 0
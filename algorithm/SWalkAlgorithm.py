@@ -1,5 +1,6 @@
 from enum import Enum
 from random import randint
+import math
 
 from algorithm.AbstractCleaningAlgorithm import AbstractCleaningAlgorithm
 from events.ConfigurationChanged import ConfigurationChanged
@@ -7,8 +8,11 @@ from sprite.Robot import RobotState
 
 
 class SWalkAlgorithm(AbstractCleaningAlgorithm):
-    def __init__(self):
+    def __init__(self, parameters=None):
         super().__init__()
+        parameters = self.get_parameters("swalk", parameters)
+        self.min_line_steps = parameters.get("min_steps_between_lines", 2)
+        self.max_line_steps = parameters.get("max_steps_between_lines", 7)
         self.state = State.WALK_LINE
         self.steps_between_lines = 0
         self.rotate_clockwise = False
@@ -59,11 +63,15 @@ class SWalkAlgorithm(AbstractCleaningAlgorithm):
 
         return configuration_events
 
+    def get_quiet_ticks(self, robot):
+        # walking a line only ends with a collision, moving to the next line counts every step
+        return math.inf if self.started and self.state == State.WALK_LINE else 0
+
     def _get_current_angle(self):
         return 90 if self.rotate_clockwise else -90
 
     def _get_max_steps_between_lines(self):
-        return randint(2,7)
+        return randint(self.min_line_steps, self.max_line_steps)
 
 
 class State(Enum):
@@ -7,20 +7,26 @@ from sprite.Robot import RobotState
 
 
 class SpiralWalkAlgorithm(AbstractCleaningAlgorithm):
-    def __init__(self):
+    def __init__(self, parameters=None):
         super().__init__()
-        self.rotation_speed = 5
+        parameters = self.get_parameters("spiral", parameters)
+        self.initial_rotation_speed = parameters.get("rotation_speed", 5)
+        self.rotation_decay = parameters.get("rotation_decay", 1.05)
+        self.min_bounce_angle = parameters.get("min_bounce_angle", 70)
+        self.max_bounce_angle = parameters.get("max_bounce_angle", 150)
+
+        self.rotation_speed = self.initial_rotation_speed
         self.count = 0
         self.last_config_change = -1
         self.mode = Mode.SPIRAL
-        self.steps_for_mode_switch = 500
+        self.steps_for_mode_switch = parameters.get("steps_for_mode_switch", 500)
 
     def update(self, obstacles, robot):
 
         if not self.started:
             self.start()
             robot.state = RobotState.WALK_ROTATE
-            robot.custom_rss = 5
+            robot.custom_rss = self.initial_rotation_speed
 
         if self.mode == Mode.RANDOM_WALK:
             self.count = self.count + 1
@@ -33,22 +39,32 @@ class SpiralWalkAlgorithm(AbstractCleaningAlgorithm):
 
         if self.mode == Mode.SPIRAL and self.robot_colided(obstacles, robot):
             self.mode = Mode.RANDOM_WALK
-            self.rotation_speed = 5
+            self.rotation_speed = self.initial_rotation_speed
             return [ConfigurationChanged(rss=self.rotation_speed)]
 
         if self.mode == Mode.SPIRAL and (180 <= robot.angle <= 180 + self.rotation_speed or 0 <= robot.angle <= self.rotation_speed):
-            self.rotation_speed = self.rotation_speed / 1.05
+            self.rotation_speed = self.rotation_speed / self.rotation_decay
             return [ConfigurationChanged(rss=self.rotation_speed)]
 
         if self.mode == Mode.RANDOM_WALK and not robot.busy and self.robot_colided(obstacles, robot):
             new_state = RobotState.WALK_BACKWARDS_THEN_ROTATE
-            delta_angle = randint(70, 150)
+            delta_angle = randint(self.min_bounce_angle, self.max_bounce_angle)
             if randint(0, 1):
                 delta_angle = delta_angle * -1
             return [ConfigurationChanged(new_state=new_state, delta_angle=delta_angle)]
 
         return []
 
+    def get_quiet_ticks(self, robot):
+        # in random walk mode the next decision is either a collision or the switch back to the spiral
+        if self.started and self.mode == Mode.RANDOM_WALK:
+            return max(self.steps_for_mode_switch - self.count, 0)
+        return 0
+
+    def skip_ticks(self, ticks):
+        if self.mode == Mode.RANDOM_WALK:
+            self.count = self.count + ticks
+
 
 class Mode(Enum):
     RANDOM_WALK = 1,
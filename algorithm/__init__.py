@@ -0,0 +1,77 @@
+"""
+Registry of the cleaning algorithms. An algorithm is only imported and constructed when it is selected, so
+planners with expensive imports or precomputation do not slow down the start of the others.
+
+Algorithms of other packages are found through the entry point group "vacuum_cleaner.algorithms", the name
+of an entry point is the algorithm name and its value "module:ClassName".
+"""
+import importlib
+import inspect
+from importlib import metadata
+
+ENTRY_POINT_GROUP = "vacuum_cleaner.algorithms"
+
+# name -> "module:ClassName" of the algorithms of this package, in the order they are offered
+_ALGORITHMS = {
+    "random": "algorithm.RandomBounceWalkAlgorithm:RandomBounceWalkAlgorithm",
+    "spiral": "algorithm.SpiralWalkAlgorithm:SpiralWalkAlgorithm",
+    "swalk": "algorithm.SWalkAlgorithm:SWalkAlgorithm",
+    "boustrophedon": "algorithm.BoustrophedonAlgorithm:BoustrophedonAlgorithm",
+    "frontier": "algorithm.FrontierAlgorithm:FrontierAlgorithm",
+}
+_entry_points_loaded = False
+
+
+def _load_entry_points():
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+
+    try:
+        entry_points = metadata.entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # python < 3.10 has no selection by group
+        entry_points = metadata.entry_points().get(ENTRY_POINT_GROUP, [])
+    for entry_point in entry_points:
+        _ALGORITHMS.setdefault(entry_point.name, entry_point.value)
+
+
+def register_algorithm(name, target):
+    """Register an algorithm class, or its path "module:ClassName" to import it on first use"""
+    _ALGORITHMS[name] = target
+
+
+def get_algorithm_names():
+    """Names of all available algorithms"""
+    _load_entry_points()
+    return list(_ALGORITHMS)
+
+
+def get_algorithm_class(name):
+    _load_entry_points()
+    if name not in _ALGORITHMS:
+        raise KeyError("unknown algorithm '%s', available are %s" % (name, ", ".join(_ALGORITHMS)))
+
+    target = _ALGORITHMS[name]
+    if isinstance(target, str):
+        module_name, _, class_name = target.partition(":")
+        target = getattr(importlib.import_module(module_name), class_name)
+        _ALGORITHMS[name] = target
+    return target
+
+
+def create_algorithm(name, parameters=None):
+    """
+    New instance of the algorithm with the given name, imports its module on first use
+
+    :param parameters: dict that overrides the parameters of the algorithm in the configuration
+    :raises ValueError: if parameters are given for an algorithm that takes none or the configuration does not
+        have one of them
+    """
+    algorithm_class = get_algorithm_class(name)
+    if not parameters:
+        return algorithm_class()
+    if not inspect.signature(algorithm_class).parameters:
+        raise ValueError("algorithm '%s' has no parameters, got %s" % (name, ", ".join(map(str, parameters))))
+    return algorithm_class(parameters)
@@ -1,13 +1,14 @@
 from utils.config_manager import config_manager
+from utils.metrics import metrics
+from utils.memoryProfiler import memory_profiler
 from events.RobotDrawn import RobotDrawn
 from events.ObstacleDrawn import ObstacleDrawn
 from utils.confUtils import LOG as log
 from utils.Runmode import Runmode
-from algorithm.SpiralWalkAlgorithm import SpiralWalkAlgorithm
-from algorithm.SWalkAlgorithm import SWalkAlgorithm
-from algorithm.RandomBounceWalkAlgorithm import RandomBounceWalkAlgorithm
+from utils.OccupancyGrid import import_environment
+from algorithm import create_algorithm, get_algorithm_names
 from Visualizer import Visualizer
-from RoomEnvironment import RoomEnvironment
+from EnvironmentTemplate import create_room_environment, prebuild_environment_templates
 from pygame.locals import *
 import pygame
 import io
@@ -16,8 +17,9 @@ import time
 import threading
 import json
 import traceback
+from collections import deque
 from flask_socketio import SocketIO, emit
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 import os
 # Set environment variables to disable audio and use dummy video driver
 os.environ['SDL_AUDIODRIVER'] = 'dummy'
@@ -42,20 +44,23 @@ simulation_data = {
     'robot_placed': None    # Store placed robot
 }
 current_simulation = None  # Global simulation instance
+active_sessions = 0
 
 
 class WebSimulation:
     def __init__(self, algorithm_name='random', environment_id='0'):
         # Initialize pygame without display
         self.run_mode = Runmode.BUILD
-        self.event_stream = []
 
-        # Get configuration from config manager
-        sim_config = config_manager.get_simulation_config()
-        env_config = config_manager.get_environment_config()
+        # Get configuration from config manager, the snapshot is replaced when the configuration changes
+        self.config = config_manager.get_snapshot()
+        config_manager.subscribe(self._on_config_changed)
 
-        self.fps = sim_config["fps"]
-        tile_size = env_config["tile_size"]
+        # only the most recent ticks are kept, a long running simulation would grow the stream forever
+        self.event_stream = deque(maxlen=self.config.event_stream_length)
+
+        self.fps = self.config.fps
+        tile_size = self.config.tile_size
 
         self.clock = pygame.time.Clock()
         self.algorithm_name = algorithm_name
@@ -63,21 +68,17 @@ class WebSimulation:
 
         # Get default environment configuration
         default_obstacles, default_robot = self.get_default_environment()
-        self.environment = RoomEnvironment(
-            env_config["width"], env_config["height"], tile_size, default_obstacles, default_robot)
+        self.environment = create_room_environment(
+            self.config.width, self.config.height, tile_size, default_obstacles, default_robot)
+        # frames are rendered by get_frame, the visualizer only keeps the sprites and statistics
         self.visualizer = Visualizer(
-            self.environment, self.clock, self.environment.initial_events)
-        self.algorithms = {"random": RandomBounceWalkAlgorithm(
-        ), "spiral": SpiralWalkAlgorithm(), "swalk": SWalkAlgorithm()}
-        self.algorithm = self.algorithms[algorithm_name]
+            self.environment, self.clock, self.environment.initial_events, render=False)
+        self.algorithm = create_algorithm(algorithm_name)
+        self.algorithm.set_environment(self.environment)
 
         # Initialize pygame surface for rendering
         self.surface = pygame.Surface(
-            (env_config["width"], env_config["height"]))
-
-        # Tick the clock a few times to get FPS readings
-        for _ in range(10):
-            self.clock.tick(self.fps)
+            (self.config.width, self.config.height))
 
         # Restore any previously drawn obstacles if we're not loading a predefined environment
         global simulation_data
@@ -106,6 +107,9 @@ class WebSimulation:
             self.visualizer.set_run_mode(self.run_mode)
             self.visualizer.set_tile_count(self.environment.get_tile_count())
 
+    def _on_config_changed(self, snapshot):
+        self.config = snapshot
+
     def get_default_environment(self):
         # Get environment data from config manager
         env_data = config_manager.get_environment(self.environment_id)
@@ -143,16 +147,20 @@ class WebSimulation:
             self.visualizer.update(pygame_events=[], sim_events=new_events)
         elif self.run_mode == Runmode.SIM:
             # Get configuration change events from algorithm
-            configuration_events = self.algorithm.update(
-                self.environment.obstacles, self.environment.robot)
+            with metrics.timer("algorithm_update"):
+                configuration_events = self.algorithm.update(
+                    self.environment.obstacles, self.environment.robot)
             new_events.extend(configuration_events)
 
             # Apply configuration change events to the environment
-            environment_events = self.environment.update(configuration_events)
+            with metrics.timer("environment_update"):
+                environment_events = self.environment.update(configuration_events)
             new_events.extend(environment_events)
 
             # Update the visualizer with all new events
-            self.visualizer.update(pygame_events=[], sim_events=new_events)
+            with metrics.timer("visualizer_update"):
+                self.visualizer.update(pygame_events=[], sim_events=new_events)
+            metrics.mark("ticks")
 
             # Save all events into the event stream
             self.event_stream.append(new_events)
@@ -165,11 +173,8 @@ class WebSimulation:
             simulation_data['full_coverage'] = self.visualizer.get_full_coverage_percentage(
             )
 
-            # Get simulation config from config manager
-            sim_config = config_manager.get_simulation_config()
-
             # Check if we should stop the simulation
-            if self.visualizer.get_full_coverage_percentage() >= sim_config.get("stop_at_coverage", 90):
+            if self.visualizer.get_full_coverage_percentage() >= self.config.stop_at_coverage:
                 return False
 
         return True
@@ -177,29 +182,32 @@ class WebSimulation:
     def get_frame(self):
         try:
             # Draw the current state to the surface
-            sim_config = config_manager.get_simulation_config()
-            debug_config = config_manager.get_debug_config()
-
-            dirt = sim_config.get("dirt", 35)
-            base_color = [255 - dirt, 255 - dirt, 255 - dirt]
-            self.surface.fill(base_color)
-
-            # Draw all sprite groups
-            if self.visualizer.show_coverage_path:
-                self.visualizer.tile_group.draw(self.surface)
-            self.visualizer.wall_group.draw(self.surface)
-            self.visualizer.obstacle_group.draw(self.surface)
-            self.visualizer.robot_group.draw(self.surface)
-        
-            # Convert the pygame surface to a base64 encoded image
-            image_data = pygame.image.tostring(self.surface, 'RGB')
-            import PIL.Image
-            image = PIL.Image.frombytes(
-                'RGB', self.surface.get_size(), image_data)
-            buffered = io.BytesIO()
-            # Reduced quality for faster transfer
-            image.save(buffered, format="JPEG", quality=70)
-            img_str = base64.b64encode(buffered.getvalue()).decode()
+            with metrics.timer("frame_render"):
+                self.surface.fill(self.config.base_color)
+
+                # Draw all sprite groups
+                if self.visualizer.show_coverage_path:
+                    self.visualizer.coverage_layer.draw(self.surface, self.config.base_color)
+                self.visualizer.wall_group.draw(self.surface)
+                self.visualizer.obstacle_group.draw(self.surface)
+                self.visualizer.robot_group.draw(self.surface)
+
+            with metrics.timer("jpeg_encoding"):
+                # Convert the pygame surface to a base64 encoded image
+                buffered = io.BytesIO()
+                try:
+                    import PIL.Image
+                except ImportError:
+                    # without Pillow pygame encodes the frame, with its default quality
+                    pygame.image.save(self.surface, buffered, "frame.jpg")
+                else:
+                    image_data = pygame.image.tostring(self.surface, 'RGB')
+                    image = PIL.Image.frombytes(
+                        'RGB', self.surface.get_size(), image_data)
+                    # Reduced quality for faster transfer
+                    image.save(buffered, format="JPEG", quality=70)
+                img_str = base64.b64encode(buffered.getvalue()).decode()
+            metrics.mark("frames")
             return img_str
         except Exception as e:
             print(f"Error generating frame: {e}")
@@ -239,8 +247,8 @@ class WebSimulation:
             print(
                 f"After placing robot, obstacle group has {len(self.visualizer.obstacle_group.sprites())} sprites")
 
-            # Force a redraw to ensure all sprites are visible
-            self.visualizer.draw()
+            # the frames are rendered by get_frame, only bring the sprites up to date
+            self.visualizer.update_sprites()
 
             return events
 
@@ -282,8 +290,8 @@ class WebSimulation:
             print(
                 f"Obstacle group now has {len(self.visualizer.obstacle_group.sprites())} sprites")
 
-            # Force a redraw to ensure all sprites are visible
-            self.visualizer.draw()
+            # the frames are rendered by get_frame, only bring the sprites up to date
+            self.visualizer.update_sprites()
 
             return events
 
@@ -308,10 +316,12 @@ class WebSimulation:
             # Recreate the environment to ensure clean state
             env_config = config_manager.get_environment_config()
             tile_size = env_config["tile_size"]
-            self.environment = RoomEnvironment(
+            self.visualizer.close()
+            self.environment = create_room_environment(
                 env_config["width"], env_config["height"], tile_size, [], None)
             self.visualizer = Visualizer(
-                self.environment, self.clock, self.environment.initial_events)
+                self.environment, self.clock, self.environment.initial_events, render=False)
+            self.algorithm.set_environment(self.environment)
 
             # Restore the robot if it was previously placed
             if robot_placed and len(robot_placed) == 2:
@@ -325,6 +335,20 @@ class WebSimulation:
                 if self.environment.robot:
                     self.visualizer.robot_group.add(self.environment.robot)
 
+    def close(self):
+        # release everything the simulation holds before it gets replaced
+        self.visualizer.close()
+        self.event_stream.clear()
+        config_manager.unsubscribe(self._on_config_changed)
+
+
+def replace_simulation(algorithm_name, environment_id):
+    global current_simulation
+    if current_simulation is not None:
+        current_simulation.close()
+    current_simulation = WebSimulation(algorithm_name, environment_id)
+    return current_simulation
+
 
 def simulation_loop():
     global stop_simulation, simulation_data, current_simulation
@@ -429,8 +453,8 @@ def clear_obstacles(self):
         # Recreate the environment to ensure clean state
         env_config = config_manager.get_environment_config()
         tile_size = env_config["tile_size"]
-        self.environment = RoomEnvironment(env_config["width"], env_config["height"], tile_size, [], None)
-        self.visualizer = Visualizer(self.environment, self.clock, self.environment.initial_events)
+        self.environment = create_room_environment(env_config["width"], env_config["height"], tile_size, [], None)
+        self.visualizer = Visualizer(self.environment, self.clock, self.environment.initial_events, render=False)
 
         # Restore the robot if it was previously placed
         if robot_placed and len(robot_placed) == 2:
@@ -472,14 +496,15 @@ def simulation_loop():
                     last_time = current_time
 
                 frame = sim.get_frame()
-                socketio.emit('frame', {'image': frame})
+                with metrics.timer("socketio_emit"):
+                    socketio.emit('frame', {'image': frame})
 
-                # Send stats
-                socketio.emit('stats', {
-                    'ticks': simulation_data['ticks'],
-                    'coverage': simulation_data['coverage'],
-                    'full_coverage': simulation_data['full_coverage']
-                })
+                    # Send stats
+                    socketio.emit('stats', {
+                        'ticks': simulation_data['ticks'],
+                        'coverage': simulation_data['coverage'],
+                        'full_coverage': simulation_data['full_coverage']
+                    })
 
             # Sleep to control simulation speed
             time.sleep(0.01)  # Increased sleep time
@@ -535,15 +560,60 @@ def index():
         current_simulation = WebSimulation(simulation_data['algorithm'], simulation_data['environment'])
 
     return render_template('index.html',
-                          algorithms=["random", "spiral", "swalk"],
+                          algorithms=get_algorithm_names(),
                           environments=environments,
                           title=app.config['TITLE'])
 
+@ app.route('/metrics', methods=['GET'])
+def metrics_route():
+    """Prometheus text endpoint with phase timings, rates and session gauges"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+metrics.register_gauge('active_sessions', 'Number of connected Socket.IO clients', lambda: active_sessions)
+metrics.register_gauge('event_stream_ticks', 'Number of ticks stored in the event stream of the current simulation',
+                       lambda: len(current_simulation.event_stream) if current_simulation is not None else 0)
+metrics.register_gauge('simulation_running', 'Whether the simulation thread is running',
+                       lambda: 1 if simulation_thread is not None and simulation_thread.is_alive() else 0)
+
+@ app.route('/debug/memory', methods=['GET'])
+def debug_memory():
+    """Top allocators by module and the growth since the last baseline, tracing starts on the first call"""
+    limit = request.args.get('limit', 20, type=int)
+    reset = request.args.get('reset', '0') in ('1', 'true', 'True')
+    return jsonify(memory_profiler.report(limit=limit, reset_baseline=reset))
+
+@ app.route('/debug/memory/snapshot', methods=['POST'])
+def debug_memory_snapshot():
+    """Start tracing if necessary and use the current heap as baseline for the next diff"""
+    memory_profiler.start()
+    return jsonify({"status": "ok", "tracing": memory_profiler.is_tracing()})
+
+@ app.route('/debug/memory/stop', methods=['POST'])
+def debug_memory_stop():
+    memory_profiler.stop()
+    return jsonify({"status": "stopped"})
+
 @ app.route('/ping', methods=['GET'])
 def ping():
     """Simple endpoint to check if server is running"""
     return jsonify({"status": "ok"})
 
+@ app.route('/import_environment', methods=['POST'])
+def import_environment_route():
+    """Registers a new environment from an uploaded PNG or PGM floor plan, dark pixels are obstacles"""
+    image = request.files.get('image')
+    if image is None:
+        return jsonify({"status": "error", "message": "no image uploaded"}), 400
+
+    try:
+        env_id = import_environment(image.stream, request.form.get('name') or image.filename,
+                                    threshold=request.form.get('threshold', 0.5, type=float),
+                                    min_fraction=request.form.get('min_fraction', 0.1, type=float))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    return jsonify({"status": "ok", "environment": config_manager.get_environment(env_id), "id": env_id})
+
 @ app.route('/start_simulation', methods=['POST'])
 def start_simulation():
     global simulation_thread, stop_simulation, simulation_data, current_simulation
@@ -564,7 +634,7 @@ def start_simulation():
     simulation_data['full_coverage'] = 0
     # current_simulation = current_simulation(simulation_data['algorithm'], simulation_data['environment'])
     # Update the global simulation with new algorithm and environment
-    current_simulation = WebSimulation(simulation_data['algorithm'], simulation_data['environment'])
+    current_simulation = replace_simulation(simulation_data['algorithm'], simulation_data['environment'])
 
     # Start new simulation thread
     simulation_thread = threading.Thread(target=simulation_loop)
@@ -587,6 +657,16 @@ def stop_simulation_route():
 
     return jsonify({"status": "stopped"})
 
+@socketio.on('connect')
+def handle_connect():
+    global active_sessions
+    active_sessions += 1
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    global active_sessions
+    active_sessions = max(active_sessions - 1, 0)
+
 @socketio.on('place_robot')
 def handle_place_robot(data):
     global simulation_thread, simulation_data, current_simulation
@@ -825,7 +905,7 @@ def handle_select_environment(data):
             config_manager.set_robot_in_env_0(None)
 
         # Create a new global simulation with the selected environment
-        current_simulation = WebSimulation(simulation_data['algorithm'], simulation_data['environment'])
+        current_simulation = replace_simulation(simulation_data['algorithm'], simulation_data['environment'])
 
         # Debug output
         print(f"After environment change, obstacle group has {len(current_simulation.visualizer.obstacle_group.sprites())} sprites")
@@ -850,15 +930,8 @@ def handle_select_environment(data):
 
 if __name__ == '__main__':
 
-    # Initialize pygame once at startup with all drivers disabled
-    pygame.init()
-
-    # Install required packages if not already installed
-    try:
-        import PIL
-    except ImportError:
-        import subprocess
-        subprocess.check_call(["pip", "install", "Pillow"])
+    # Build all default environments once, switching between them only clones the prebuilt ones
+    prebuild_environment_templates()
 
     # Create the initial global simulation instance
     current_simulation = WebSimulation(simulation_data['algorithm'], simulation_data['environment'])
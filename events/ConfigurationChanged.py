@@ -2,6 +2,7 @@ from events.EventType import *
 
 
 class ConfigurationChanged:
+    __slots__ = ("new_state", "delta_angle", "rss", "wss")
     type = EventType.CONFIGURATION_CHANGED
 
     def __init__(self, new_state=None, delta_angle=None, rss=None, wss=None):
@@ -9,3 +9,5 @@ class EventType(Enum):
     ROBOT_PLACED = 5
     TILE_COVERED = 6
     TILE_COVERED_BY_OBSTACLE = 7
+    TILES_COVERED = 8
+    TILES_COVERED_BY_OBSTACLE = 9
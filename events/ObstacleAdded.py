@@ -2,6 +2,7 @@ from events.EventType import EventType
 
 
 class ObstacleAdded:
+    __slots__ = ("new_obstacle",)
     type = EventType.OBSTACLE_ADDED
 
     # new_obstacle is from type "sprite.Obstacle"
@@ -2,6 +2,7 @@ from events.EventType import EventType
 
 
 class ObstacleDrawn:
+    __slots__ = ("drawn_obstacle",)
     type = EventType.OBSTACLE_DRAWN
 
     def __init__(self, drawn_obstacle):
@@ -2,6 +2,7 @@ from events.EventType import EventType
 
 
 class RobotDrawn:
+    __slots__ = ("drawn_robot",)
     type = EventType.ROBOT_DRAWN
 
     def __init__(self, drawn_robot):
@@ -2,6 +2,7 @@ from events.EventType import EventType
 
 
 class RobotPlaced:
+    __slots__ = ("placed_robot",)
     type = EventType.ROBOT_PLACED
 
     def __init__(self, placed_robot):
@@ -3,6 +3,7 @@ from sprite.Tile import Tile, TileState
 
 
 class TileCovered:
+    __slots__ = ("tile",)
     type = EventType.TILE_COVERED
 
     def __init__(self, tile: Tile):
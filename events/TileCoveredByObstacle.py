@@ -3,6 +3,7 @@ from sprite.Tile import Tile, TileState
 
 
 class TileCoveredByObstacle:
+    __slots__ = ("tile",)
     type = EventType.TILE_COVERED_BY_OBSTACLE
 
     def __init__(self, tile: Tile):
@@ -0,0 +1,20 @@
+from events.EventType import EventType
+
+
+class TilesCovered:
+    __slots__ = ("tiles", "indices", "first_covered", "full_covered")
+    type = EventType.TILES_COVERED
+
+    # batched version of TileCovered, holds every tile covered by the robot in one tick.
+    # the environment already updated the tiles, the event only reports the changes
+    def __init__(self, tiles, indices, first_covered=None, full_covered=None):
+        self.tiles = tiles
+        self.indices = indices
+        self.first_covered = first_covered if first_covered is not None else []
+        self.full_covered = full_covered if full_covered is not None else []
+
+    def first_covered_tiles(self):
+        return self.first_covered
+
+    def full_covered_tiles(self):
+        return self.full_covered
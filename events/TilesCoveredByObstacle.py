@@ -0,0 +1,12 @@
+from events.EventType import EventType
+
+
+class TilesCoveredByObstacle:
+    __slots__ = ("tiles", "indices")
+    type = EventType.TILES_COVERED_BY_OBSTACLE
+
+    # batched version of TileCoveredByObstacle, holds every tile under one obstacle.
+    # the environment already set the tiles to COVERED_BY_OBSTACLE
+    def __init__(self, tiles, indices):
+        self.tiles = tiles
+        self.indices = indices
@@ -0,0 +1,119 @@
+"""
+Long run soak test for the web server.
+Drives the Flask app through many start/stop/select_environment/clear_obstacles cycles using the
+Flask and Socket.IO test clients and checks that the resident memory stays bounded. Every simulation
+runs for --ticks ticks before it is stopped, so the per-tick paths (event stream, frames, stats and
+their emits) run in every cycle. The web loop does about 100 ticks per second.
+
+Usage: python soak.py [--cycles 2000] [--ticks 40] [--warmup 50] [--max-growth-mb 40]
+Exits with status 1 if the memory grew more than allowed after the warmup cycles.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import app as web
+from algorithm import get_algorithm_names
+from utils.config_manager import config_manager
+
+
+def resident_memory_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        # no procfs, fall back to the peak rss which at least never under reports growth
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def wait_for_ticks(sio, ticks, timeout=10.0):
+    """Drops the received messages until the stats of the running simulation reach ticks or it ended"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for message in sio.get_received():
+            if message["name"] in ("simulation_complete", "simulation_error"):
+                return
+            if message["name"] == "stats" and message["args"][0]["ticks"] >= ticks:
+                return
+        time.sleep(0.01)
+
+
+def run_cycle(http, sio, environments, algorithms, cycle, ticks):
+    environment = environments[cycle % len(environments)]
+    algorithm = algorithms[cycle % len(algorithms)]
+
+    sio.emit('select_environment', {'environment': environment})
+    if environment == "0":
+        sio.emit('add_obstacle', {'x': 100 + cycle % 50, 'y': 100, 'width': 80, 'height': 60})
+        sio.emit('place_robot', {'x': 600, 'y': 400})
+        sio.emit('clear_obstacles')
+
+    sio.get_received()
+    http.post('/start_simulation', json={'algorithm': algorithm, 'environment': environment})
+    wait_for_ticks(sio, ticks)
+    http.post('/stop_simulation')
+
+    # the test client queues every emitted message, drop them so they do not count as a leak
+    sio.get_received()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test for the simulation web server")
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--ticks", type=int, default=40, help="ticks every simulation runs before it is stopped")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--max-growth-mb", type=float, default=40.0)
+    parser.add_argument("--report-every", type=int, default=100)
+    args = parser.parse_args()
+
+    config_manager.get_debug_config()["verbose"] = False
+    environments = [env["id"] for env in config_manager.get_all_environments()]
+    algorithms = get_algorithm_names()
+
+    http = web.app.test_client()
+    http.get('/')
+    sio = web.socketio.test_client(web.app, flask_test_client=http)
+
+    baseline = None
+    peak = 0.0
+    start = time.time()
+    for cycle in range(args.cycles):
+        run_cycle(http, sio, environments, algorithms, cycle, args.ticks)
+
+        if cycle + 1 == args.warmup:
+            gc.collect()
+            baseline = resident_memory_mb()
+
+        if (cycle + 1) % args.report_every == 0:
+            gc.collect()
+            rss = resident_memory_mb()
+            peak = max(peak, rss)
+            print("cycle %d: rss %.1f MB, event stream %d ticks, %.1f s"
+                  % (cycle + 1, rss, len(web.current_simulation.event_stream), time.time() - start))
+
+    sio.disconnect()
+    gc.collect()
+    final = resident_memory_mb()
+    baseline = final if baseline is None else baseline
+    growth = max(peak, final) - baseline
+    print("baseline %.1f MB, final %.1f MB, growth %.1f MB (allowed %.1f MB)"
+          % (baseline, final, growth, args.max_growth_mb))
+
+    if growth > args.max_growth_mb:
+        print("FAILED: resident memory is not bounded")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
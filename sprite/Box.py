@@ -4,12 +4,14 @@ from utils.colorUtils import BLACK
 
 
 class Box(pygame.sprite.Sprite):
-    def __init__(self, x: int, y: int, width: int, height: int, color: tuple):
+    def __init__(self, x: int, y: int, width: int, height: int, color: tuple, image=None):
         super().__init__()
         self.width = width
         self.height = height
-        self.image = pygame.Surface([width, height])
-        self.image.fill(color)
+        if image is None:
+            image = pygame.Surface([width, height])
+            image.fill(color)
+        self.image = image
 
         self.rect = self.image.get_rect()
         self.rect.x = x
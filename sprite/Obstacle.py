@@ -2,8 +2,30 @@ import pygame
 
 from sprite.Box import Box
 from utils.colorUtils import BLACK
+from utils.rasterUtils import circle_spans, polygon_spans, spans_to_rects
 
 
 class Obstacle(Box):
     def __init__(self, x, y, width, height, color=BLACK):
         super().__init__(x, y, width, height, color)
+
+
+def create_obstacles(obstacle, color=BLACK):
+    """
+    Obstacle sprites of an obstacle of the configuration. Rectangles are given as [x, y, width, height],
+    circles as {"type": "circle", "center": [x, y], "radius": r} and polygons as
+    {"type": "polygon", "points": [[x, y], ...]}. Circles and polygons are filled scan-line by scan-line
+    and made of the rectangles of equal rows, everything else only knows rectangles.
+    """
+    if not isinstance(obstacle, dict):
+        return [Obstacle(obstacle[0], obstacle[1], obstacle[2], obstacle[3], color)]
+
+    shape = obstacle.get("type")
+    if shape == "circle":
+        spans = circle_spans(obstacle["center"][0], obstacle["center"][1], obstacle["radius"])
+    elif shape == "polygon":
+        spans = polygon_spans(obstacle["points"])
+    else:
+        raise ValueError("unknown obstacle type '%s'" % shape)
+
+    return [Obstacle(x, y, width, height, color) for x, y, width, height in spans_to_rects(spans)]
@@ -7,7 +7,8 @@ from sprite.Tile import Tile
 from utils.colorUtils import GREEN, BLACK
 from utils.mathUtils import distance, get_direction
 from utils.pygameUtils import rot_center
-from utils.confUtils import CONF as conf
+from utils.collisionUtils import first_contact
+from utils.config_manager import config_manager
 from utils.confUtils import LOG as log
 
 
@@ -41,13 +42,25 @@ class Robot(pygame.sprite.Sprite):
         self.busy = False
         self.direction = get_direction(self.angle)
 
-        self.wss = conf["robot"]["wss"]
-        self.rss = conf["robot"]["rss"]
+        config = config_manager.get_snapshot()
+        self.wss = config.wss
+        self.rss = config.rss
 
         # these two properties are used for slower walk and/or slower rotating while walking
         self.custom_wss = self.wss
         self.custom_rss = self.rss
 
+        # continuous collision: a step is cut at the first contact with one of the obstacles and the robot
+        # only moves contact_depth pixels into it, so large steps can not tunnel through thin obstacles
+        self.continuous_collision = config.continuous_collision
+        self.contact_depth = 1
+        self.obstacles = None
+        # occupancy bitmap of the obstacles, set by the environment
+        self.configuration_space = None
+
+        # headless runs never draw the robot and skip rotating its image
+        self.render = True
+
     def get_configuration(self):
         return self.rect.x, self.rect.y, self.angle
 
@@ -91,6 +104,29 @@ class Robot(pygame.sprite.Sprite):
 
         return distance(c, v0) < d and distance(c, v1) < d and distance(c, v2) < d and distance(c, v3) < d
 
+    def move(self, dx, dy):
+        if self.continuous_collision and self.obstacles:
+            r = self.radius
+            # overlaps are judged on the integer rect like collides_rectangle does
+            t, _, overlapping = first_contact(self.x + r, self.y + r, dx, dy, r, self.obstacles,
+                                              overlap_center=(self.rect.x + r, self.rect.y + r),
+                                              depth=self.contact_depth)
+            if t is not None:
+                # never go deeper than contact_depth into an obstacle the robot already overlaps
+                length = math.hypot(dx, dy)
+                t = 0.0 if overlapping or length == 0 else min(1.0, t + self.contact_depth / length)
+                dx, dy = dx * t, dy * t
+
+        self.x = self.x + dx
+        self.y = self.y + dy
+
+    def get_time_of_impact(self, dx, dy, obstacles=None):
+        """Fraction of the motion (dx, dy) after which the robot touches an obstacle or None"""
+        obstacles = self.obstacles if obstacles is None else obstacles
+        r = self.radius
+        t, _, _ = first_contact(self.x + r, self.y + r, dx, dy, r, obstacles)
+        return t
+
     def update(self):
 
         if self.state == RobotState.ROTATE:
@@ -121,8 +157,7 @@ class Robot(pygame.sprite.Sprite):
 
         if self.state == RobotState.WALK or self.state == RobotState.WALK_ROTATE:
             # walk logic
-            self.x = self.x - self.direction[0] * self.custom_wss
-            self.y = self.y - self.direction[1] * self.custom_wss
+            self.move(-self.direction[0] * self.custom_wss, -self.direction[1] * self.custom_wss)
 
         if self.state == RobotState.WALK_BACKWARDS_THEN_ROTATE:
             # walk backwards logic
@@ -131,8 +166,7 @@ class Robot(pygame.sprite.Sprite):
                 self.walk_delta = 15
 
             if self.walk_delta != 0:
-                self.x = self.x + self.direction[0] * self.custom_wss
-                self.y = self.y + self.direction[1] * self.custom_wss
+                self.move(self.direction[0] * self.custom_wss, self.direction[1] * self.custom_wss)
                 self.walk_delta = self.walk_delta - 2  # walk speed
 
             if self.walk_delta <= 0:
@@ -153,7 +187,8 @@ class Robot(pygame.sprite.Sprite):
         self.rect.x = self.x
         self.rect.y = self.y
 
-        self.image = rot_center(self._org_image, (self.angle % 360) * -1)
+        if self.render:
+            self.image = rot_center(self._org_image, (self.angle % 360) * -1)
 
     def __repr__(self):
         return "[" + str(self.rect.x) + ", " + str(self.rect.y) + ", " + str(self.radius) + "]"
@@ -1,41 +1,88 @@
+import math
 from enum import Enum
 
+import numpy as np
+import pygame
+
 from sprite.Box import Box
-from utils.colorUtils import LIGHT_GREY, DARK_GREY, BLACK, WHITE
-from utils.confUtils import CONF as conf
+from utils.colorUtils import LIGHT_GREY, BLACK, WHITE
+from utils.config_manager import config_manager
+
+# tile surfaces by (size, color), tiles never draw on their image so all tiles share them
+_IMAGES = {}
+_MAX_CACHED_IMAGES = 256
+
+
+def get_cover_parameters():
+    """(dirt_per_cover, dirt, ticks_for_cover, steps) of a tile, dirt is cut down to a multiple of dirt_per_cover"""
+    config = config_manager.get_snapshot()
+    dirt_per_cover, dirt, ticks_for_cover = config.dirt_per_cover, config.dirt, config.ticks_for_cover
+    dirt = dirt if dirt % dirt_per_cover == 0 else dirt - dirt % dirt_per_cover
+    return dirt_per_cover, dirt, ticks_for_cover, dirt / dirt_per_cover
+
+
+def get_full_cover_calls():
+    """Number of ticks a tile has to be covered by the robot until it is full covered"""
+    _, _, ticks_for_cover, steps = get_cover_parameters()
+    return max(int(ticks_for_cover), 1) * (math.ceil(steps) - 1) + 1 if steps >= 1 else 1
+
+
+def get_tile_image(size: int, color):
+    """Shared surface of a tile with the given color"""
+    key = (size, tuple(color))
+    image = _IMAGES.get(key)
+    if image is None:
+        image = pygame.Surface([size, size])
+        image.fill(color)
+        if len(_IMAGES) >= _MAX_CACHED_IMAGES:
+            del _IMAGES[next(iter(_IMAGES))]
+        _IMAGES[key] = image
+    return image
 
 
 class Tile(Box):
-    def __init__(self, x: int, y: int):
-        ts = conf["environment"]["tile_size"]
-        super().__init__(x, y, ts, ts, LIGHT_GREY)
+    def __init__(self, x: int, y: int, grid=None, ix: int = 0, iy: int = 0):
+        ts = config_manager.get_snapshot().tile_size
+        super().__init__(x, y, ts, ts, LIGHT_GREY, get_tile_image(ts, LIGHT_GREY))
 
-        self.cover_count = 0
-        self.temp_count = 0
-        self.need_update = False
-        self.state = TileState.UNCOVERED
+        # the cover state lives in the arrays of a TileGrid, a tile without grid gets its own one
+        self.grid = grid if grid is not None else TileGrid(1, 1)
+        self.ix = ix if grid is not None else 0
+        self.iy = iy if grid is not None else 0
 
-        self.dirt_per_cover = conf["robot"].get("dirt_per_cover", 7)
-        self.dirt = conf["simulation"].get("dirt", 35)
-        self.ticks_for_cover = conf["simulation"].get("ticks_for_cover", 10)
-        self.dirt = self.dirt if self.dirt % self.dirt_per_cover == 0 else self.dirt - self.dirt % self.dirt_per_cover
-        self.steps = self.dirt / self.dirt_per_cover
-        self.base_color = [255 - self.dirt, 255 - self.dirt, 255 - self.dirt]
+        self.dirt_per_cover, self.dirt, self.ticks_for_cover, self.steps = self.grid.cover_parameters
 
-    def update(self):
-        if self.need_update:
-            if self.state == TileState.COVERED_BY_OBSTACLE:
-                self.image.fill(DARK_GREY)
+    @property
+    def state(self):
+        return TILE_STATES[self.grid.states[self.ix, self.iy]]
 
-            if self.state == TileState.COVERED:
-                color = list(map(lambda x: x + self.cover_count * self.dirt_per_cover, self.base_color)) # calculates the new color
-                self.image.fill(color)
+    @state.setter
+    def state(self, new_state):
+        # unchanged states are not written, that would copy arrays shared with another grid
+        if self.grid.states[self.ix, self.iy] != new_state.value:
+            self.grid.make_writable()
+            self.grid.states[self.ix, self.iy] = new_state.value
 
-        self.need_update = False
+    @property
+    def cover_count(self):
+        return int(self.grid.cover_counts[self.ix, self.iy])
+
+    @cover_count.setter
+    def cover_count(self, value):
+        self.grid.make_writable()
+        self.grid.cover_counts[self.ix, self.iy] = value
+
+    @property
+    def temp_count(self):
+        return int(self.grid.temp_counts[self.ix, self.iy])
+
+    @temp_count.setter
+    def temp_count(self, value):
+        self.grid.make_writable()
+        self.grid.temp_counts[self.ix, self.iy] = value
 
     def set_state(self, new_state):
         self.state = new_state
-        self.need_update = True
 
     def increase_cover_count(self):
         if self.state != TileState.FULL_COVERED:
@@ -55,3 +102,95 @@ class TileState(Enum):
     COVERED = 1
     FULL_COVERED = 2
     COVERED_BY_OBSTACLE = 3
+
+
+TILE_STATES = tuple(TileState)
+
+
+class TileGrid:
+    """
+    Cover state of all tiles of an environment as arrays indexed [x][y] like RoomEnvironment.tiles.
+    Tile objects read and write their state through these arrays, bulk updates work on them directly.
+    Copies share the arrays read only, a grid copies them on its first write.
+    """
+
+    def __init__(self, columns: int, rows: int):
+        self.columns = columns
+        self.rows = rows
+        self.states = np.full((columns, rows), TileState.UNCOVERED.value, dtype=np.int8)
+        self.cover_counts = np.zeros((columns, rows), dtype=np.int32)
+        self.temp_counts = np.zeros((columns, rows), dtype=np.int32)
+
+        self.cover_parameters = get_cover_parameters()
+        _, _, self.ticks_for_cover, self.steps = self.cover_parameters
+
+    def copy(self):
+        """Grid in the same state which shares the arrays until one of the two grids is written"""
+        self.freeze()
+        grid = TileGrid.__new__(TileGrid)
+        grid.__dict__.update(self.__dict__)
+        return grid
+
+    def freeze(self):
+        """Makes the arrays read only, the next write of the grid works on a copy of them"""
+        for array in (self.states, self.cover_counts, self.temp_counts):
+            array.flags.writeable = False
+
+    def make_writable(self):
+        """Own copies of the arrays if they are shared with another grid, called before every write"""
+        if not self.states.flags.writeable:
+            self.states = self.states.copy()
+            self.cover_counts = self.cover_counts.copy()
+            self.temp_counts = self.temp_counts.copy()
+
+    def cover(self, ixs, iys, calls, apply=True):
+        """
+        Applies Tile.increase_cover_count calls[k] times in a row to the tile (ixs[k], iys[k]), like
+        calls[k] consecutive TileCovered events would do. Every tile may appear only once, tiles which are
+        not UNCOVERED or COVERED are left alone.
+
+        :returns: (mask, old_states, first_cover_call, full_cover_call) for the given tiles. mask selects the
+            tiles that were changed, the call arrays hold the index of the call which covered a tile for
+            the first time or made it full covered, -1 if that did not happen.
+        """
+        ixs = np.asarray(ixs, dtype=np.intp)
+        iys = np.asarray(iys, dtype=np.intp)
+        calls = np.asarray(calls, dtype=np.int64)
+
+        old_states = self.states[ixs, iys]
+        mask = ((old_states == TileState.UNCOVERED.value) | (old_states == TileState.COVERED.value)) & (calls > 0)
+
+        c0 = self.cover_counts[ixs, iys].astype(np.int64)
+        t0 = self.temp_counts[ixs, iys].astype(np.int64)
+        period = max(int(self.ticks_for_cover), 1)
+        steps = self.steps
+
+        # temp_count cycles through 0 .. period - 1 and the cover count increases whenever it is 0,
+        # until the cover count reaches the cap. At the cap the tile is full covered if the cap equals steps,
+        # otherwise temp_count is not reset anymore and just keeps counting.
+        full_at_cap = steps == int(steps) and steps >= 1
+        cap = int(math.ceil(steps)) if steps >= 1 else 1
+        first_increment = (period - t0) % period
+        cap_call = first_increment + (cap - c0 - 1) * period
+        capped = mask & (c0 < cap) & (cap_call < calls)
+        saturated = c0 >= cap
+
+        increments = (t0 + calls - 1) // period - (t0 - 1) // period
+        new_counts = np.where(capped, cap, np.where(saturated, c0, c0 + increments))
+        new_temp = np.where(capped, calls - cap_call,
+                            np.where(saturated, t0 + calls, (t0 + calls) % period))
+        full = capped if full_at_cap else np.zeros(len(calls), dtype=bool)
+        if full_at_cap:
+            new_temp = np.where(full, 1, new_temp)
+
+        # Tile.is_first_cover: cover_count and temp_count are both 1 after the first call
+        first_cover = mask & (c0 == 0) & (t0 == 0) & ~((self.ticks_for_cover <= 1) & (1 < steps))
+
+        if apply:
+            self.make_writable()
+            new_states = np.where(full, TileState.FULL_COVERED.value, TileState.COVERED.value)
+            self.cover_counts[ixs[mask], iys[mask]] = new_counts[mask]
+            self.temp_counts[ixs[mask], iys[mask]] = new_temp[mask]
+            self.states[ixs[mask], iys[mask]] = new_states[mask]
+
+        return mask, old_states, np.where(first_cover, 0, -1), np.where(full, cap_call, -1)
@@ -0,0 +1,90 @@
+"""
+Startup budget check.
+Measures in fresh interpreters how long importing and constructing a headless simulation and a web
+simulation takes, and checks that neither initializes the pygame display and that the headless path
+imports none of flask, flask_socketio and PIL.
+
+Usage: python startup_budget.py [--headless-ms 1000] [--web-ms 1000] [--environment 1] [--runs 3]
+Exits with status 1 if a budget is exceeded or a check fails. The best of the runs counts.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEADLESS = """
+import time
+start = time.perf_counter()
+from HeadlessSimulation import HeadlessSimulation, create_environment
+from algorithm import create_algorithm
+imported = time.perf_counter()
+HeadlessSimulation(create_algorithm("random"), create_environment(ENVIRONMENT))
+constructed = time.perf_counter()
+"""
+
+WEB = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.WebSimulation("random", ENVIRONMENT)
+constructed = time.perf_counter()
+"""
+
+REPORT = """
+import json, sys
+import pygame
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "construct_ms": (constructed - imported) * 1000,
+    "display": bool(pygame.display.get_init()),
+    "modules": [name for name in ("flask", "flask_socketio", "PIL") if name in sys.modules],
+}))
+"""
+
+
+def measure(code, environment):
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    script = code.replace("ENVIRONMENT", repr(environment)) + REPORT
+    output = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and construction time budget check")
+    parser.add_argument("--headless-ms", type=float, default=1000.0)
+    parser.add_argument("--web-ms", type=float, default=1000.0)
+    parser.add_argument("--environment", default="1")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    failed = False
+    for name, code, budget, forbidden in (("headless", HEADLESS, args.headless_ms, True),
+                                          ("web", WEB, args.web_ms, False)):
+        results = [measure(code, args.environment) for _ in range(args.runs)]
+        best = min(results, key=lambda r: r["import_ms"] + r["construct_ms"])
+        total = best["import_ms"] + best["construct_ms"]
+        print("%-8s import %6.1f ms, construct %6.1f ms, total %6.1f ms (budget %.0f ms), display %s, loaded %s"
+              % (name, best["import_ms"], best["construct_ms"], total, budget,
+                 "initialized" if best["display"] else "off", ", ".join(best["modules"]) or "-"))
+
+        if total > budget:
+            print("FAILED: %s startup is over budget" % name)
+            failed = True
+        if best["display"]:
+            print("FAILED: %s startup initialized the display" % name)
+            failed = True
+        if forbidden and best["modules"]:
+            print("FAILED: %s startup imported %s" % (name, ", ".join(best["modules"])))
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
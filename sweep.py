@@ -0,0 +1,158 @@
+"""
+Parameter sweep for the cleaning algorithms.
+Runs every combination of the given parameter values headless on several environments and seeds in
+parallel processes and reports the parameters that need the fewest ticks until stop_at_coverage.
+
+Clearly losing parameter sets are stopped early. The seeds are run in rounds, one seed on all environments
+per round, and after every round only the best 1/eta of the parameter sets go on (successive halving).
+Parameter sets with the same mean ticks are ranked by the mean full coverage of their cut off runs, sets
+tied with the last one going on go on as well.
+A run is also cut off once it needs more than cutoff times the ticks of the best run on its environment,
+it counts with the ticks at which it was cut off. A run whose coverage stops growing (see PlateauDetector)
+is stopped as well and counts with the ticks it would have been cut off at.
+
+Usage: python sweep.py --algorithm random --param min_bounce_angle=50,70,90 --param max_bounce_angle=120,150
+    [--environments 1,2,3] [--seeds 4] [--workers 4] [--max-ticks 60000] [--eta 2] [--cutoff 2]
+    [--plateau-window 20000] [--plateau-rate 0.02] [--no-cache]
+
+Results of runs are kept in the result cache (see utils/ResultCache.py), repeated runs are not simulated again.
+"""
+
+import argparse
+import ast
+import itertools
+import math
+import multiprocessing
+import os
+import time
+
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from HeadlessSimulation import run_simulation
+from algorithm import create_algorithm
+from utils.ResultCache import get_result_cache
+from utils.config_manager import config_manager
+
+
+def parse_param(text):
+    """name=v1,v2,... into (name, [values])"""
+    name, _, values = text.partition("=")
+    if not name or not values:
+        raise argparse.ArgumentTypeError("parameters are given as name=value1,value2,...")
+
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(ast.literal_eval(value))
+        except (ValueError, SyntaxError):
+            parsed.append(value)
+    return name, parsed
+
+
+def evaluate(task):
+    """
+    (ticks, finished, full_coverage) of one run, ticks until stop_at_coverage or max_ticks if the run was
+    cut off or plateaued
+    """
+    algorithm, parameters, environment_id, seed, max_ticks, plateau_window, plateau_rate, use_cache = task
+    plateau = (plateau_window, plateau_rate) if plateau_window > 0 else None
+    result = run_simulation(algorithm, environment_id, seed, max_ticks, parameters, plateau,
+                            get_result_cache() if use_cache else None)
+    finished = result["outcome"] == "finished"
+    return (result["ticks"] if finished else max_ticks), finished, result["full_coverage"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep for the cleaning algorithms")
+    parser.add_argument("--algorithm", default="random")
+    parser.add_argument("--param", type=parse_param, action="append", default=[],
+                        help="name=value1,value2,... values of one parameter, can be repeated")
+    parser.add_argument("--environments", default=None, help="comma separated ids, all with a robot by default")
+    parser.add_argument("--seeds", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-ticks", type=int, default=60000)
+    parser.add_argument("--eta", type=float, default=2.0, help="1/eta of the parameter sets survive a round")
+    parser.add_argument("--cutoff", type=float, default=2.0,
+                        help="runs stop after cutoff times the ticks of the best run on the environment")
+    parser.add_argument("--plateau-window", type=int, default=None,
+                        help="ticks over which the coverage growth is measured, 0 disables the plateau stop")
+    parser.add_argument("--plateau-rate", type=float, default=None,
+                        help="runs stop once the coverage grows less than this many percent per 1000 ticks")
+    parser.add_argument("--no-cache", action="store_true", help="simulate every run, even if its result is cached")
+    args = parser.parse_args()
+
+    config = config_manager.get_snapshot()
+    plateau_window = config.plateau_window if args.plateau_window is None else args.plateau_window
+    plateau_rate = config.plateau_min_rate if args.plateau_rate is None else args.plateau_rate
+
+    if args.environments:
+        environments = args.environments.split(",")
+    else:
+        environments = [env["id"] for env in config_manager.get_all_environments()
+                        if len(config_manager.get_environment(env["id"]).get("robot") or []) >= 3]
+
+    names = [name for name, _ in args.param]
+    candidates = [tuple(zip(names, values)) for values in itertools.product(*(values for _, values in args.param))]
+
+    try:
+        create_algorithm(args.algorithm, dict(candidates[0]))
+    except (KeyError, ValueError) as e:
+        parser.error(e.args[0])
+    results = {candidate: [] for candidate in candidates}
+    best_ticks = {}
+
+    print("%d parameter sets, %d environments, %d seeds, %d workers"
+          % (len(candidates), len(environments), args.seeds, args.workers))
+
+    start = time.time()
+    with multiprocessing.Pool(args.workers) as pool:
+        for seed in range(args.seeds):
+            caps = {env: min(args.max_ticks, int(math.ceil(args.cutoff * best_ticks[env])))
+                    if env in best_ticks else args.max_ticks for env in environments}
+            tasks = [(args.algorithm, candidate, env, seed, caps[env], plateau_window, plateau_rate, not args.no_cache)
+                     for candidate in candidates for env in environments]
+            for (_, candidate, env, *_), (ticks, finished, coverage) in zip(tasks, pool.map(evaluate, tasks)):
+                results[candidate].append((ticks, finished, coverage))
+                if finished:
+                    best_ticks[env] = min(best_ticks.get(env, ticks), ticks)
+
+            candidates.sort(key=lambda c: rank(results[c]))
+            if seed + 1 < args.seeds:
+                # candidates tied with the last survivor go on as well, the order of the command line decides nothing
+                survivors = max(1, int(math.ceil(len(candidates) / args.eta)))
+                last = rank(results[candidates[survivors - 1]])
+                candidates = [c for i, c in enumerate(candidates) if i < survivors or rank(results[c]) == last]
+            print("seed %d done, %d parameter sets left, best %.0f ticks, %.1f s"
+                  % (seed, len(candidates), mean_ticks(results[candidates[0]]), time.time() - start))
+
+    print()
+    print("%-60s %10s %6s %10s" % ("parameters", "ticks", "runs", "unfinished"))
+    for candidate in sorted(results, key=lambda c: (-len(results[c]),) + rank(results[c])):
+        runs = results[candidate]
+        print("%-60s %10.0f %6d %10d" % (format_parameters(candidate), mean_ticks(runs), len(runs),
+                                         sum(1 for _, finished, _ in runs if not finished)))
+
+    print()
+    print("best: %s" % format_parameters(candidates[0]))
+
+
+def mean_ticks(runs):
+    return sum(ticks for ticks, _, _ in runs) / len(runs) if runs else math.inf
+
+
+def rank(runs):
+    """
+    Sort key of a candidate, fewer mean ticks first. Runs that hit the same cap have equal ticks, among
+    those the higher mean full coverage at the cap is better.
+    """
+    coverage = sum(coverage for _, finished, coverage in runs if not finished)
+    return mean_ticks(runs), -coverage / len(runs) if runs else 0.0
+
+
+def format_parameters(candidate):
+    return ", ".join("%s=%s" % item for item in candidate) or "(configuration)"
+
+
+if __name__ == '__main__':
+    main()
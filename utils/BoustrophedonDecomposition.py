@@ -0,0 +1,221 @@
+import heapq
+
+
+class BoustrophedonDecomposition:
+    """
+    Boustrophedon cell decomposition of the space the center of the robot can reach.
+
+    Every obstacle rectangle is grown by the margin. The edges of the grown rectangles form a compressed
+    grid whose cells are either completely free or completely blocked. Every column of the grid is split
+    into runs of free grid cells, and runs of neighbouring columns are merged into one boustrophedon cell
+    as long as the connectivity does not change, i.e. a run overlaps exactly one run of the next column
+    and the other way round.
+
+    All coordinates are pixel coordinates of the robot center.
+    """
+
+    def __init__(self, rects, margin):
+        """
+        :param rects: obstacles as (x0, y0, x1, y1), the walls included. Their bounding box is the room.
+        :param margin: the free space keeps at least this distance to every obstacle
+        """
+        self.margin = margin
+        bx0, by0 = min(r[0] for r in rects), min(r[1] for r in rects)
+        bx1, by1 = max(r[2] for r in rects), max(r[3] for r in rects)
+        self.grown = [(x0 - margin, y0 - margin, x1 + margin, y1 + margin) for x0, y0, x1, y1 in rects]
+
+        self.xs = sorted({bx0, bx1} | {min(max(v, bx0), bx1) for g in self.grown for v in (g[0], g[2])})
+        self.ys = sorted({by0, by1} | {min(max(v, by0), by1) for g in self.grown for v in (g[1], g[3])})
+
+        columns, rows = len(self.xs) - 1, len(self.ys) - 1
+        self.free = [[self._is_free((self.xs[i] + self.xs[i + 1]) / 2, (self.ys[j] + self.ys[j + 1]) / 2)
+                      for j in range(rows)] for i in range(columns)]
+
+        # cells are lists of (column, first row, last row) runs, ordered from left to right
+        self.cells = []
+        self.adjacent = []
+        self._decompose()
+
+    def _is_free(self, x, y):
+        for x0, y0, x1, y1 in self.grown:
+            if x0 < x < x1 and y0 < y < y1:
+                return False
+        return True
+
+    def _runs(self, i):
+        runs, start = [], None
+        for j, free in enumerate(self.free[i]):
+            if free and start is None:
+                start = j
+            if not free and start is not None:
+                runs.append((start, j - 1))
+                start = None
+        if start is not None:
+            runs.append((start, len(self.free[i]) - 1))
+        return runs
+
+    def _decompose(self):
+        previous = []  # (run, cell index) of the last column
+        for i in range(len(self.free)):
+            current = []
+            runs = self._runs(i)
+            for j0, j1 in runs:
+                overlaps = [(run, cell) for run, cell in previous if run[0] <= j1 and j0 <= run[1]]
+                cell = None
+                if len(overlaps) == 1:
+                    run, candidate = overlaps[0]
+                    if sum(1 for k0, k1 in runs if k0 <= run[1] and run[0] <= k1) == 1:
+                        cell = candidate
+
+                if cell is None:
+                    cell = len(self.cells)
+                    self.cells.append([])
+                    self.adjacent.append(set())
+                    for _, other in overlaps:
+                        self.adjacent[cell].add(other)
+                        self.adjacent[other].add(cell)
+
+                self.cells[cell].append((i, j0, j1))
+                current.append(((j0, j1), cell))
+            previous = current
+
+    def get_cell_bounds(self, cell):
+        """x range of a cell"""
+        runs = self.cells[cell]
+        return self.xs[runs[0][0]], self.xs[runs[-1][0] + 1]
+
+    def get_interval(self, cell, x):
+        """Free y range of a cell at x, on the border of two columns both have to be free"""
+        y0, y1 = None, None
+        for i, j0, j1 in self.cells[cell]:
+            if self.xs[i] <= x <= self.xs[i + 1]:
+                lo, hi = self.ys[j0], self.ys[j1 + 1]
+                y0 = lo if y0 is None else max(y0, lo)
+                y1 = hi if y1 is None else min(y1, hi)
+        return y0, y1
+
+    def get_boundary_segments(self):
+        """Borders between free and blocked space as ((x0, y0), (x1, y1)), collinear pieces are joined"""
+        columns, rows = len(self.free), len(self.free[0]) if self.free else 0
+
+        def blocked(i, j):
+            return not (0 <= i < columns and 0 <= j < rows) or not self.free[i][j]
+
+        horizontal, vertical = {}, {}
+        for i in range(columns):
+            for j in range(rows):
+                if not self.free[i][j]:
+                    continue
+                if blocked(i, j - 1):
+                    horizontal.setdefault((self.ys[j], -1), []).append((self.xs[i], self.xs[i + 1]))
+                if blocked(i, j + 1):
+                    horizontal.setdefault((self.ys[j + 1], 1), []).append((self.xs[i], self.xs[i + 1]))
+                if blocked(i - 1, j):
+                    vertical.setdefault((self.xs[i], -1), []).append((self.ys[j], self.ys[j + 1]))
+                if blocked(i + 1, j):
+                    vertical.setdefault((self.xs[i + 1], 1), []).append((self.ys[j], self.ys[j + 1]))
+
+        segments = []
+        for (y, _), pieces in horizontal.items():
+            segments.extend(((a, y), (b, y)) for a, b in _join(pieces))
+        for (x, _), pieces in vertical.items():
+            segments.extend(((x, a), (x, b)) for a, b in _join(pieces))
+        return segments
+
+    def locate(self, x, y):
+        """Grid cell (i, j) of the free grid cell that contains the point or is closest to it"""
+        best, best_distance = None, None
+        for i in range(len(self.free)):
+            dx = max(self.xs[i] - x, 0, x - self.xs[i + 1])
+            for j in range(len(self.free[i])):
+                if not self.free[i][j]:
+                    continue
+                dy = max(self.ys[j] - y, 0, y - self.ys[j + 1])
+                distance = dx * dx + dy * dy
+                if best is None or distance < best_distance:
+                    best, best_distance = (i, j), distance
+                    if distance == 0:
+                        return best
+        return best
+
+    def _center(self, i, j):
+        return (self.xs[i] + self.xs[i + 1]) / 2, (self.ys[j] + self.ys[j + 1]) / 2
+
+    def get_path(self, start, goal):
+        """
+        Axis parallel path from start to goal through free space. The path leads through the centers of
+        neighbouring grid cells, which are rectangles, so every segment stays inside the free space.
+
+        :returns: list of points without start, ending with goal
+        """
+        a, b = self.locate(*start), self.locate(*goal)
+        if a is None or b is None:
+            return [goal]
+
+        previous = {a: None}
+        distances = {a: 0}
+        queue = [(0, a)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if node == b:
+                break
+            if distance > distances[node]:
+                continue
+            cx, cy = self._center(*node)
+            i, j = node
+            for n in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)):
+                if 0 <= n[0] < len(self.free) and 0 <= n[1] < len(self.free[0]) and self.free[n[0]][n[1]]:
+                    nx, ny = self._center(*n)
+                    d = distance + abs(nx - cx) + abs(ny - cy)
+                    if n not in distances or d < distances[n]:
+                        distances[n] = d
+                        previous[n] = node
+                        heapq.heappush(queue, (d, n))
+
+        if b not in previous:
+            return [goal]
+
+        nodes = []
+        node = b
+        while node is not None:
+            nodes.append(node)
+            node = previous[node]
+        nodes.reverse()
+
+        if len(nodes) == 1:
+            points = [(goal[0], start[1]), goal]
+        else:
+            first, last = self._center(*nodes[0]), self._center(*nodes[-1])
+            points = [(first[0], start[1]), first]
+            points.extend(self._center(*node) for node in nodes[1:])
+            points.extend([(goal[0], last[1]), goal])
+
+        return _simplify(start, points)
+
+
+def _join(pieces):
+    joined = []
+    for a, b in sorted(pieces):
+        if joined and a <= joined[-1][1]:
+            joined[-1] = (joined[-1][0], max(joined[-1][1], b))
+        else:
+            joined.append((a, b))
+    return joined
+
+
+def _simplify(start, points):
+    # drop repeated points and points in the middle of a straight line
+    result = []
+    last = start
+    for p in points:
+        if p == last:
+            continue
+        if result:
+            before = result[-2] if len(result) > 1 else start
+            if (before[0] == last[0] == p[0]) or (before[1] == last[1] == p[1]):
+                result[-1] = p
+                last = p
+                continue
+        result.append(p)
+        last = p
+    return result
@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+
+# configuration spaces by obstacle layout and radius, shared by all environments
+_SPACES = {}
+_MAX_CACHED_SPACES = 32
+
+
+class ConfigurationSpace:
+    """
+    Occupancy bitmap of the robot center. A pixel is occupied if a robot with its center on it collides with
+    one of the rectangles, exactly like Robot.collides_rectangle decides it for the integer robot rect. The
+    bitmap covers the bounding box of the rectangles grown by the radius, no center outside of it collides.
+    """
+
+    def __init__(self, rects, radius):
+        """
+        :param rects: obstacles as (x0, y0, x1, y1)
+        :param radius: radius of the robot
+        """
+        self.radius = radius
+        self.rects = ()
+        pad = int(math.ceil(radius)) + 1
+        if rects:
+            self.x0 = min(r[0] for r in rects) - pad
+            self.y0 = min(r[1] for r in rects) - pad
+            x1, y1 = max(r[2] for r in rects) + pad, max(r[3] for r in rects) + pad
+        else:
+            self.x0, self.y0, x1, y1 = 0, 0, 0, 0
+        self.occupied = np.zeros((x1 - self.x0, y1 - self.y0), dtype=bool)
+
+        for rect in rects:
+            self.add_rect(rect)
+
+    def contains(self, rect):
+        """The rectangle grown by the radius lies inside the bitmap"""
+        pad = int(math.ceil(self.radius)) + 1
+        return rect[0] - pad >= self.x0 and rect[1] - pad >= self.y0 \
+            and rect[2] + pad <= self.x0 + self.occupied.shape[0] and rect[3] + pad <= self.y0 + self.occupied.shape[1]
+
+    def add_rect(self, rect):
+        """Mark the centers colliding with the rectangle, which has to be contained in the bitmap"""
+        x0, y0, x1, y1 = rect
+        d = self.radius
+        self.rects = self.rects + (tuple(rect),)
+
+        # only centers closer than the radius to the rectangle can collide
+        ix0, iy0 = int(math.floor(x0 - d)) - self.x0, int(math.floor(y0 - d)) - self.y0
+        ix1, iy1 = int(math.ceil(x1 + d)) + 1 - self.x0, int(math.ceil(y1 + d)) + 1 - self.y0
+        ix0, iy0 = max(ix0, 0), max(iy0, 0)
+        ix1, iy1 = min(ix1, self.occupied.shape[0]), min(iy1, self.occupied.shape[1])
+        if ix0 >= ix1 or iy0 >= iy1:
+            return
+        cx = np.arange(ix0, ix1)[:, None] + self.x0
+        cy = np.arange(iy0, iy1)[None, :] + self.y0
+
+        # the same checks as Robot.collides_rectangle
+        inside_x = (x0 < cx) & (cx < x1)
+        inside_y = (y0 < cy) & (cy < y1)
+        hit = inside_x & inside_y
+        hit = hit | (inside_x & (((y0 - d < cy) & (cy < y0)) | ((y1 < cy) & (cy < y1 + d))))
+        hit = hit | (inside_y & (((x0 - d < cx) & (cx < x0)) | ((x1 < cx) & (cx < x1 + d))))
+        for vx, vy in ((x0, y1), (x1, y1), (x1, y0), (x0, y0)):
+            hit = hit | (np.sqrt((cx - vx) ** 2 + (cy - vy) ** 2) < d)
+
+        self.occupied[ix0:ix1, iy0:iy1] |= hit
+
+    def collides(self, cx, cy):
+        """Whether the robot with its center on the integer pixel (cx, cy) collides with a rectangle"""
+        ix, iy = cx - self.x0, cy - self.y0
+        if 0 <= ix < self.occupied.shape[0] and 0 <= iy < self.occupied.shape[1]:
+            return bool(self.occupied[ix, iy])
+        return False
+
+    def copy(self):
+        space = ConfigurationSpace((), self.radius)
+        space.x0, space.y0 = self.x0, self.y0
+        space.occupied = self.occupied.copy()
+        space.rects = self.rects
+        return space
+
+
+def _cache(space):
+    if len(_SPACES) >= _MAX_CACHED_SPACES:
+        del _SPACES[next(iter(_SPACES))]
+    _SPACES[(space.rects, space.radius)] = space
+    return space
+
+
+def get_configuration_space(rects, radius):
+    """Cached ConfigurationSpace of the rectangles (x0, y0, x1, y1)"""
+    rects = tuple(tuple(r) for r in rects)
+    space = _SPACES.get((rects, radius))
+    if space is None:
+        space = _cache(ConfigurationSpace(rects, radius))
+    return space
+
+
+def extend_configuration_space(space, rects):
+    """
+    Cached ConfigurationSpace of the layout of space with more rectangles. Only the new rectangles are
+    painted into a copy of the bitmap, cached spaces are never changed.
+    """
+    rects = tuple(tuple(r) for r in rects)
+    extended = _SPACES.get((space.rects + rects, space.radius))
+    if extended is not None:
+        return extended
+
+    if not all(space.contains(rect) for rect in rects):
+        return _cache(ConfigurationSpace(space.rects + rects, space.radius))
+    extended = space.copy()
+    for rect in rects:
+        extended.add_rect(rect)
+    return _cache(extended)
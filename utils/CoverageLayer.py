@@ -0,0 +1,74 @@
+import numpy as np
+import pygame
+
+from sprite.Tile import TileState
+from utils.colorUtils import LIGHT_GREY, DARK_GREY
+
+
+class CoverageLayer:
+    """
+    The tiles of an environment drawn as one surface. The colors come from the state and cover count arrays
+    of the TileGrid, one pixel per tile, and are scaled up to the tile size without smoothing. After the
+    first frame only the tiles in dirty_tiles are repainted, so the cost of a frame does not depend on how
+    many tiles are covered.
+
+    The colors are the ones the Tile sprites show: a covered tile gets lighter with every cover, a full
+    covered tile keeps the color of its last cover and uncovered tiles show the background.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.small = None
+        self.surface = None
+        # tiles changed since the last draw, filled by the visualizer from the sim events
+        self.dirty_tiles = set()
+        # grid and background the surface was painted for, a change of either repaints everything
+        self._grid = None
+        self._background = None
+
+    def get_colors(self, background, ixs=slice(None), iys=slice(None)):
+        """RGB colors of all tiles as uint8 array of shape (columns, rows, 3), or of the tiles (ixs, iys)"""
+        grid = self.env.tile_grid
+        dirt_per_cover, dirt, _, _ = grid.cover_parameters
+        base = np.array([255 - dirt] * 3, dtype=np.int64)
+        states, counts = grid.states[ixs, iys], grid.cover_counts[ixs, iys].astype(np.int64)
+
+        colors = np.empty(states.shape + (3,), dtype=np.int64)
+        colors[...] = background
+        covered = states == TileState.COVERED.value
+        colors[covered] = base + counts[covered, None] * dirt_per_cover
+
+        # a tile is repainted every tick while it is covered, it went full covered one cover later
+        full = states == TileState.FULL_COVERED.value
+        colors[full] = base + (counts[full, None] - 1) * dirt_per_cover
+        colors[full & (counts <= 1)] = LIGHT_GREY
+        colors[states == TileState.COVERED_BY_OBSTACLE.value] = DARK_GREY
+        return colors.astype(np.uint8)
+
+    def draw(self, target, background):
+        """Draws the tiles onto target, uncovered tiles in the background color"""
+        grid = self.env.tile_grid
+        tile_size = self.env.tile_size
+        size = (grid.columns * tile_size, grid.rows * tile_size)
+        background = tuple(background)
+
+        # repainting single tiles only pays off while few of them changed
+        if (self.surface is None or self.surface.get_size() != size or self._grid is not grid
+                or self._background != background or len(self.dirty_tiles) * 8 > grid.columns * grid.rows):
+            if self.small is None or self.small.get_size() != (grid.columns, grid.rows):
+                self.small = pygame.Surface((grid.columns, grid.rows))
+            if self.surface is None or self.surface.get_size() != size:
+                self.surface = pygame.Surface(size)
+            pygame.surfarray.blit_array(self.small, self.get_colors(background))
+            pygame.transform.scale(self.small, size, self.surface)
+            self._grid = grid
+            self._background = background
+        elif self.dirty_tiles:
+            ixs = np.fromiter((tile.ix for tile in self.dirty_tiles), dtype=np.intp, count=len(self.dirty_tiles))
+            iys = np.fromiter((tile.iy for tile in self.dirty_tiles), dtype=np.intp, count=len(self.dirty_tiles))
+            fill = self.surface.fill
+            for ix, iy, color in zip(ixs.tolist(), iys.tolist(), self.get_colors(background, ixs, iys).tolist()):
+                fill(color, (ix * tile_size, iy * tile_size, tile_size, tile_size))
+        self.dirty_tiles.clear()
+
+        target.blit(self.surface, (0, 0))
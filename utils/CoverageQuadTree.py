@@ -0,0 +1,188 @@
+import heapq
+
+import numpy as np
+
+from sprite.Tile import TileState
+
+# tile states that take part in the coverage statistics, COVERED_BY_OBSTACLE is ignored
+TRACKED_STATES = (TileState.UNCOVERED, TileState.COVERED, TileState.FULL_COVERED)
+
+
+class CoverageQuadTree:
+    """
+    Keeps the number of uncovered, covered and full covered tiles for every node of a quadtree
+    over the tile grid. A 2D fenwick tree is kept next to the quadtree so that the counts of an
+    arbitrary rectangle can be answered in O(log^2 n) while the quadtree answers nearest
+    neighbour queries. All coordinates are tile indices.
+    """
+
+    def __init__(self, columns: int, rows: int):
+        self.columns = columns
+        self.rows = rows
+
+        size = 1
+        while size < max(columns, rows, 1):
+            size = size * 2
+        self.size = size
+
+        # levels[0] are the leaves, levels[-1] is the root. Every level holds one flat list per state.
+        self.levels = []
+        level_size = size
+        while True:
+            self.levels.append([[0] * (level_size * level_size) for _ in TRACKED_STATES])
+            if level_size == 1:
+                break
+            level_size = level_size // 2
+
+        # fenwick tree, one flat list per state with (columns + 1) * (rows + 1) entries
+        self._fenwick = [[0] * ((columns + 1) * (rows + 1)) for _ in TRACKED_STATES]
+
+    @classmethod
+    def from_tiles(cls, tiles):
+        tree = cls(len(tiles), len(tiles[0]) if tiles else 0)
+        for ix, col in enumerate(tiles):
+            for iy, tile in enumerate(col):
+                tree.update(ix, iy, None, tile.state)
+
+        return tree
+
+    @classmethod
+    def from_states(cls, states):
+        """Tree of a whole grid of TileState values indexed [x][y] like TileGrid.states, built with numpy"""
+        columns, rows = states.shape
+        tree = cls(columns, rows)
+        size = tree.size
+
+        # every fenwick node (i, j) sums the tiles (i - lowbit(i), i] x (j - lowbit(j), j]
+        i = np.arange(columns + 1)
+        j = np.arange(rows + 1)
+        low_i, low_j = i - (i & -i), j - (j & -j)
+        low_i[0], low_j[0] = 0, 0
+
+        for state_idx, state in enumerate(TRACKED_STATES):
+            leaves = np.zeros((size, size), dtype=np.int64)
+            leaves[:columns, :rows] = states == state.value
+            level_size = size
+            for level in tree.levels:
+                level[state_idx] = leaves.ravel().tolist()
+                level_size = level_size // 2
+                if level_size:
+                    leaves = leaves.reshape(level_size, 2, level_size, 2).sum(axis=(1, 3))
+
+            prefix = np.zeros((columns + 1, rows + 1), dtype=np.int64)
+            prefix[1:, 1:] = np.cumsum(np.cumsum(states == state.value, axis=0), axis=1)
+            fenwick = prefix[i][:, j] - prefix[low_i][:, j] - prefix[i][:, low_j] + prefix[low_i][:, low_j]
+            fenwick[0, :], fenwick[:, 0] = 0, 0
+            tree._fenwick[state_idx] = fenwick.ravel().tolist()
+
+        return tree
+
+    def copy(self):
+        tree = CoverageQuadTree.__new__(CoverageQuadTree)
+        tree.columns, tree.rows, tree.size = self.columns, self.rows, self.size
+        tree.levels = [[list(counts) for counts in level] for level in self.levels]
+        tree._fenwick = [list(counts) for counts in self._fenwick]
+        return tree
+
+    def update(self, ix: int, iy: int, old_state, new_state):
+        if old_state == new_state:
+            return
+
+        if old_state in TRACKED_STATES:
+            self._add(ix, iy, old_state.value, -1)
+        if new_state in TRACKED_STATES:
+            self._add(ix, iy, new_state.value, 1)
+
+    def _add(self, ix: int, iy: int, state_idx: int, delta: int):
+        i, j = ix, iy
+        level_size = self.size
+        for level in self.levels:
+            level[state_idx][i * level_size + j] += delta
+            i, j = i >> 1, j >> 1
+            level_size = level_size >> 1
+
+        fenwick = self._fenwick[state_idx]
+        stride = self.rows + 1
+        i = ix + 1
+        while i <= self.columns:
+            j = iy + 1
+            while j <= self.rows:
+                fenwick[i * stride + j] += delta
+                j += j & -j
+            i += i & -i
+
+    def _prefix(self, state_idx: int, ix: int, iy: int):
+        # sum over the tiles [0, ix) x [0, iy)
+        fenwick = self._fenwick[state_idx]
+        stride = self.rows + 1
+        total = 0
+        i = ix
+        while i > 0:
+            j = iy
+            while j > 0:
+                total += fenwick[i * stride + j]
+                j -= j & -j
+            i -= i & -i
+
+        return total
+
+    def counts(self, x0: int, y0: int, x1: int, y1: int):
+        """Return (uncovered, covered, full_covered) for the tiles [x0, x1) x [y0, y1)"""
+        x0, x1 = max(x0, 0), min(x1, self.columns)
+        y0, y1 = max(y0, 0), min(y1, self.rows)
+        if x0 >= x1 or y0 >= y1:
+            return 0, 0, 0
+
+        return tuple(self._prefix(s, x1, y1) - self._prefix(s, x0, y1) - self._prefix(s, x1, y0)
+                     + self._prefix(s, x0, y0) for s in range(len(TRACKED_STATES)))
+
+    def total_counts(self):
+        root = self.levels[-1]
+        return root[0][0], root[1][0], root[2][0]
+
+    def coverage_percentage(self, x0: int, y0: int, x1: int, y1: int):
+        uncovered, covered, full_covered = self.counts(x0, y0, x1, y1)
+        total = uncovered + covered + full_covered
+        return (covered + full_covered) / total * 100 if total > 0 else 0
+
+    def full_coverage_percentage(self, x0: int, y0: int, x1: int, y1: int):
+        uncovered, covered, full_covered = self.counts(x0, y0, x1, y1)
+        total = uncovered + covered + full_covered
+        return full_covered / total * 100 if total > 0 else 0
+
+    def is_done(self, x0: int, y0: int, x1: int, y1: int):
+        uncovered, covered, _ = self.counts(x0, y0, x1, y1)
+        return uncovered == 0 and covered == 0
+
+    def nearest_uncovered(self, x: float, y: float):
+        """
+        Best first search for the uncovered tile closest to the point (x, y), given in tile units.
+        Only nodes which still contain uncovered tiles are expanded.
+
+        :returns: (ix, iy) of the nearest uncovered tile or None if every tile is covered
+        """
+        uncovered_idx = TileState.UNCOVERED.value
+        top = len(self.levels) - 1
+        if self.levels[top][uncovered_idx][0] == 0:
+            return None
+
+        heap = [(0.0, top, 0, 0)]
+        while heap:
+            _, level, i, j = heapq.heappop(heap)
+            if level == 0:
+                return i, j
+
+            child_level = level - 1
+            child_size = self.size >> child_level
+            span = 1 << child_level
+            counts = self.levels[child_level][uncovered_idx]
+            for ci in (2 * i, 2 * i + 1):
+                for cj in (2 * j, 2 * j + 1):
+                    if counts[ci * child_size + cj] == 0:
+                        continue
+                    # distance from the point to the closest tile center inside the child node
+                    dx = max(ci * span + 0.5 - x, 0, x - ((ci + 1) * span - 0.5))
+                    dy = max(cj * span + 0.5 - y, 0, y - ((cj + 1) * span - 0.5))
+                    heapq.heappush(heap, (dx * dx + dy * dy, child_level, ci, cj))
+
+        return None
@@ -0,0 +1,117 @@
+import heapq
+from collections import deque
+
+UNREACHABLE = float("inf")
+
+
+class IncrementalDistanceField:
+    """
+    Breadth first distance of every node of a graph to its nearest source node.
+
+    Sources and edges can only be removed. Removals are collected and applied by flush, which only touches
+    the nodes whose every shortest path used a removed source or edge: they are found level by level,
+    starting at the removals, and get their new distances from the unaffected nodes around them.
+    """
+
+    def __init__(self, neighbors, sources):
+        """
+        :param neighbors: list with the neighbour node indices of every node
+        :param sources: indices of the source nodes
+        """
+        self.neighbors = neighbors
+        self.distances = [UNREACHABLE] * len(neighbors)
+        self.sources = [False] * len(neighbors)
+        self._changed = []
+
+        queue = deque()
+        for node in sources:
+            self.sources[node] = True
+            self.distances[node] = 0
+            queue.append(node)
+
+        distances = self.distances
+        while queue:
+            node = queue.popleft()
+            distance = distances[node] + 1
+            for neighbor in neighbors[node]:
+                if distances[neighbor] > distance:
+                    distances[neighbor] = distance
+                    queue.append(neighbor)
+
+    def remove_source(self, node):
+        if self.sources[node]:
+            self.sources[node] = False
+            self._changed.append(node)
+
+    def remove_edge(self, a, b):
+        if b in self.neighbors[a]:
+            self.neighbors[a].remove(b)
+            self.neighbors[b].remove(a)
+            self._changed.extend((a, b))
+
+    def flush(self):
+        """Apply the removed sources and edges, returns the number of nodes that were recomputed"""
+        if not self._changed:
+            return 0
+
+        distances, neighbors, sources = self.distances, self.neighbors, self.sources
+        affected = set()
+        candidates = [(distances[node], node) for node in self._changed if distances[node] != UNREACHABLE]
+        self._changed = []
+        heapq.heapify(candidates)
+
+        # a node loses its distance if no unaffected neighbour is one step closer to a source. The candidates
+        # are checked by increasing old distance, so the affected nodes one step closer are already known.
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if node in affected or sources[node]:
+                continue
+            supported = False
+            for neighbor in neighbors[node]:
+                if distances[neighbor] == distance - 1 and neighbor not in affected:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected.add(node)
+            for neighbor in neighbors[node]:
+                if distances[neighbor] == distance + 1:
+                    heapq.heappush(candidates, (distance + 1, neighbor))
+
+        heap = []
+        for node in affected:
+            best = UNREACHABLE
+            for neighbor in neighbors[node]:
+                if neighbor not in affected and distances[neighbor] + 1 < best:
+                    best = distances[neighbor] + 1
+            distances[node] = best
+            if best != UNREACHABLE:
+                heap.append((best, node))
+
+        heapq.heapify(heap)
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance != distances[node]:
+                continue
+            for neighbor in neighbors[node]:
+                if neighbor in affected and distances[neighbor] > distance + 1:
+                    distances[neighbor] = distance + 1
+                    heapq.heappush(heap, (distance + 1, neighbor))
+
+        return len(affected)
+
+    def get_distance(self, node):
+        return self.distances[node]
+
+    def get_next_node(self, node, preferred=None):
+        """Neighbour one step closer to a source, the preferred neighbour if it is one of them"""
+        distance = self.distances[node]
+        if distance == 0 or distance == UNREACHABLE:
+            return None
+
+        if preferred is not None and preferred in self.neighbors[node] and self.distances[preferred] == distance - 1:
+            return preferred
+        for neighbor in self.neighbors[node]:
+            if self.distances[neighbor] == distance - 1:
+                return neighbor
+        return None
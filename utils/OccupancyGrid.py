@@ -0,0 +1,224 @@
+import io
+
+import numpy as np
+import pygame
+
+from utils.config_manager import config_manager
+from utils.rasterUtils import spans_to_rects
+
+# pixels decoded at once, a PGM scan is streamed in blocks of rows of about this size
+BLOCK_PIXELS = 1 << 22
+
+
+class OccupancyGrid:
+    """
+    Occupied tiles of a floor plan image, indexed [x][y] like TileGrid. The image is scaled uniformly to fit
+    the tile grid, tiles outside of it are occupied. A pixel is occupied if its brightness is below threshold
+    (0 black, 1 white) and a tile is occupied if at least min_fraction of the pixels it covers are.
+    """
+
+    def __init__(self, columns: int, rows: int, image_width: int, image_height: int):
+        self.columns = columns
+        self.rows = rows
+        self.image_width = image_width
+        self.image_height = image_height
+
+        # image pixels per tile, a tile covers the pixels [start, end) in both directions
+        self.scale = max(image_width / columns, image_height / rows)
+        self.x_ranges = self._get_ranges(columns, image_width)
+        self.y_ranges = self._get_ranges(rows, image_height)
+
+        self.occupied_pixels = np.zeros((columns, rows), dtype=np.int64)
+        self.occupied = None
+
+    def _get_ranges(self, tiles, pixels):
+        # tiles past the image cover no pixels, a smaller image gives at least one pixel to every tile
+        starts = np.minimum(np.floor(np.arange(tiles) * self.scale).astype(np.int64), pixels)
+        ends = np.minimum(np.maximum(np.floor(np.arange(1, tiles + 1) * self.scale).astype(np.int64), starts + 1),
+                          pixels)
+        return starts, ends
+
+    def add_rows(self, y0: int, occupied):
+        """Counts the occupied pixels of the image rows y0, y0 + 1, ..., occupied is indexed [x][y]"""
+        y1 = y0 + occupied.shape[1]
+        x_starts, x_ends = self.x_ranges
+
+        # occupied pixels per tile column of every row, then summed up over the rows of every tile row
+        prefix = np.zeros((occupied.shape[0] + 1, occupied.shape[1]), dtype=np.int64)
+        np.cumsum(occupied, axis=0, out=prefix[1:])
+        per_column = prefix[x_ends] - prefix[x_starts]
+        row_prefix = np.zeros((self.columns, occupied.shape[1] + 1), dtype=np.int64)
+        np.cumsum(per_column, axis=1, out=row_prefix[:, 1:])
+
+        for row, (start, end) in enumerate(zip(*self.y_ranges)):
+            start, end = max(start, y0), min(end, y1)
+            if start < end:
+                self.occupied_pixels[:, row] += row_prefix[:, end - y0] - row_prefix[:, start - y0]
+
+    def finish(self, min_fraction=0.1):
+        """Decides which tiles are occupied once all rows were added"""
+        x_starts, x_ends = self.x_ranges
+        y_starts, y_ends = self.y_ranges
+        pixels = (x_ends - x_starts)[:, None] * (y_ends - y_starts)[None, :]
+        self.occupied = (pixels == 0) | (self.occupied_pixels >= np.maximum(min_fraction * pixels, 1))
+        return self.occupied
+
+    def get_obstacles(self, tile_size: int):
+        """Rectangles [x, y, width, height] in pixels of the occupied tiles, the outer tiles are left to the walls"""
+        inner = self.occupied.copy()
+        inner[0, :], inner[-1, :], inner[:, 0], inner[:, -1] = False, False, False, False
+
+        # runs of occupied tiles per tile row, merged into rectangles over equal rows
+        spans = {}
+        for row in range(self.rows):
+            column = np.concatenate(([False], inner[:, row], [False]))
+            edges = np.flatnonzero(column[1:] != column[:-1])
+            if len(edges):
+                spans[row] = list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+        return [[x * tile_size, y * tile_size, width * tile_size, height * tile_size]
+                for x, y, width, height in spans_to_rects(spans)]
+
+    def get_robot(self, radius: int, tile_size: int):
+        """
+        [x, y, radius] of a robot on the free tile farthest from the occupied tiles and walls, None if
+        there is no place where the robot fits
+        """
+        free = ~self.occupied
+        free[0, :], free[-1, :], free[:, 0], free[:, -1] = False, False, False, False
+
+        # erode the free tiles until they are gone, the last ones are the farthest from everything.
+        # after depth steps the center of a tile is at least (depth + 0.5) * tile_size away from the others
+        depth = 0
+        while True:
+            eroded_x = free.copy()
+            eroded_x[1:, :] &= free[:-1, :]
+            eroded_x[:-1, :] &= free[1:, :]
+            eroded = eroded_x.copy()
+            eroded[:, 1:] &= eroded_x[:, :-1]
+            eroded[:, :-1] &= eroded_x[:, 1:]
+            if not eroded.any():
+                break
+            free, depth = eroded, depth + 1
+
+        if not free.any() or (depth + 0.5) * tile_size < radius:
+            return None
+        xs, ys = np.nonzero(free)
+        k = np.argmin((xs - xs.mean()) ** 2 + (ys - ys.mean()) ** 2)
+        return [int((xs[k] + 0.5) * tile_size) - radius, int((ys[k] + 0.5) * tile_size) - radius, radius]
+
+
+def _read_token(f):
+    # next whitespace separated token of a netpbm header, comments run from # to the end of the line
+    token = b""
+    while True:
+        c = f.read(1)
+        if not c:
+            return token
+        if c == b"#":
+            while c not in (b"\n", b"\r", b""):
+                c = f.read(1)
+            continue
+        if c.isspace():
+            if token:
+                return token
+            continue
+        token = token + c
+
+
+def _read_header_value(f, name):
+    # positive integer of a netpbm header
+    token = _read_token(f)
+    if not token:
+        raise ValueError("PGM header ends before the %s" % name)
+    if not token.isdigit() or int(token) == 0:
+        raise ValueError("invalid PGM %s %r" % (name, token.decode("latin-1")))
+    return int(token)
+
+
+def read_pgm(f, magic):
+    """
+    Streams a PGM image in blocks of rows. The magic number is already read from f.
+
+    :returns: (width, height, maxval, blocks), blocks yields (y0, pixels) with pixels indexed [x][y]
+    """
+    width, height = _read_header_value(f, "width"), _read_header_value(f, "height")
+    maxval = _read_header_value(f, "maxval")
+
+    def blocks():
+        if magic == b"P2":
+            try:
+                pixels = np.array(f.read().split()[:width * height], dtype=np.int64)
+            except ValueError:
+                raise ValueError("invalid PGM pixel value") from None
+            if len(pixels) < width * height:
+                raise ValueError("PGM image ends after %d of %d pixels" % (len(pixels), width * height))
+            yield 0, pixels.reshape(height, width).T
+            return
+
+        dtype = np.dtype(">u2") if maxval > 255 else np.dtype(np.uint8)
+        rows_per_block = max(1, BLOCK_PIXELS // max(width, 1))
+        for y0 in range(0, height, rows_per_block):
+            rows = min(rows_per_block, height - y0)
+            data = f.read(rows * width * dtype.itemsize)
+            if len(data) < rows * width * dtype.itemsize:
+                raise ValueError("PGM image ends after %d of %d rows" % (y0 + len(data) // (width * dtype.itemsize),
+                                                                          height))
+            yield y0, np.frombuffer(data, dtype=dtype).reshape(rows, width).T
+
+    return width, height, maxval, blocks()
+
+
+def read_png(f):
+    """PNG image decoded with pygame as one block, (width, height, maxval, blocks) like read_pgm"""
+    # pygame may read the file descriptor directly, past what f already buffered
+    try:
+        image = pygame.image.load(io.BytesIO(f.read()), "plan.png")
+    except pygame.error as e:
+        raise ValueError("invalid PNG image") from e
+    pixels = pygame.surfarray.array3d(image).astype(np.int64)
+    # luma of the rgb pixels, already indexed [x][y]
+    gray = (pixels[:, :, 0] * 299 + pixels[:, :, 1] * 587 + pixels[:, :, 2] * 114) // 1000
+    return gray.shape[0], gray.shape[1], 255, iter([(0, gray)])
+
+
+def read_occupancy_grid(f, columns: int, rows: int, threshold=0.5, min_fraction=0.1):
+    """OccupancyGrid of the tile grid from a binary file object of a PNG or PGM image"""
+    magic = f.read(2)
+    if magic in (b"P2", b"P5"):
+        width, height, maxval, blocks = read_pgm(f, magic)
+    elif magic == b"\x89P":
+        f.seek(0)
+        width, height, maxval, blocks = read_png(f)
+    else:
+        raise ValueError("only PNG and PGM images can be imported")
+
+    grid = OccupancyGrid(columns, rows, width, height)
+    for y0, pixels in blocks:
+        grid.add_rows(y0, pixels < threshold * maxval)
+    grid.finish(min_fraction)
+    return grid
+
+
+def import_environment(path, name=None, threshold=0.5, min_fraction=0.1, robot=None):
+    """
+    Reads a floor plan image into a new environment of the config manager
+
+    :param path: path or binary file object of a PNG or PGM image
+    :param robot: [x, y, radius] of the robot, by default it is placed as far as possible from the obstacles
+    :returns: id of the new environment
+    """
+    env_config = config_manager.get_environment_config()
+    tile_size = env_config["tile_size"]
+    columns = len(range(0, env_config["width"], tile_size))
+    rows = len(range(0, env_config["height"], tile_size))
+
+    if isinstance(path, str):
+        with open(path, "rb") as f:
+            grid = read_occupancy_grid(f, columns, rows, threshold, min_fraction)
+        name = name or path
+    else:
+        grid = read_occupancy_grid(path, columns, rows, threshold, min_fraction)
+
+    if robot is None:
+        robot = grid.get_robot(config_manager.get_robot_config()["radius"], tile_size)
+    return config_manager.add_environment(grid.get_obstacles(tile_size), robot or [], name)
@@ -0,0 +1,72 @@
+from collections import deque
+
+
+class PlateauDetector:
+    """
+    Detects that the coverage of a run stopped growing. It is fed the (ticks, coverage) samples of the
+    statistic and reports a plateau once the coverage grew less than min_rate percent per 1000 ticks over
+    the last window ticks.
+
+    The final coverage is predicted with Aitken's delta squared extrapolation of the samples window / 2
+    ticks apart, which is exact for a coverage that approaches its limit geometrically.
+    """
+
+    def __init__(self, window=20000, min_rate=0.02):
+        if window <= 0:
+            raise ValueError("the plateau window must be positive")
+        self.window = window
+        self.min_rate = min_rate
+        self.samples = deque()
+        self.plateaued = False
+
+    def add(self, ticks, coverage):
+        """Adds a sample, returns True once the coverage plateaued"""
+        samples = self.samples
+        if samples and ticks <= samples[-1][0]:
+            # the statistic saves a sample twice when the goal is reached
+            samples[-1] = (samples[-1][0], coverage)
+            return self.plateaued
+        samples.append((ticks, coverage))
+
+        # keep one sample at or before the start of the window
+        while len(samples) > 2 and samples[1][0] <= ticks - self.window:
+            samples.popleft()
+
+        if not self.plateaued and samples[0][0] <= ticks - self.window:
+            self.plateaued = self.get_rate() < self.min_rate
+        return self.plateaued
+
+    def get_rate(self):
+        """Coverage growth in percent per 1000 ticks over the window, None with less than two samples"""
+        if len(self.samples) < 2:
+            return None
+        (t0, c0), (t1, c1) = self.samples[0], self.samples[-1]
+        return (c1 - c0) / (t1 - t0) * 1000
+
+    def _sample_at(self, ticks):
+        # coverage at ticks, interpolated between the samples around it
+        previous = self.samples[0]
+        for sample in self.samples:
+            if sample[0] >= ticks:
+                if sample[0] == previous[0]:
+                    return sample[1]
+                return previous[1] + (sample[1] - previous[1]) * (ticks - previous[0]) / (sample[0] - previous[0])
+            previous = sample
+        return previous[1]
+
+    def predict_final_coverage(self):
+        """
+        Coverage the run converges to, extrapolated from the window. 100 if the growth does not slow
+        down, None before the window is filled
+        """
+        if not self.samples or self.samples[0][0] > self.samples[-1][0] - self.window:
+            return None
+
+        t2, c2 = self.samples[-1]
+        c0, c1 = self._sample_at(t2 - self.window), self._sample_at(t2 - self.window / 2)
+        d1, d2 = c1 - c0, c2 - c1
+        if d2 <= 0:
+            return c2
+        if d2 >= d1:
+            return 100.0
+        return min(100.0, c2 + d2 * d2 / (d1 - d2))
@@ -0,0 +1,163 @@
+import math
+
+import numpy as np
+
+# free regions of the robot center by layout and radius, and the tiles the robot can cover from one of them
+_REGIONS = {}
+_MAX_CACHED_REGIONS = 32
+_TILES = {}
+_MAX_CACHED_TILES = 64
+
+
+class FreeRegions:
+    """
+    Connected regions of the free centers of a ConfigurationSpace inside the room. The free pixels of every
+    pixel row are stored as runs [x0, x1) and runs of neighbouring rows that touch, also diagonally, belong
+    to the same region, so a robot can walk from every center of a region to every other one.
+    """
+
+    def __init__(self, space, width: int, height: int):
+        self.width = width
+        self.height = height
+
+        # free centers of the room, the bitmap of the space may cover less or more than the room
+        free = np.ones((width, height), dtype=bool)
+        x0, y0 = max(space.x0, 0), max(space.y0, 0)
+        x1, y1 = min(space.x0 + space.occupied.shape[0], width), min(space.y0 + space.occupied.shape[1], height)
+        if x0 < x1 and y0 < y1:
+            free[x0:x1, y0:y1] = ~space.occupied[x0 - space.x0:x1 - space.x0, y0 - space.y0:y1 - space.y0]
+
+        # runs of free pixels per row, in row order
+        padded = np.zeros((height, width + 2), dtype=bool)
+        padded[:, 1:-1] = free.T
+        rows, edges = np.nonzero(padded[:, 1:] != padded[:, :-1])
+        self.run_rows = rows[0::2]
+        self.run_starts, self.run_ends = edges[0::2], edges[1::2]
+
+        self.labels = self._label_runs()
+
+    def _label_runs(self):
+        parent = list(range(len(self.run_rows)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # first run of every row, runs of consecutive rows are merged with two pointers
+        firsts = np.searchsorted(self.run_rows, np.arange(self.height + 1)).tolist()
+        starts, ends = self.run_starts.tolist(), self.run_ends.tolist()
+        for y in range(self.height - 1):
+            i, i_end = firsts[y], firsts[y + 1]
+            j, j_end = firsts[y + 1], firsts[y + 2]
+            while i < i_end and j < j_end:
+                # diagonal neighbours touch too
+                if starts[i] <= ends[j] and starts[j] <= ends[i]:
+                    a, b = find(i), find(j)
+                    if a != b:
+                        parent[a] = b
+                if ends[i] < ends[j]:
+                    i = i + 1
+                else:
+                    j = j + 1
+
+        return np.array([find(i) for i in range(len(parent))], dtype=np.int64)
+
+    def get_region(self, cx: int, cy: int):
+        """Label of the region of the center (cx, cy), None if the robot collides there"""
+        if not (0 <= cx < self.width and 0 <= cy < self.height):
+            return None
+        run = np.nonzero((self.run_rows == cy) & (self.run_starts <= cx) & (cx < self.run_ends))[0]
+        return int(self.labels[run[0]]) if len(run) else None
+
+    def get_mask(self, region: int, depth=0):
+        """
+        Centers of the region as a bool array indexed [x][y], grown by depth pixels. The robot only notices
+        a collision after the step into the obstacle, so its center gets up to one step deep into it.
+        """
+        mask = np.zeros((self.width, self.height), dtype=bool)
+        for k in np.nonzero(self.labels == region)[0].tolist():
+            mask[self.run_starts[k]:self.run_ends[k], self.run_rows[k]] = True
+
+        grown = mask.copy()
+        for dx in range(-depth, depth + 1):
+            for dy in range(-depth, depth + 1):
+                if (dx or dy) and dx * dx + dy * dy <= depth * depth:
+                    grown[max(dx, 0):self.width + min(dx, 0), max(dy, 0):self.height + min(dy, 0)] |= \
+                        mask[max(-dx, 0):self.width + min(-dx, 0), max(-dy, 0):self.height + min(-dy, 0)]
+        return grown
+
+
+def get_free_regions(space, width: int, height: int):
+    """Cached FreeRegions of the configuration space"""
+    key = (space.rects, space.radius, width, height)
+    regions = _REGIONS.get(key)
+    if regions is None:
+        if len(_REGIONS) >= _MAX_CACHED_REGIONS:
+            del _REGIONS[next(iter(_REGIONS))]
+        regions = _REGIONS[key] = FreeRegions(space, width, height)
+    return regions
+
+
+def get_coverable_tiles(centers, radius, tile_size: int, columns: int, rows: int):
+    """
+    Tiles that a robot with one of the centers covers, like Robot.covers_tile: all four corners of the
+    tile closer to the center than the radius. Bool array indexed [x][y].
+    """
+    width, height = centers.shape
+    # prefix sums of the centers along x, any center in a span of a pixel row is a difference of two
+    prefix = np.zeros((width + 1, height), dtype=np.int64)
+    np.cumsum(centers, axis=0, out=prefix[1:])
+
+    coverable = np.zeros((columns, rows), dtype=bool)
+    tile_x = np.arange(columns) * tile_size
+    tile_y = np.arange(rows) * tile_size
+    h = tile_size / 2
+
+    # offsets (u, v) of the center from the top left corner of a tile, the corners are at most
+    # |u - h| + h and |v - h| + h away in x and y
+    reach = radius - h
+    for v in range(int(math.floor(h - reach)), int(math.ceil(h + reach)) + 1):
+        dy = abs(v - h) + h
+        if dy * dy >= radius * radius:
+            continue
+        dx = math.sqrt(radius * radius - dy * dy) - h
+        # strictly closer than the radius
+        u0, u1 = int(math.floor(h - dx)) + 1, int(math.ceil(h + dx)) - 1
+        if u0 > u1:
+            continue
+
+        ys = tile_y + v
+        valid = (ys >= 0) & (ys < height)
+        if not valid.any():
+            continue
+        x0 = np.clip(tile_x + u0, 0, width)
+        x1 = np.clip(tile_x + u1 + 1, 0, width)
+        counts = prefix[x1][:, ys[valid]] - prefix[x0][:, ys[valid]]
+        coverable[:, valid] |= counts > 0
+
+    return coverable
+
+
+def get_reachable_tiles(space, width: int, height: int, tile_size: int, cx: int, cy: int, depth=0):
+    """
+    Tiles a robot starting with its center on the integer pixel (cx, cy) can cover, bool array indexed
+    [x][y]. depth is how far the center gets into obstacles, see FreeRegions.get_mask. Cached by layout,
+    radius, depth and the region of the start, None if the robot collides at the start.
+    """
+    regions = get_free_regions(space, width, height)
+    region = regions.get_region(cx, cy)
+    if region is None:
+        return None
+
+    key = (space.rects, space.radius, width, height, tile_size, depth, region)
+    tiles = _TILES.get(key)
+    if tiles is None:
+        if len(_TILES) >= _MAX_CACHED_TILES:
+            del _TILES[next(iter(_TILES))]
+        columns, rows = len(range(0, width, tile_size)), len(range(0, height, tile_size))
+        tiles = get_coverable_tiles(regions.get_mask(region, depth), space.radius, tile_size, columns, rows)
+        tiles.flags.writeable = False
+        _TILES[key] = tiles
+    return tiles
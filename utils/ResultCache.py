@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from utils.config_manager import config_manager
+
+# part of every key, increase it when something outside of SIMULATION_SOURCES changes the results of runs
+RESULT_VERSION = 1
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATH = os.path.join(ROOT, ".cache", "results.sqlite")
+
+# files and directories relative to ROOT whose sources decide the results of runs, their hash is part of every key
+SIMULATION_SOURCES = ("algorithm", "sprite", "EnvironmentTemplate.py", "RoomEnvironment.py", "HeadlessSimulation.py",
+                      "utils/ConfigurationSpace.py", "utils/CoverageQuadTree.py", "utils/PlateauDetector.py",
+                      "utils/ReachableTiles.py", "utils/SignedDistanceField.py")
+
+# caches by path, one per process
+_CACHES = {}
+
+# hash of SIMULATION_SOURCES, computed once per process
+_SOURCE_HASH = None
+
+
+def get_source_hash():
+    """Hash of the Python sources of SIMULATION_SOURCES, computed on the first call"""
+    global _SOURCE_HASH
+    if _SOURCE_HASH is None:
+        paths = []
+        for source in SIMULATION_SOURCES:
+            path = os.path.join(ROOT, source)
+            if os.path.isdir(path):
+                paths.extend(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".py"))
+            else:
+                paths.append(path)
+        sha = hashlib.sha256()
+        for path in sorted(paths):
+            sha.update(os.path.relpath(path, ROOT).replace(os.sep, "/").encode() + b"\0")
+            with open(path, "rb") as f:
+                sha.update(f.read() + b"\0")
+        _SOURCE_HASH = sha.hexdigest()
+    return _SOURCE_HASH
+
+
+def get_result_key(algorithm, parameters, environment, seed, max_ticks, plateau=None):
+    """
+    Content hash of everything a headless run depends on: the algorithm with its parameters merged over
+    the configuration, the obstacles and the robot start of the environment, the seed, the tick limit,
+    the plateau stop (window, min_rate), the robot, simulation and room configuration and the simulation
+    sources
+
+    :param environment: dict with the obstacles and robot of the environment, like ConfigManager.get_environment
+    """
+    config = config_manager.get_config()
+    env_config = config["environment"]
+    content = {
+        "version": RESULT_VERSION,
+        "sources": get_source_hash(),
+        "algorithm": algorithm,
+        "parameters": dict(config_manager.get_algorithm_config(algorithm), **dict(parameters or {})),
+        "obstacles": environment.get("obstacles", []),
+        "robot": environment.get("robot", []),
+        "seed": seed,
+        "max_ticks": max_ticks,
+        "plateau": list(plateau) if plateau else None,
+        "config": {
+            "robot": config["robot"],
+            "simulation": config["simulation"],
+            "room": [env_config["width"], env_config["height"], env_config["tile_size"]],
+        },
+    }
+    text = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Results of runs in a SQLite file, stored as compressed JSON under their get_result_key. When the stored
+    results grow past max_bytes the least recently used ones are removed. Every process opens its own
+    connection, so workers of a pool can share one cache file.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # a connection must not be used in a forked child
+        if self._connection is None or self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._pid = os.getpid()
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                                     "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        return self._connection
+
+    def get(self, key):
+        """The stored result or None"""
+        connection = self._connect()
+        row = connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, result):
+        """Stores a JSON serializable result and evicts the least recently used ones if the cache is too big"""
+        value = zlib.compress(json.dumps(result, separators=(",", ":")).encode())
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                               (key, value, len(value), time.time()))
+            self._evict(connection)
+
+    def _evict(self, connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total = total - size
+        connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def get_size(self):
+        """(results, bytes) stored"""
+        return tuple(self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone())
+
+    def clear(self):
+        self._connect().execute("DELETE FROM results")
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+def get_result_cache():
+    """ResultCache at the path and with the size of the cache configuration"""
+    cache_config = config_manager.get_config().get("cache", {})
+    path = cache_config.get("results_path") or DEFAULT_PATH
+    cache = _CACHES.get(path)
+    if cache is None:
+        cache = _CACHES[path] = ResultCache(path)
+    cache.max_bytes = int(cache_config.get("results_max_mb", 256) * 1024 * 1024)
+    return cache
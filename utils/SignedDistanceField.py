@@ -0,0 +1,216 @@
+import math
+
+import numpy as np
+
+from utils.collisionUtils import point_rect_distance, swept_circle_rect_time_of_impact
+
+# fields by obstacle layout, shared by all environments
+_FIELDS = {}
+_MAX_CACHED_FIELDS = 8
+
+# the largest distance between a point and its closest pixel
+HALF_DIAGONAL = math.sqrt(0.5)
+
+# length of the exactly swept pieces of a ray that passes close to an obstacle
+CONTACT_WINDOW = 16
+
+# size in pixels of the cells by which rectangles are looked up close to a point
+CELL_SIZE = 32
+
+
+def _lower_envelope(f):
+    """
+    d[q, lane] = min over p of f[p, lane] + (q - p)^2 for every lane, the lower envelope of parabolas
+    (Felzenszwalb and Huttenlocher). The lanes are processed side by side, every lane has its own stack.
+    """
+    n, lanes = f.shape
+    lane = np.arange(lanes)
+    heights = (f + (np.arange(n) ** 2)[:, None]).ravel()
+    # stacks of the parabolas of the envelope and the q from which on they are the lowest. The arrays are
+    # flat, top is the index k * lanes + lane of the top of the stack of every lane
+    positions = np.zeros(n * lanes, dtype=np.int64)
+    bounds = np.full((n + 1) * lanes, np.inf)
+    bounds[:lanes] = -np.inf
+    top = lane.copy()
+    s = np.empty(lanes)
+
+    for q in range(1, n):
+        hq = heights[q * lanes:(q + 1) * lanes]
+        # only the lanes that popped a parabola are looked at again
+        active, active_top = lane, top
+        while True:
+            p = positions[active_top]
+            s_active = (hq[active] - heights[p * lanes + active]) / (2 * (q - p))
+            s[active] = s_active
+            # the bound of the first parabola is -inf, it is never popped
+            popped = s_active <= bounds[active_top]
+            if not popped.any():
+                break
+            active = active[popped]
+            top[active] -= lanes
+            active_top = top[active]
+        top += lanes
+        positions[top] = q
+        bounds[top] = s
+        bounds[top + lanes] = np.inf
+
+    k = top // lanes
+    positions, bounds = positions.reshape(n, lanes), bounds.reshape(n + 1, lanes)
+
+    # parabola k is the lowest for the q in [bounds[k], bounds[k + 1]), the entries above the stacks are stale
+    starts = np.clip(np.ceil(bounds), 0, n)
+    counts = (starts[1:] - starts[:-1]).astype(np.int64)
+    counts[np.arange(n)[:, None] > k] = 0
+    p = np.repeat(positions.T.ravel(), counts.T.ravel()).reshape(lanes, n).T
+    return f[p, lane] + (np.arange(n)[:, None] - p) ** 2
+
+
+def squared_distance_transform(mask):
+    """
+    Squared euclidean distance of every pixel to the closest True pixel of the bool array, indexed [x][y].
+    Two separable passes, the second one along the shorter axis, so the cost only depends on the number of
+    pixels. Pixels of an array without any True pixel get inf.
+    """
+    if not mask.any():
+        return np.full(mask.shape, np.inf)
+    if mask.shape[0] > mask.shape[1]:
+        return squared_distance_transform(mask.T).T
+
+    width, height = mask.shape
+
+    # distance along y to the closest True pixel above and below
+    ys = np.arange(height)
+    above = np.maximum.accumulate(np.where(mask, ys, -2 * (width + height)), axis=1)
+    below = np.minimum.accumulate(np.where(mask, ys, 4 * (width + height))[:, ::-1], axis=1)[:, ::-1]
+    g = np.minimum(ys - above, below - ys).astype(np.float64)
+
+    # columns without True pixels get a finite distance farther than any pixel of the array
+    return _lower_envelope(g * g)
+
+
+class SignedDistanceField:
+    """
+    Euclidean distance of every pixel to the closest obstacle, negative inside of obstacles. The obstacle
+    rectangles are rasterized, a pixel is occupied if it lies in a rectangle grown to whole pixels, and the
+    distance outside is the distance transform of that raster. Its cost depends on the number of pixels and
+    not on the number of rectangles, for rectangles on whole pixels it is exact at the pixels. Inside an
+    obstacle the value is the negative distance to the border of the deepest rectangle containing the pixel,
+    which only touches the pixels of the rectangles. Overlapping obstacles can be deeper than that.
+
+    The field covers the bounding box of the rectangles, points outside of it are computed from the rectangles.
+    """
+
+    def __init__(self, rects):
+        """
+        :param rects: obstacles as (x0, y0, x1, y1), the walls included
+        """
+        self.rects = tuple(tuple(r) for r in rects)
+        self.cells = {}
+        if not self.rects:
+            self.x0, self.y0, self.x1, self.y1 = 0, 0, 0, 0
+            self.values = np.full((1, 1), np.inf, dtype=np.float32)
+            return
+
+        self.x0 = int(math.floor(min(r[0] for r in rects)))
+        self.y0 = int(math.floor(min(r[1] for r in rects)))
+        self.x1 = int(math.ceil(max(r[2] for r in rects)))
+        self.y1 = int(math.ceil(max(r[3] for r in rects)))
+
+        xs = np.arange(self.x0, self.x1 + 1, dtype=np.float32)
+        ys = np.arange(self.y0, self.y1 + 1, dtype=np.float32)
+
+        occupied = np.zeros((len(xs), len(ys)), dtype=bool)
+        depth = np.zeros((len(xs), len(ys)), dtype=np.float32)
+        for index, (x0, y0, x1, y1) in enumerate(self.rects):
+            occupied[int(math.floor(x0)) - self.x0:int(math.ceil(x1)) - self.x0 + 1,
+                     int(math.floor(y0)) - self.y0:int(math.ceil(y1)) - self.y0 + 1] = True
+            for cell in self._get_cells(x0, y0, x1, y1):
+                self.cells.setdefault(cell, []).append(index)
+
+            # distance to the border for the pixels inside
+            ix0, ix1 = int(math.ceil(x0)) - self.x0, int(math.floor(x1)) - self.x0 + 1
+            iy0, iy1 = int(math.ceil(y0)) - self.y0, int(math.floor(y1)) - self.y0 + 1
+            if ix0 < ix1 and iy0 < iy1:
+                inner_x = np.minimum(xs[ix0:ix1] - x0, x1 - xs[ix0:ix1])
+                inner_y = np.minimum(ys[iy0:iy1] - y0, y1 - ys[iy0:iy1])
+                np.maximum(depth[ix0:ix1, iy0:iy1], np.minimum(inner_x[:, None], inner_y[None, :]),
+                           out=depth[ix0:ix1, iy0:iy1])
+
+        self.values = (np.sqrt(squared_distance_transform(occupied)) - depth).astype(np.float32)
+
+    def _get_cells(self, x0, y0, x1, y1):
+        cx0, cy0 = int(math.floor(x0 / CELL_SIZE)), int(math.floor(y0 / CELL_SIZE))
+        cx1, cy1 = int(math.floor(x1 / CELL_SIZE)), int(math.floor(y1 / CELL_SIZE))
+        return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+
+    def get_rects_near(self, x0, y0, x1, y1):
+        """Rectangles that may intersect the box [x0, x1] x [y0, y1]"""
+        indices = set()
+        for cell in self._get_cells(x0, y0, x1, y1):
+            indices.update(self.cells.get(cell, ()))
+        return [self.rects[i] for i in sorted(indices)]
+
+    def touches(self, x, y, radius):
+        """Whether a circle with the radius at (x, y) is closer to an obstacle than its radius, exactly"""
+        return any(point_rect_distance(x, y, *r) < radius
+                   for r in self.get_rects_near(x - radius, y - radius, x + radius, y + radius))
+
+    def get_clearance(self, x, y):
+        """Signed distance of the closest pixel to (x, y) to the obstacles"""
+        ix, iy = int(math.floor(x + 0.5)), int(math.floor(y + 0.5))
+        if self.x0 <= ix <= self.x1 and self.y0 <= iy <= self.y1:
+            return float(self.values[ix - self.x0, iy - self.y0])
+        return min((point_rect_distance(ix, iy, *r) for r in self.rects), default=math.inf)
+
+    def get_ray_distance(self, x, y, dx, dy, radius=0, max_distance=math.inf):
+        """
+        Distance a circle with the radius can move from (x, y) in direction (dx, dy) until it touches an
+        obstacle, math.inf if it never does within max_distance. The field is sphere traced with steps that
+        can not pass an obstacle. Close to an obstacle a grazing ray can not be told from a hit, there the
+        circle is swept exactly against the rectangles nearby.
+        """
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return 0.0 if self.get_clearance(x, y) < radius else math.inf
+        dx, dy = dx / length, dy / length
+
+        # the ray can not hit anything once it left the bounding box of the rectangles
+        t_exit = math.inf
+        for p, d, lo, hi in ((x, dx, self.x0 - radius, self.x1 + radius), (y, dy, self.y0 - radius, self.y1 + radius)):
+            if d != 0:
+                t_exit = min(t_exit, max((lo - p) / d, (hi - p) / d))
+            elif not lo <= p <= hi:
+                return math.inf
+
+        t = 0.0
+        while t <= min(t_exit, max_distance):
+            px, py = x + t * dx, y + t * dy
+            step = self.get_clearance(px, py) - radius - HALF_DIAGONAL
+            if step >= 1:
+                t = t + step
+                continue
+
+            hit = self._sweep(px, py, dx * CONTACT_WINDOW, dy * CONTACT_WINDOW, radius)
+            if hit is not None:
+                return t + hit * CONTACT_WINDOW
+            t = t + CONTACT_WINDOW
+        return math.inf
+
+    def _sweep(self, x, y, dx, dy, radius):
+        # first contact on the motion (dx, dy), only rectangles closer than the motion can be reached
+        reach = radius + math.hypot(dx, dy)
+        hits = [swept_circle_rect_time_of_impact(x, y, dx, dy, radius, *r)
+                for r in self.get_rects_near(x - reach, y - reach, x + reach, y + reach)
+                if point_rect_distance(x, y, *r) <= reach]
+        return min((t for t in hits if t is not None), default=None)
+
+def get_signed_distance_field(rects):
+    """Cached SignedDistanceField of the rectangles (x0, y0, x1, y1)"""
+    key = tuple(tuple(r) for r in rects)
+    field = _FIELDS.get(key)
+    if field is None:
+        field = SignedDistanceField(key)
+        if len(_FIELDS) >= _MAX_CACHED_FIELDS:
+            del _FIELDS[next(iter(_FIELDS))]
+        _FIELDS[key] = field
+    return field
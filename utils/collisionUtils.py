@@ -0,0 +1,105 @@
+import math
+
+
+# distance between the point (px, py) and the axis aligned rectangle [x0, x1] x [y0, y1]
+def point_rect_distance(px, py, x0, y0, x1, y1):
+    dx = max(x0 - px, 0, px - x1)
+    dy = max(y0 - py, 0, py - y1)
+    return math.hypot(dx, dy)
+
+
+def _segment_box_entry(px, py, dx, dy, x0, y0, x1, y1):
+    # slab test, returns the first t in [0, 1] at which p + t * d is inside the closed box or None
+    t_enter, t_exit = 0.0, 1.0
+    for p, d, lo, hi in ((px, dx, x0, x1), (py, dy, y0, y1)):
+        if d == 0:
+            if p < lo or p > hi:
+                return None
+            continue
+        t1 = (lo - p) / d
+        t2 = (hi - p) / d
+        if t1 > t2:
+            t1, t2 = t2, t1
+        t_enter = max(t_enter, t1)
+        t_exit = min(t_exit, t2)
+        if t_enter > t_exit:
+            return None
+
+    return t_enter
+
+
+def _segment_circle_entry(px, py, dx, dy, cx, cy, r):
+    # first t in [0, 1] at which p + t * d is inside the closed circle or None
+    fx, fy = px - cx, py - cy
+    a = dx * dx + dy * dy
+    c = fx * fx + fy * fy - r * r
+    if c <= 0:
+        return 0.0
+    if a == 0:
+        return None
+
+    b = 2 * (fx * dx + fy * dy)
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return None
+
+    t = (-b - math.sqrt(discriminant)) / (2 * a)
+    return t if 0 <= t <= 1 else None
+
+
+def swept_circle_rect_time_of_impact(cx, cy, dx, dy, r, x0, y0, x1, y1):
+    """
+    Sweeps a circle with radius r and center (cx, cy) along the motion (dx, dy) against the
+    rectangle [x0, x1] x [y0, y1]. The circle touches the rectangle when its center enters the
+    rectangle grown by r with rounded corners, which is the union of two boxes and four circles.
+
+    :returns: the fraction t in [0, 1] of the motion at the first contact or None if there is no contact
+    """
+    hits = [
+        _segment_box_entry(cx, cy, dx, dy, x0 - r, y0, x1 + r, y1),
+        _segment_box_entry(cx, cy, dx, dy, x0, y0 - r, x1, y1 + r),
+        _segment_circle_entry(cx, cy, dx, dy, x0, y0, r),
+        _segment_circle_entry(cx, cy, dx, dy, x1, y0, r),
+        _segment_circle_entry(cx, cy, dx, dy, x0, y1, r),
+        _segment_circle_entry(cx, cy, dx, dy, x1, y1, r),
+    ]
+    hits = [t for t in hits if t is not None]
+    return min(hits) if hits else None
+
+
+def first_contact(cx, cy, dx, dy, r, obstacles, overlap_center=None, depth=0):
+    """
+    Time of first contact of a moving circle with a list of sprite.Box obstacles.
+    An obstacle the circle already overlaps only counts if the motion leads deeper into it,
+    so a robot which is stuck in an obstacle can still move out of it. With a depth the motion may
+    also slide along an overlapped obstacle as long as it never gets deeper than depth into it.
+    overlap_center is the center used to decide if an obstacle is already overlapped, by default (cx, cy).
+
+    :returns: (t, obstacle, overlapping) of the earliest contact or (None, None, False).
+        overlapping is set if the obstacle was already overlapped at the start of the motion.
+    """
+    ox, oy = (cx, cy) if overlap_center is None else overlap_center
+    best_t, best_obstacle = None, None
+    for obstacle in obstacles:
+        x0, y0 = obstacle.rect.x, obstacle.rect.y
+        x1, y1 = x0 + obstacle.width, y0 + obstacle.height
+
+        # cheap reject with the bounding box of the whole sweep
+        if min(cx, cx + dx) - r > x1 or max(cx, cx + dx) + r < x0 or \
+                min(cy, cy + dy) - r > y1 or max(cy, cy + dy) + r < y0:
+            continue
+
+        if point_rect_distance(ox, oy, x0, y0, x1, y1) < r:
+            # separating direction from the closest point of the rectangle to the center
+            nx = ox - min(max(ox, x0), x1)
+            ny = oy - min(max(oy, y0), y1)
+            if nx * dx + ny * dy < 0 and (depth <= 0 or swept_circle_rect_time_of_impact(
+                    cx, cy, dx, dy, r - depth - 1e-6, x0, y0, x1, y1) is not None):
+                return 0.0, obstacle, True
+            continue
+
+        t = swept_circle_rect_time_of_impact(cx, cy, dx, dy, r, x0, y0, x1, y1)
+        if t is not None and (best_t is None or t < best_t):
+            best_t, best_obstacle = t, obstacle
+
+    return best_t, best_obstacle, False
@@ -2,6 +2,58 @@
 Configuration Manager for Less Intelligent Vacuum Cleaner Simulation
 This class replaces the static config file with a dynamic configuration system
 """
+import weakref
+
+
+class ConfigSnapshot:
+    """
+    Immutable view of the configuration values that are read on every tick and frame, with the defaults
+    already applied. ConfigManager publishes a new snapshot whenever the configuration changes, consumers
+    keep a reference to it and read plain attributes.
+    """
+    __slots__ = ("version", "robot_radius", "wss", "rss", "dirt_per_cover", "continuous_collision",
+                 "fps", "dirt", "base_color", "ticks_for_cover", "ticks_per_save", "stop_at_coverage",
+                 "plateau_window", "plateau_min_rate", "event_stream_length", "width", "height", "tile_size",
+                 "draw_fps", "draw_coverage", "draw_time", "verbose", "metrics")
+
+    def __init__(self, version, config):
+        robot, simulation = config["robot"], config["simulation"]
+        environment, debug = config["environment"], config["debug"]
+        dirt = simulation.get("dirt", 35)
+        values = {
+            "version": version,
+            "robot_radius": robot["radius"],
+            "wss": robot["wss"],
+            "rss": robot["rss"],
+            "dirt_per_cover": robot.get("dirt_per_cover", 7),
+            "continuous_collision": robot.get("continuous_collision", False),
+            "fps": simulation["fps"],
+            "dirt": dirt,
+            "base_color": (255 - dirt, 255 - dirt, 255 - dirt),
+            "ticks_for_cover": simulation.get("ticks_for_cover", 10),
+            "ticks_per_save": simulation.get("ticks_per_save", 500),
+            "stop_at_coverage": simulation.get("stop_at_coverage", 90),
+            "plateau_window": simulation.get("plateau_window", 20000),
+            "plateau_min_rate": simulation.get("plateau_min_rate", 0.02),
+            "event_stream_length": simulation.get("event_stream_length", 10000),
+            "width": environment["width"],
+            "height": environment["height"],
+            "tile_size": environment["tile_size"],
+            "draw_fps": debug.get("draw_fps", True),
+            "draw_coverage": debug.get("draw_coverage", True),
+            "draw_time": debug.get("draw_time", True),
+            "verbose": debug.get("verbose", True),
+            "metrics": debug.get("metrics", False),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("a ConfigSnapshot can not be changed, use ConfigManager.update_config")
+
+    def __delattr__(self, name):
+        raise AttributeError("a ConfigSnapshot can not be changed, use ConfigManager.update_config")
+
 
 class ConfigManager:
     def __init__(self):
@@ -11,14 +63,18 @@ class ConfigManager:
                 "radius": 30,
                 "wss": 2,
                 "rss": 5,
-                "dirt_per_cover": 10
+                "dirt_per_cover": 10,
+                "continuous_collision": False
             },
             "simulation": {
                 "fps": 60,
                 "dirt": 35,
                 "ticks_per_screenshot": 1000,
                 "ticks_per_save": 500,
-                "stop_at_coverage": 90
+                "stop_at_coverage": 90,
+                "plateau_window": 20000,
+                "plateau_min_rate": 0.02,
+                "event_stream_length": 10000
             },
             "environment": {
                 "width": 800,
@@ -36,14 +92,36 @@ class ConfigManager:
                     "8": { "obstacles": [], "robot": [385, 285, 30], "name": "Random Spiral" }
                 }
             },
+            "algorithms": {
+                "random": {
+                    "min_bounce_angle": 70,
+                    "max_bounce_angle": 150
+                },
+                "spiral": {
+                    "rotation_speed": 5,
+                    "rotation_decay": 1.05,
+                    "steps_for_mode_switch": 500,
+                    "min_bounce_angle": 70,
+                    "max_bounce_angle": 150
+                },
+                "swalk": {
+                    "min_steps_between_lines": 2,
+                    "max_steps_between_lines": 7
+                }
+            },
             "debug": {
                 "draw_fps": True,
                 "draw_coverage": True,
                 "draw_time": True,
-                "verbose": True
+                "verbose": True,
+                "metrics": False
             },
             "logging": {
                 "verbose": True
+            },
+            "cache": {
+                "results_path": None,
+                "results_max_mb": 256
             }
         }
         
@@ -52,6 +130,11 @@ class ConfigManager:
             "obstacles": [],
             "robot": None
         }
+
+        # increased on every change of the configuration, see get_snapshot
+        self.version = 0
+        self._snapshot = None
+        self._subscribers = []
     
     def get_config(self):
         """Return the full configuration"""
@@ -69,6 +152,10 @@ class ConfigManager:
         """Return environment configuration"""
         return self.config["environment"]
     
+    def get_algorithm_config(self, name):
+        """Return the parameters of an algorithm, empty if it has none"""
+        return self.config.get("algorithms", {}).get(name, {})
+
     def get_debug_config(self):
         """Return debug configuration"""
         return self.config["debug"]
@@ -126,12 +213,49 @@ class ConfigManager:
             environments.append({"id": env_id, "name": name})
         return environments
     
+    def add_environment(self, obstacles, robot, name=None):
+        """Register a new environment and return its id"""
+        defaults = self.config["environment"]["defaults"]
+        env_id = str(max((int(i) for i in defaults if i.isdigit()), default=0) + 1)
+        defaults[env_id] = {"obstacles": obstacles, "robot": robot, "name": name or f"Environment {env_id}"}
+        return env_id
+    
     def update_config(self, section, key, value):
         """Update a specific configuration value"""
         if section in self.config and key in self.config[section]:
             self.config[section][key] = value
+            self.notify_changed()
             return True
         return False
 
+    def get_snapshot(self):
+        """Immutable ConfigSnapshot of the current configuration"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != self.version:
+            snapshot = self._snapshot = ConfigSnapshot(self.version, self.config)
+        return snapshot
+
+    def subscribe(self, callback):
+        """
+        Calls callback(snapshot) with the new snapshot after every change of the configuration. Bound methods
+        are held weakly, so a subscriber that is gone is dropped without unsubscribing.
+        """
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else weakref.ref(callback)
+        self._subscribers.append(ref)
+
+    def unsubscribe(self, callback):
+        self._subscribers = [ref for ref in self._subscribers if ref() not in (None, callback)]
+
+    def notify_changed(self):
+        """Publishes a new snapshot, needed after changing the dicts of get_config directly"""
+        self.version = self.version + 1
+        snapshot = self.get_snapshot()
+
+        self._subscribers = [ref for ref in self._subscribers if ref() is not None]
+        for ref in list(self._subscribers):
+            callback = ref()
+            if callback is not None:
+                callback(snapshot)
+
 # Create a singleton instance
 config_manager = ConfigManager()
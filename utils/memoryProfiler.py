@@ -0,0 +1,112 @@
+"""
+tracemalloc based memory profiling.
+Allocations are grouped by the module that made them, a diff against the previous
+baseline snapshot shows which modules keep growing.
+"""
+
+import os
+import threading
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _module_name(filename):
+    path = os.path.abspath(filename)
+    if path.startswith(ROOT_DIR + os.sep):
+        path = os.path.relpath(path, ROOT_DIR)
+    else:
+        # strip everything up to site-packages or the standard library folder
+        for marker in ("site-packages" + os.sep, "dist-packages" + os.sep, "lib" + os.sep + "python"):
+            idx = path.rfind(marker)
+            if idx != -1:
+                path = path[idx + len(marker):]
+                if marker.startswith("lib"):
+                    path = path.split(os.sep, 1)[-1]
+                break
+
+    if path.endswith(".py"):
+        path = path[:-3]
+    return path.replace(os.sep, ".")
+
+
+def _group_by_module(stats):
+    modules = {}
+    for stat in stats:
+        name = _module_name(stat.traceback[0].filename)
+        size, count = modules.get(name, (0, 0))
+        modules[name] = (size + stat.size, count + stat.count)
+    return modules
+
+
+class MemoryProfiler:
+    def __init__(self, frames=1):
+        self.frames = frames
+        self.baseline = None
+        self._lock = threading.Lock()
+
+    def is_tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        with self._lock:
+            self.baseline = tracemalloc.take_snapshot()
+
+    def stop(self):
+        with self._lock:
+            self.baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _take_snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def report(self, limit=20, reset_baseline=False):
+        """
+        Return the top allocating modules and the growth per module since the baseline snapshot.
+
+        :param limit: number of modules listed in each section
+        :param reset_baseline: use the current snapshot as baseline for the next report
+        :rtype: dict
+        """
+        if not tracemalloc.is_tracing():
+            self.start()
+
+        snapshot = self._take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+
+        top = sorted(_group_by_module(snapshot.statistics("filename")).items(), key=lambda m: m[1][0], reverse=True)
+
+        with self._lock:
+            baseline = self.baseline
+            if reset_baseline or baseline is None:
+                self.baseline = snapshot
+
+        diff = []
+        if baseline is not None:
+            modules = {}
+            for stat in snapshot.compare_to(baseline, "filename"):
+                name = _module_name(stat.traceback[0].filename)
+                size_diff, count_diff = modules.get(name, (0, 0))
+                modules[name] = (size_diff + stat.size_diff, count_diff + stat.count_diff)
+            diff = sorted(modules.items(), key=lambda m: abs(m[1][0]), reverse=True)
+
+        return {
+            "tracing": True,
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top": [{"module": name, "size_bytes": size, "count": count} for name, (size, count) in top[:limit]],
+            "diff": [{"module": name, "size_diff_bytes": size, "count_diff": count}
+                     for name, (size, count) in diff[:limit] if size != 0 or count != 0],
+        }
+
+
+# Create a singleton instance
+memory_profiler = MemoryProfiler()
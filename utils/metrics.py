@@ -0,0 +1,151 @@
+"""
+Lightweight instrumentation for the simulation.
+Phase timers keep a rolling window of durations which is exported as a prometheus summary,
+rates are derived from the timestamps of the most recent marks.
+When disabled every call returns immediately so the timers can stay in the hot paths.
+"""
+
+import threading
+import time
+from collections import deque
+
+from utils.config_manager import config_manager
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _Summary:
+    __slots__ = ("window", "sum", "count")
+
+    def __init__(self, window_size):
+        self.window = deque(maxlen=window_size)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, enabled=False, window_size=1000, prefix="vacuum"):
+        self.enabled = enabled
+        self.window_size = window_size
+        self.prefix = prefix
+
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._rates = {}
+        self._gauges = {}
+
+    def timer(self, name):
+        """Context manager measuring the duration of the enclosed block"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        summary = self._summaries.get(name)
+        if summary is None:
+            with self._lock:
+                summary = self._summaries.setdefault(name, _Summary(self.window_size))
+
+        summary.window.append(seconds)
+        summary.sum += seconds
+        summary.count += 1
+
+    def mark(self, name):
+        """Record an occurrence of name (e.g. a tick or a frame), used to compute its rate"""
+        if not self.enabled:
+            return
+
+        marks = self._rates.get(name)
+        if marks is None:
+            with self._lock:
+                marks = self._rates.setdefault(name, deque(maxlen=self.window_size))
+        marks.append(time.perf_counter())
+
+    def _on_config_changed(self, snapshot):
+        self.enabled = snapshot.metrics
+
+    def register_gauge(self, name, description, callback):
+        """Register a gauge whose value is read from callback when the metrics are rendered"""
+        self._gauges[name] = (description, callback)
+
+    def get_rate(self, name):
+        marks = self._rates.get(name)
+        if not marks or len(marks) < 2:
+            return 0.0
+
+        first, last = marks[0], marks[-1]
+        return (len(marks) - 1) / (last - first) if last > first else 0.0
+
+    def reset(self):
+        with self._lock:
+            self._summaries = {}
+            self._rates = {}
+
+    def render_prometheus(self):
+        """Return all metrics in the prometheus text exposition format"""
+        p = self.prefix
+        lines = ["# HELP %s_metrics_enabled Whether the phase timers are recording" % p,
+                 "# TYPE %s_metrics_enabled gauge" % p,
+                 "%s_metrics_enabled %d" % (p, 1 if self.enabled else 0)]
+
+        lines.append("# HELP %s_phase_seconds Duration of the simulation phases over the last %d samples"
+                     % (p, self.window_size))
+        lines.append("# TYPE %s_phase_seconds summary" % p)
+        for name, summary in sorted(self._summaries.items()):
+            samples = sorted(summary.window)
+            for q in self.QUANTILES:
+                value = samples[min(int(q * len(samples)), len(samples) - 1)] if samples else 0.0
+                lines.append('%s_phase_seconds{phase="%s",quantile="%s"} %.9f' % (p, name, q, value))
+            lines.append('%s_phase_seconds_sum{phase="%s"} %.9f' % (p, name, summary.sum))
+            lines.append('%s_phase_seconds_count{phase="%s"} %d' % (p, name, summary.count))
+
+        for name in sorted(self._rates):
+            lines.append("# HELP %s_%s_per_second Rate over the last %d occurrences" % (p, name, self.window_size))
+            lines.append("# TYPE %s_%s_per_second gauge" % (p, name))
+            lines.append("%s_%s_per_second %.6f" % (p, name, self.get_rate(name)))
+
+        for name, (description, callback) in sorted(self._gauges.items()):
+            try:
+                value = float(callback())
+            except Exception:
+                continue
+            lines.append("# HELP %s_%s %s" % (p, name, description))
+            lines.append("# TYPE %s_%s gauge" % (p, name))
+            lines.append("%s_%s %s" % (p, name, repr(value)))
+
+        return "\n".join(lines) + "\n"
+
+
+# Create a singleton instance, debug.metrics switches it on and off while running
+metrics = Metrics(enabled=config_manager.get_snapshot().metrics)
+config_manager.subscribe(metrics._on_config_changed)
@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+
+
+# A pixel (px, py) belongs to a shape if its center (px + 0.5, py + 0.5) lies inside of it. The fills return
+# per pixel row the spans [x0, x1) of the pixels inside, which spans_to_rects merges into rectangles.
+
+
+def circle_spans(cx, cy, r):
+    """Scan-line fill of the circle with center (cx, cy) and radius r, {row: [(x0, x1), ...]}"""
+    rows = np.arange(int(math.floor(cy - r)), int(math.ceil(cy + r)) + 1)
+    dy = rows + 0.5 - cy
+    half_width = np.sqrt(np.maximum(r * r - dy * dy, 0))
+    x0 = np.ceil(cx - half_width - 0.5).astype(np.int64)
+    x1 = np.floor(cx + half_width - 0.5).astype(np.int64) + 1
+    inside = (np.abs(dy) <= r) & (x0 < x1)
+    return {int(y): [(int(a), int(b))] for y, a, b in zip(rows[inside], x0[inside], x1[inside])}
+
+
+def polygon_spans(points):
+    """
+    Scan-line fill of the polygon with the vertices points [(x, y), ...] with the even-odd rule, so concave
+    polygons work too. {row: [(x0, x1), ...]}
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 3:
+        return {}
+    x0, y0 = points[:, 0], points[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+
+    rows = np.arange(int(math.floor(y0.min())), int(math.ceil(y0.max())) + 1)
+    yc = rows[:, None] + 0.5
+
+    # crossings of every row center with every edge, half open in y so that a vertex counts only once
+    crosses = ((y0 <= yc) & (yc < y1)) | ((y1 <= yc) & (yc < y0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xs = np.where(crosses, x0 + (yc - y0) * (x1 - x0) / (y1 - y0), np.inf)
+    xs.sort(axis=1)
+
+    spans = {}
+    for y, row, count in zip(rows.tolist(), xs, crosses.sum(axis=1).tolist()):
+        row_spans = []
+        for a, b in zip(row[0:count:2], row[1:count:2]):
+            a, b = int(math.ceil(a - 0.5)), int(math.floor(b - 0.5)) + 1
+            if a < b:
+                row_spans.append((a, b))
+        if row_spans:
+            spans[y] = row_spans
+    return spans
+
+
+def spans_to_rects(spans):
+    """Merges the spans of consecutive rows that are equal into rectangles (x, y, width, height)"""
+    rects = []
+    open_spans = {}  # span -> first row
+    previous = None
+    for y in sorted(spans):
+        current = set(spans[y]) if previous is not None and y == previous + 1 else None
+        for span, start in list(open_spans.items()):
+            if current is None or span not in current:
+                rects.append((span[0], start, span[1] - span[0], previous + 1 - start))
+                del open_spans[span]
+        for span in spans[y]:
+            open_spans.setdefault(span, y)
+        previous = y
+
+    for span, start in open_spans.items():
+        rects.append((span[0], start, span[1] - span[0], previous + 1 - start))
+    return rects